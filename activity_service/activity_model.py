@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, Float, String, Date
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Date, UniqueConstraint
 from database.db_connection import Base
 
 class Activity(Base):
     __tablename__ = "activity_data"
-    __table_args__ = {"schema": "activity_service"}
+    __table_args__ = (
+        # Idempotency key for wearable syncs, one row per user/day/workout (NULL workout_type included)
+        UniqueConstraint("user_id", "date", "workout_type", name="activity_data_daily_key",
+                         postgresql_nulls_not_distinct=True),
+        {"schema": "activity_service"},
+    )
 
+    # The table's primary key is (id, date) since it is partitioned by month on `date`, `id` alone stays unique
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, nullable=False)  
     date = Column(Date, nullable=False)
@@ -13,3 +19,28 @@ class Activity(Base):
     distance_km = Column(Float, nullable=True)
     active_minutes = Column(Integer, nullable=True)
     workout_type = Column(String(50), nullable=True)
+
+class ActivityRollup(Base):
+    """Totals per user and day/week/month, kept current by `activity_service.rollups`."""
+    __tablename__ = "activity_rollup"
+    __table_args__ = {"schema": "activity_service"}
+
+    user_id = Column(Integer, primary_key=True)
+    granularity = Column(String(5), primary_key=True)  # "day", "week" or "month"
+    period_start = Column(Date, primary_key=True)
+    total_steps = Column(BigInteger, nullable=False, default=0)
+    total_calories = Column(Float, nullable=False, default=0)
+    total_distance = Column(Float, nullable=False, default=0)
+    total_active_minutes = Column(BigInteger, nullable=False, default=0)
+    activity_count = Column(Integer, nullable=False, default=0)
+
+# Columns behind ActivityResponse and ActivitySummary, read paths select these as Core rows instead of entities
+ACTIVITY_COLUMNS = (
+    Activity.id, Activity.user_id, Activity.date, Activity.steps, Activity.calories_burned,
+    Activity.distance_km, Activity.active_minutes, Activity.workout_type,
+)
+SUMMARY_COLUMNS = (
+    ActivityRollup.user_id, ActivityRollup.total_steps, ActivityRollup.total_calories, ActivityRollup.total_distance,
+    ActivityRollup.total_active_minutes, ActivityRollup.granularity, ActivityRollup.period_start,
+    ActivityRollup.activity_count,
+)
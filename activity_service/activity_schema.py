@@ -1,20 +1,16 @@
-from pydantic import BaseModel, conint, confloat
+from pydantic import BaseModel, conint, confloat, constr
 from datetime import date
-from typing import Optional
+from typing import Optional, List, Literal
+from common.batch_request import BatchResult
 
 class ActivityCreate(BaseModel):
     date: date
-    steps: Optional[int] = None
-    calories_burned: Optional[float] = None
-    distance_km: Optional[float] = None
-    active_minutes: Optional[int] = None
-    workout_type: Optional[str] = None
-
-    # Validation Constraints
-    _validate_steps = conint(ge=0)  # Steps cannot be negative
-    _validate_calories = confloat(ge=0)  # Calories cannot be negative
-    _validate_distance = confloat(ge=0)  # Distance cannot be negative
-    _validate_active_minutes = conint(ge=0)  # Active minutes cannot be negative
+    # Steps, calories, distance and active minutes cannot be negative
+    steps: Optional[conint(ge=0)] = None # type: ignore
+    calories_burned: Optional[confloat(ge=0)] = None # type: ignore
+    distance_km: Optional[confloat(ge=0)] = None # type: ignore
+    active_minutes: Optional[conint(ge=0)] = None # type: ignore
+    workout_type: Optional[constr(max_length=50)] = None # type: ignore
 
 # Schema for response when retrieving activity data (used in GET /activity/{id})
 class ActivityResponse(BaseModel):
@@ -30,6 +26,20 @@ class ActivityResponse(BaseModel):
     class Config:
         from_attributes = True  # Converts SQLAlchemy models to Pydantic objects
 
+# Keyset page of the admin listing, pass `next_after_id` as `after_id` to continue
+class ActivityPage(BaseModel):
+    items: List[ActivityResponse]
+    next_after_id: Optional[int] = None
+
+# Per-row outcome of POST /activity/batch, same shape as /mood/batch
+ActivityBatchResult = BatchResult
+
+class ActivityBatchResponse(BaseModel):
+    inserted: int
+    updated: int
+    invalid: int
+    results: List[ActivityBatchResult]
+
 # Schema for summary responses (used in GET /activity/summary)
 class ActivitySummary(BaseModel):
     user_id: int
@@ -37,3 +47,15 @@ class ActivitySummary(BaseModel):
     total_calories: float
     total_distance: float
     total_active_minutes: int
+    granularity: Optional[Literal["day", "week", "month"]] = None
+    period_start: Optional[date] = None
+    activity_count: Optional[int] = None
+
+    class Config:
+        from_attributes = True  # Built straight from ActivityRollup rows
+
+# Page of GET /admin/activity/logs, cursors are byte offsets into the day's log file
+class LogPage(BaseModel):
+    logs: List[str]
+    next_cursor: Optional[int] = None
+    prev_cursor: Optional[int] = None
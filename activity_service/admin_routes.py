@@ -1,32 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import os
+from datetime import date, datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.db_connection import get_db
-from .activity_model import Activity
-from activity_service.dependencies import get_current_admin, validate_token, logger # Admin Authentication
+from database.db_connection import get_read_db
+from common.fast_json import FAST_RESPONSES, FastJSONResponse, row_dicts
+from .activity_model import ACTIVITY_COLUMNS, Activity
+from .activity_schema import ActivityPage, LogPage
+from .export import EXPORT_COLUMNS, MEDIA_TYPES, export_rows
+from .log_query import LogFilter, log_path, query_logs, stream_logs, stream_media_type
+from activity_service.dependencies import get_current_admin, logger # Admin Authentication
 
 router = APIRouter(prefix="/api/v1/admin/activity", tags=["Admin Activity"])
 
+# Shared filters of the listing and export endpoints
+def activity_filters(
+    user_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    workout_type: Optional[str] = None,
+):
+    conditions = []
+    if user_id is not None:
+        conditions.append(Activity.user_id == user_id)
+    if start is not None:
+        conditions.append(Activity.date >= start)
+    if end is not None:
+        conditions.append(Activity.date <= end)
+    if workout_type is not None:
+        conditions.append(Activity.workout_type == workout_type)
+    return conditions
+
+# Admin API - Page through activities by id (keyset pagination, no OFFSET scans)
+@router.get("/all", response_model=ActivityPage)
+async def get_all_activities(
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    filters: list = Depends(activity_filters),
+    db: AsyncSession = Depends(get_read_db),
+    admin=Depends(get_current_admin),
+):
+    stmt = select(*ACTIVITY_COLUMNS).where(Activity.id > after_id, *filters).order_by(Activity.id).limit(limit)
+    items = (await db.execute(stmt)).all()
+    next_after_id = items[-1].id if len(items) == limit else None
+    # Plain dicts validate faster than Rows through ActivityPage, FAST_RESPONSES skips the model altogether
+    page = {"items": row_dicts(items), "next_after_id": next_after_id}
+    return FastJSONResponse(page) if FAST_RESPONSES else page
+
+# Admin API - Export activities as NDJSON, CSV or Parquet, streamed chunk by chunk
+@router.get("/export")
+async def export_activities(
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    filters: list = Depends(activity_filters),
+    admin=Depends(get_current_admin),
+):
+    logger.info("Admin %s exporting activities as %s", admin["user_id"], format)
+    stmt = select(*(getattr(Activity, column) for column in EXPORT_COLUMNS)).where(*filters).order_by(Activity.id)
+    return StreamingResponse(
+        export_rows(stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="activities.{format}"'},
+    )
+
+# Level, text and time filters of the log endpoints, applied while the file is read
+def log_filter(
+    level: Optional[Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]] = None,
+    q: Optional[str] = Query(None, min_length=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    return LogFilter(level, q, start, end)
+
+def existing_log(day: date = Query(..., alias="date")):
+    path = log_path(day)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No logs found for this date")
+    return path
+
+# Admin API - Page through a day's logs for debugging: the newest `limit` lines by default,
+# forward from `cursor` or `start`, older lines with `before` (cursors are byte offsets)
+@router.get("/logs", response_model=LogPage)
+async def get_activity_logs(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, ge=0),
+    before: Optional[int] = Query(None, ge=0),
+    path: str = Depends(existing_log),
+    flt: LogFilter = Depends(log_filter),
+    admin=Depends(get_current_admin),
+):
+    return await asyncio.to_thread(query_logs, path, flt, limit, cursor, before)
+
+# Admin API - Stream all matching lines of a day's log (NDJSON, or plain text with LOG_FORMAT=text)
+@router.get("/logs/stream")
+async def stream_activity_logs(
+    cursor: int = Query(0, ge=0),
+    path: str = Depends(existing_log),
+    flt: LogFilter = Depends(log_filter),
+    admin=Depends(get_current_admin),
+):
+    return StreamingResponse(stream_logs(path, flt, cursor), media_type=stream_media_type())
+
 # Admin API - Fetch specific activity by ID (Debugging)
+# Declared last so `/all`, `/export` and `/logs` are not captured as an activity id
 @router.get("/{activity_id}")
-async def get_activity_by_id(activity_id: int, db: AsyncSession = Depends(get_db), admin=Depends(get_current_admin)):
-    activity = await db.execute(select(Activity).filter(Activity.id == activity_id))
-    result = activity.scalar_one_or_none()
+async def get_activity_by_id(activity_id: int, db: AsyncSession = Depends(get_read_db), admin=Depends(get_current_admin)):
+    activity = await db.execute(select(*ACTIVITY_COLUMNS).filter(Activity.id == activity_id))
+    result = activity.one_or_none()
     if not result:
         raise HTTPException(status_code=404, detail="Activity not found")
-    return result
-
-# Admin API - Fetch all user activities (Debugging)
-@router.get("/all")
-async def get_all_activities(db: AsyncSession = Depends(get_db), admin=Depends(get_current_admin)):
-    return await db.execute(select(Activity))
-
-# Admin API - Fetch logs for debugging
-@router.get("/logs")
-async def get_activity_logs(date: str, admin=Depends(get_current_admin)):
-    # Read logs from file system
-    log_file = f"logs/activity_{date}.log"
-    try:
-        with open(log_file, "r") as f:
-            return {"logs": f.readlines()}
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="No logs found for this date")
+    if FAST_RESPONSES:
+        return FastJSONResponse(result._asdict())
+    return result._asdict()
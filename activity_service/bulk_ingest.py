@@ -0,0 +1,95 @@
+import os
+
+from sqlalchemy import literal_column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .activity_model import Activity
+from .activity_schema import ActivityBatchResult
+
+# Batches with at least this many rows are staged through COPY instead of a multi-row INSERT
+BULK_COPY_THRESHOLD = int(os.getenv("BULK_COPY_THRESHOLD", "500"))
+# Keeps a multi-row INSERT well below asyncpg's 32767 bind parameter limit
+INSERT_CHUNK_ROWS = 1000
+
+ACTIVITY_COLUMNS = ["user_id", "date", "steps", "calories_burned", "distance_km", "active_minutes", "workout_type"]
+UPSERT_COLUMNS = ["steps", "calories_burned", "distance_km", "active_minutes"]
+
+STAGING_TABLE_DDL = text("""
+    CREATE TEMP TABLE IF NOT EXISTS activity_staging (
+        user_id INT, date DATE, steps INT, calories_burned FLOAT, distance_km FLOAT,
+        active_minutes INT, workout_type VARCHAR(50)
+    ) ON COMMIT DELETE ROWS
+""")
+
+UPSERT_FROM_STAGING = text(f"""
+    INSERT INTO activity_service.activity_data ({", ".join(ACTIVITY_COLUMNS)})
+    SELECT {", ".join(ACTIVITY_COLUMNS)} FROM activity_staging
+    ON CONFLICT ON CONSTRAINT activity_data_daily_key DO UPDATE SET
+        {", ".join(f"{column} = EXCLUDED.{column}" for column in UPSERT_COLUMNS)}
+    RETURNING id, date, workout_type, (xmax = 0) AS inserted
+""")
+
+
+async def upsert_activities(db: AsyncSession, user_id: int, valid: list) -> list:
+    """Upsert validated rows for one user on (user_id, date, workout_type), without committing."""
+    # A retried sync may repeat a key inside one batch, the last occurrence wins
+    latest = {}
+    for index, activity in valid:
+        latest[(activity.date, activity.workout_type)] = (index, activity)
+
+    records = [
+        (user_id, a.date, a.steps, a.calories_burned, a.distance_km, a.active_minutes, a.workout_type)
+        for _, a in latest.values()
+    ]
+    if not records:
+        return []
+    if len(records) >= BULK_COPY_THRESHOLD:
+        returned = await _copy_upsert(db, records)
+    else:
+        returned = await _insert_upsert(db, records)
+
+    results, ids = [], {}
+    for row in returned:
+        key = (row.date, row.workout_type)
+        ids[key] = row.id
+        results.append(ActivityBatchResult(
+            index=latest[key][0], status="inserted" if row.inserted else "updated", id=row.id
+        ))
+    for index, activity in valid:
+        key = (activity.date, activity.workout_type)
+        if latest[key][0] != index:
+            results.append(ActivityBatchResult(index=index, status="superseded", id=ids.get(key)))
+    return results
+
+
+def upsert_statement(*returning):
+    """INSERT ... ON CONFLICT (user_id, date, workout_type) DO UPDATE, returning `returning` and `inserted`."""
+    stmt = pg_insert(Activity)
+    return stmt.on_conflict_do_update(
+        constraint="activity_data_daily_key",
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+    ).returning(*returning, literal_column("xmax = 0").label("inserted"))
+
+
+async def _insert_upsert(db: AsyncSession, records: list) -> list:
+    stmt = upsert_statement(Activity.id, Activity.date, Activity.workout_type)
+
+    returned = []
+    for start in range(0, len(records), INSERT_CHUNK_ROWS):
+        chunk = records[start:start + INSERT_CHUNK_ROWS]
+        result = await db.execute(stmt.values([dict(zip(ACTIVITY_COLUMNS, record)) for record in chunk]))
+        returned.extend(result.all())
+    return returned
+
+
+async def _copy_upsert(db: AsyncSession, records: list) -> list:
+    await db.execute(STAGING_TABLE_DDL)
+    # COPY runs on the session's own connection, so it shares the request transaction
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        "activity_staging", records=records, columns=ACTIVITY_COLUMNS
+    )
+    result = await db.execute(UPSERT_FROM_STAGING)
+    return result.all()
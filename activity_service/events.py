@@ -0,0 +1,17 @@
+import os
+
+from common.events import ACTIVITY_LOGGED
+from common.outbox import OutboxRelay, add_event
+
+# Relay outbox events from this process, any number of processes may run one
+OUTBOX_RELAY = os.getenv("OUTBOX_RELAY", "true").lower() == "true"
+
+outbox_relay = OutboxRelay()
+
+
+async def activity_logged(db, user_id: int, day_totals):
+    """Records an `activity.logged` event with the day totals from refresh_rollups, in the caller's transaction."""
+    await add_event(db, ACTIVITY_LOGGED, user_id, {"days": [
+        {"date": day.isoformat(), "steps": steps, "active_minutes": active_minutes}
+        for day, steps, active_minutes in day_totals
+    ]})
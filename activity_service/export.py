@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import Select
+
+from common.fast_json import FAST_RESPONSES, dumps, row_dicts
+from database.db_connection import get_sessionmaker
+
+# Rows fetched per round-trip from the server-side cursor, and encoded per chunk
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_COLUMNS = ["id", "user_id", "date", "steps", "calories_burned", "distance_km", "active_minutes", "workout_type"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class NdjsonEncoder:
+    def encode(self, rows) -> bytes:
+        if FAST_RESPONSES:
+            return b"".join(dumps(row) + b"\n" for row in row_dicts(rows))
+        return "".join(
+            json.dumps({**row._asdict(), "date": row.date.isoformat()}) + "\n" for row in rows
+        ).encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class CsvEncoder:
+    def __init__(self):
+        self._header_sent = False
+
+    def encode(self, rows) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(EXPORT_COLUMNS)
+            self._header_sent = True
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+    def finish(self) -> bytes:
+        # An export without rows still gets its header line
+        return b"" if self._header_sent else self.encode([])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written so far, parquet needs a correct `tell()`."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """One parquet row group per chunk, pyarrow is only needed for this format."""
+
+    def __init__(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int32()), ("user_id", pa.int32()), ("date", pa.date32()), ("steps", pa.int32()),
+            ("calories_burned", pa.float64()), ("distance_km", pa.float64()), ("active_minutes", pa.int32()),
+            ("workout_type", pa.string()),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+    def encode(self, rows) -> bytes:
+        columns = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema,
+        ))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {"ndjson": NdjsonEncoder, "csv": CsvEncoder, "parquet": ParquetEncoder}
+
+
+async def export_rows(stmt: Select, fmt: str):
+    """Stream `stmt` through a server-side cursor, yielding encoded chunks.
+
+    The generator owns its session because it keeps reading after the
+    route has returned its StreamingResponse.
+    """
+    encoder = ENCODERS[fmt]()
+    async with get_sessionmaker("read")() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            yield encoder.encode(rows)
+    yield encoder.finish()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+from common.feature_store import FEATURE_STORE_PATH, FeatureStore, load_snapshot, save_snapshot
+from common.outbox import Consumer
+from activity_service.dependencies import logger
+from common.events import ACTIVITY_LOGGED, MOOD_LOGGED
+from database.db_connection import get_engine
+
+# How often the in-memory store is written to FEATURE_STORE_PATH for ml_mood_service
+FEATURE_STORE_SNAPSHOT_SECONDS = float(os.getenv("FEATURE_STORE_SNAPSHOT_SECONDS", "30"))
+# How often a process without the writer lock tries to take it over
+FEATURE_STORE_LOCK_RETRY_SECONDS = float(os.getenv("FEATURE_STORE_LOCK_RETRY_SECONDS", "10"))
+# Held by the one process that consumes events and writes the snapshot
+FEATURE_STORE_LOCK_ID = 4174
+
+
+class FeatureUpdates:
+    """Keeps the feature store in step with `activity.logged` and `mood.logged` outbox events.
+
+    The store is updated in memory and snapshotted in the background when it
+    changed. The snapshot carries the outbox position it reflects, so after a
+    restart the consumer replays exactly the events the snapshot is missing.
+
+    Only the process holding the FEATURE_STORE_LOCK_ID advisory lock consumes
+    events and writes the snapshot, the other workers wait to take over. Its
+    session-level lock lives on a connection of its own, checked on every
+    snapshot, and a new writer starts from the last snapshot written.
+    """
+
+    def __init__(self, path: str = FEATURE_STORE_PATH):
+        self.path = path
+        self.store = FeatureStore()
+        self.dirty = False
+        self.consumer = Consumer("feature_store", self.apply, checkpoints=self)
+        self.writer = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            # Waits for the writer's last snapshot and the lock release
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def apply(self, events):
+        for event in events:
+            if event.topic == ACTIVITY_LOGGED:
+                for day in event.payload["days"]:
+                    self.store.record(event.user_id, date.fromisoformat(day["date"]),
+                                      steps=day["steps"], active_minutes=day["active_minutes"])
+            elif event.topic == MOOD_LOGGED:
+                for day in event.payload["days"]:
+                    self.store.record(event.user_id, date.fromisoformat(day["date"]),
+                                      sleep_hours=day["sleep_hours"], heart_rate_avg=day["heart_rate_avg"])
+        self.dirty = True
+
+    # Checkpoints for the consumer, persisted with the snapshot
+    async def load(self, consumer: str) -> int:
+        return self.store.position
+
+    async def save(self, consumer: str, position: int):
+        self.store.position = position
+
+    async def snapshot(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        arrays = self.store.snapshot_arrays()
+        try:
+            await asyncio.to_thread(save_snapshot, arrays, self.path)
+        except OSError as e:
+            self.dirty = True
+            logger.error("Feature store snapshot to %s failed: %s", self.path, e)
+
+    async def _run(self):
+        while True:
+            try:
+                async with get_engine("write").connect() as lock_connection:
+                    locked = (await lock_connection.execute(
+                        text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": FEATURE_STORE_LOCK_ID}
+                    )).scalar()
+                    await lock_connection.commit()
+                    if locked:
+                        try:
+                            await self._write(lock_connection)
+                        finally:
+                            # Session-level locks outlive the transaction, the pooled connection must not keep it
+                            await lock_connection.execute(
+                                text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": FEATURE_STORE_LOCK_ID}
+                            )
+                            await lock_connection.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Feature store writer failed: %r", e)
+            await asyncio.sleep(FEATURE_STORE_LOCK_RETRY_SECONDS)
+
+    async def _write(self, lock_connection):
+        """Consumes events and snapshots the store until cancelled or the lock's connection fails."""
+        # Another writer may have moved on since this process last wrote
+        self.store = await asyncio.to_thread(load_snapshot, self.path) if os.path.exists(self.path) else FeatureStore()
+        self.dirty = False
+        logger.info("Feature store writer started with %d users", len(self.store))
+        self.writer = True
+        self.consumer.start()
+        try:
+            while True:
+                await asyncio.sleep(FEATURE_STORE_SNAPSHOT_SECONDS)
+                await lock_connection.execute(text("SELECT 1"))
+                await lock_connection.commit()
+                await self.snapshot()
+        except asyncio.CancelledError:
+            await self.consumer.stop()
+            await self.snapshot()
+            raise
+        finally:
+            self.writer = False
+            await self.consumer.stop()
+
+
+feature_updates = FeatureUpdates()
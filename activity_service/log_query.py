@@ -0,0 +1,277 @@
+"""Paged and streamed reads of the daily log files written by logging_config.
+
+Log files are append-only, so byte offsets are stable cursors. Files are
+memory-mapped and searched at C speed for the text or level filter, so only
+candidate lines are looked at in Python, and only the head of a line
+(timestamp and level) is ever parsed. Time-range queries start from a sidecar index
+(`<log>.idx`) of one timestamp per LOG_INDEX_STRIDE bytes, which is extended
+as the file grows instead of being rebuilt.
+"""
+import bisect
+import mmap
+import os
+import re
+import tempfile
+from array import array
+from datetime import date, datetime, timezone
+
+import logging_config
+
+# Bytes of log between two entries of the sidecar timestamp index
+LOG_INDEX_STRIDE = int(os.getenv("LOG_INDEX_STRIDE", str(64 * 1024)))
+# Lines per chunk of a streamed response
+LOG_STREAM_LINES = 1000
+# Records from different threads can reach the file slightly out of time order
+ORDER_SLACK_SECONDS = 1.0
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+# Heads of JsonFormatter (json or orjson separators) and TextFormatter lines
+_JSON_HEAD = re.compile(rb'\{"ts": ?"([^"]+)", ?"level": ?"(\w+)"')
+_TEXT_HEAD = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) (\w+) ")
+
+
+def log_path(day: date, service: str = "activity") -> str:
+    return os.path.join(logging_config.LOG_DIR, f"{service}_{day.isoformat()}.log")
+
+
+def parse_line(line: bytes):
+    """(epoch seconds or None, numeric level) from the head of a log line."""
+    match = _JSON_HEAD.match(line)
+    if match:
+        return datetime.fromisoformat(match[1].decode()).timestamp(), LEVELS.get(match[2].decode(), 0)
+    match = _TEXT_HEAD.match(line)
+    if match:
+        # TextFormatter writes local time
+        seconds = datetime.strptime(match[1].decode(), "%Y-%m-%d %H:%M:%S").timestamp()
+        return seconds + int(match[2]) / 1000, LEVELS.get(match[3].decode(), 0)
+    return None, 0
+
+
+def _epoch(value: datetime):
+    if value is None:
+        return None
+    if value.tzinfo is None:  # naive query times are UTC, like the JSON timestamps
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class LogFilter:
+    """Minimum level, substring and time range, checked on the raw bytes of a line."""
+
+    def __init__(self, level: str = None, text: str = None, start: datetime = None, end: datetime = None):
+        self.min_level = LEVELS[level] if level else 0
+        self.text = text.encode() if text else None
+        self.start = _epoch(start)
+        self.end = _epoch(end)
+        # Find the next line at or above the level without looking at the ones in between. One
+        # pattern per format, an alternation of both would lose the regex engine's literal prefix scan.
+        names = b"|".join(name.encode() for name, value in LEVELS.items() if value >= self.min_level)
+        self._json_level = re.compile(rb'"level": ?"(?:%s)"' % names)
+        self._text_level = re.compile(rb",\d{3} (?:%s) " % names)
+
+    @property
+    def timed(self) -> bool:
+        return self.start is not None or self.end is not None
+
+    @property
+    def seeks(self) -> bool:
+        return self.text is not None or self.min_level > LEVELS["DEBUG"]
+
+    def find(self, mm, start: int, stop: int) -> int:
+        """Offset of the next candidate match in `mm[start:stop]`, -1 if there is none."""
+        if self.text is not None:
+            return mm.find(self.text, start, stop)
+        pattern = self._json_level if mm[:1] == b"{" else self._text_level
+        match = pattern.search(mm, start, stop)
+        return match.start() if match else -1
+
+    def matches(self, line: bytes) -> bool:
+        if self.text is not None and self.text not in line:
+            return False
+        if not self.min_level and not self.timed:
+            return True
+        seconds, level = parse_line(line)
+        if level < self.min_level:
+            return False
+        if self.timed:
+            if seconds is None:
+                return False
+            if self.start is not None and seconds < self.start:
+                return False
+            if self.end is not None and seconds > self.end:
+                return False
+        return True
+
+
+def timestamp_index(path: str):
+    """(offsets, timestamps in ms) of one line every ~LOG_INDEX_STRIDE bytes, kept in `<path>.idx`."""
+    sidecar = f"{path}.idx"
+    entries = array("q")
+    try:
+        with open(sidecar, "rb") as f:
+            entries.frombytes(f.read())
+    except (FileNotFoundError, ValueError):
+        entries = array("q")
+    if len(entries) % 2:
+        entries = array("q")
+    known = len(entries)
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if entries and entries[-2] >= size:  # the log was replaced, start over
+            entries, known = array("q"), 0
+        # Only the lines at the stride boundaries are read, not the bytes in between
+        boundary = entries[-2] + LOG_INDEX_STRIDE if entries else 0
+        if boundary < size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while boundary < size:
+                    start = mm.find(b"\n", boundary - 1, size) + 1 if boundary else 0
+                    if boundary and not start:
+                        break
+                    end = mm.find(b"\n", start, size)
+                    if end < 0:
+                        break
+                    seconds, _ = parse_line(mm[start:end])
+                    if seconds is None:  # e.g. a traceback line of the text format
+                        boundary = end + 1
+                        continue
+                    entries.extend((start, int(seconds * 1000)))
+                    boundary = start + LOG_INDEX_STRIDE
+
+    if len(entries) != known:
+        # Atomic, concurrent requests may extend the same index
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(sidecar) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            entries.tofile(f)
+        os.replace(tmp, sidecar)
+    return entries[0::2], entries[1::2]
+
+
+def time_bounds(path: str, flt: LogFilter):
+    """(lower, upper) byte offsets holding every line in the filter's time range, upper None means end of file."""
+    offsets, stamps = timestamp_index(path)
+    lower, upper = 0, None
+    if flt.start is not None:
+        i = bisect.bisect_left(stamps, (flt.start - ORDER_SLACK_SECONDS) * 1000) - 1
+        if i >= 0:
+            lower = offsets[i]
+    if flt.end is not None:
+        j = bisect.bisect_right(stamps, (flt.end + ORDER_SLACK_SECONDS) * 1000)
+        if j < len(offsets):
+            upper = offsets[j]
+    return lower, upper
+
+
+def _line_start(mm, position: int, stop: int) -> int:
+    """`position` if a line starts there, otherwise the start of the next line."""
+    if position and mm[position - 1:position] != b"\n":
+        newline = mm.find(b"\n", position, stop)
+        return newline + 1 if newline >= 0 else stop
+    return position
+
+
+def _scan(mm, position: int, stop: int, flt: LogFilter, limit: int):
+    """Up to `limit` matching lines from `position`, and the offset after the last complete line looked at."""
+    lines = []
+    while position < stop and len(lines) < limit:
+        if flt.seeks:
+            # Jump to the next candidate line instead of visiting every line
+            hit = flt.find(mm, position, stop)
+            if hit < 0:
+                return lines, max(position, mm.rfind(b"\n", position, stop) + 1)
+            start = max(position, mm.rfind(b"\n", position, hit) + 1)
+        else:
+            start = position
+        end = mm.find(b"\n", start, stop)
+        if end < 0:  # still being written, left for the next call
+            break
+        line = mm[start:end]
+        position = end + 1
+        if flt.matches(line):
+            lines.append(line.decode("utf-8", "replace"))
+    return lines, position
+
+
+def read_forward(path: str, offset: int, flt: LogFilter, limit: int, stop: int = None):
+    """Up to `limit` matching lines from byte `offset` on, and the offset to continue from."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        stop = size if stop is None else min(stop, size)
+        if offset >= stop:
+            return [], max(offset, stop)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan(mm, _line_start(mm, offset, stop), stop, flt, limit)
+
+
+def read_tail(path: str, flt: LogFilter, limit: int, before: int = None):
+    """The last `limit` matching lines ending before byte `before` (default: end of file), oldest first.
+
+    Returns (lines, offset of the oldest line looked at, or 0 when the file
+    start was reached, offset after the newest complete line).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if before is None else min(before, size)
+        if not end:
+            return [], 0, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = last = mm.rfind(b"\n", 0, end) + 1  # complete lines only
+            lines = []
+            while end and len(lines) < limit:
+                if flt.text is not None:
+                    hit = mm.rfind(flt.text, 0, end)
+                    if hit < 0:
+                        end = 0
+                        break
+                    end = mm.find(b"\n", hit, end) + 1
+                start = mm.rfind(b"\n", 0, end - 1) + 1
+                line = mm[start:end - 1]
+                end = start
+                if flt.matches(line):
+                    lines.append(line.decode("utf-8", "replace"))
+    lines.reverse()
+    return lines, end, last
+
+
+def query_logs(path: str, flt: LogFilter, limit: int, cursor: int = None, before: int = None) -> dict:
+    """One page of matching lines: the newest ones (tail) unless a `cursor` or start time is given.
+
+    `next_cursor` continues forward (also to follow new lines from a tail),
+    `prev_cursor` is passed as `before` for older lines. Forward pages of a
+    closed time range end with `next_cursor` None.
+    """
+    lower, upper = time_bounds(path, flt) if flt.timed else (0, None)
+    if cursor is None and flt.start is None:
+        if upper is not None:
+            before = upper if before is None else min(before, upper)
+        lines, first, last = read_tail(path, flt, limit, before)
+        return {"logs": lines, "next_cursor": last, "prev_cursor": first or None}
+    offset = max(cursor or 0, lower)
+    lines, position = read_forward(path, offset, flt, limit, upper)
+    done = upper is not None and position >= upper
+    return {"logs": lines, "next_cursor": None if done else position, "prev_cursor": offset or None}
+
+
+def stream_media_type() -> str:
+    """Media type of stream_logs output: lines are streamed as logging_config wrote them."""
+    return "application/x-ndjson" if logging_config.LOG_FORMAT == "json" else "text/plain; charset=utf-8"
+
+
+def stream_logs(path: str, flt: LogFilter, cursor: int = 0):
+    """Newline-delimited chunks (NDJSON or text, per LOG_FORMAT) of every matching line from `cursor` to the end of the file as it was when the stream started."""
+    lower, upper = time_bounds(path, flt) if flt.timed else (0, None)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        stop = size if upper is None else min(upper, size)
+        if max(cursor, lower) >= stop:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = _line_start(mm, max(cursor, lower), stop)
+            while position < stop:
+                lines, next_position = _scan(mm, position, stop, flt, LOG_STREAM_LINES)
+                if lines:
+                    yield ("\n".join(lines) + "\n").encode()
+                if next_position == position:  # only an unfinished line is left
+                    break
+                position = next_position
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PERIOD_LENGTH = {"week": "1 week", "month": "1 month"}
+
+# Class id for pg_advisory_xact_lock(int, int), the second key is the user_id
+ROLLUP_LOCK_CLASS = 4171
+
+TOTALS = "total_steps, total_calories, total_distance, total_active_minutes, activity_count"
+UPDATE_TOTALS = ", ".join(f"{column} = EXCLUDED.{column}" for column in TOTALS.split(", "))
+
+# Day rows are recomputed from activity_data, only the touched (user_id, date) keys are read
+REFRESH_DAYS = text(f"""
+    INSERT INTO activity_service.activity_rollup (user_id, granularity, period_start, {TOTALS})
+    SELECT CAST(:user_id AS INT), 'day', d.day,
+           COALESCE(SUM(a.steps), 0), COALESCE(SUM(a.calories_burned), 0), COALESCE(SUM(a.distance_km), 0),
+           COALESCE(SUM(a.active_minutes), 0), COUNT(a.id)
+    FROM unnest(CAST(:periods AS date[])) AS d(day)
+    LEFT JOIN activity_service.activity_data a ON a.user_id = :user_id AND a.date = d.day
+    GROUP BY d.day
+    ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET {UPDATE_TOTALS}
+    RETURNING period_start, total_steps, total_active_minutes
+""")
+
+# Week and month rows are summed from at most 31 day rows each
+REFRESH_PERIODS = {
+    granularity: text(f"""
+        INSERT INTO activity_service.activity_rollup (user_id, granularity, period_start, {TOTALS})
+        SELECT CAST(:user_id AS INT), '{granularity}', p.period_start,
+               COALESCE(SUM(r.total_steps), 0), COALESCE(SUM(r.total_calories), 0), COALESCE(SUM(r.total_distance), 0),
+               COALESCE(SUM(r.total_active_minutes), 0), COALESCE(SUM(r.activity_count), 0)
+        FROM unnest(CAST(:periods AS date[])) AS p(period_start)
+        LEFT JOIN activity_service.activity_rollup r
+               ON r.user_id = :user_id AND r.granularity = 'day'
+              AND r.period_start >= p.period_start
+              AND r.period_start < p.period_start + INTERVAL '{length}'
+        GROUP BY p.period_start
+        ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET {UPDATE_TOTALS}
+    """)
+    for granularity, length in PERIOD_LENGTH.items()
+}
+
+# Full rebuild, used after bulk loads that bypass the API
+REBUILD_ALL = [
+    text("DELETE FROM activity_service.activity_rollup"),
+    text(f"""
+        INSERT INTO activity_service.activity_rollup (user_id, granularity, period_start, {TOTALS})
+        SELECT user_id, 'day', date, COALESCE(SUM(steps), 0), COALESCE(SUM(calories_burned), 0),
+               COALESCE(SUM(distance_km), 0), COALESCE(SUM(active_minutes), 0), COUNT(*)
+        FROM activity_service.activity_data
+        GROUP BY user_id, date
+    """),
+] + [
+    text(f"""
+        INSERT INTO activity_service.activity_rollup (user_id, granularity, period_start, {TOTALS})
+        SELECT user_id, '{granularity}', CAST(date_trunc('{granularity}', period_start) AS date),
+               SUM(total_steps), SUM(total_calories), SUM(total_distance), SUM(total_active_minutes), SUM(activity_count)
+        FROM activity_service.activity_rollup
+        WHERE granularity = 'day'
+        GROUP BY user_id, date_trunc('{granularity}', period_start)
+    """)
+    for granularity in PERIOD_LENGTH
+]
+
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the period containing `day`, weeks start on Monday like date_trunc('week')."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def refresh_rollups(db: AsyncSession, user_id: int, days: Iterable[date]):
+    """Bring the user's day/week/month rollups up to date for `days`, inside the caller's transaction.
+
+    Returns the refreshed day rows (period_start, total_steps, total_active_minutes).
+    """
+    days = sorted(set(days))
+    if not days:
+        return []
+
+    # Serializes refreshes per user, so concurrent writers never overwrite each other's totals
+    await db.execute(text("SELECT pg_advisory_xact_lock(:lock_class, :user_id)"),
+                     {"lock_class": ROLLUP_LOCK_CLASS, "user_id": user_id})
+    day_totals = (await db.execute(REFRESH_DAYS, {"user_id": user_id, "periods": days})).all()
+    for granularity, statement in REFRESH_PERIODS.items():
+        periods = sorted({period_start(day, granularity) for day in days})
+        await db.execute(statement, {"user_id": user_id, "periods": periods})
+    return day_totals
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute every rollup row from activity_data and commit."""
+    for statement in REBUILD_ALL:
+        await db.execute(statement)
+    await db.commit()
@@ -1,11 +1,56 @@
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from activity_service.user_routes import router as user_router
 from activity_service.admin_routes import router as admin_router
 from activity_service.dependencies import logger
+from common.token_verifier import token_verifier
+from activity_service.feature_updates import feature_updates
+from activity_service.events import OUTBOX_RELAY, outbox_relay
+from database.db_connection import DB_POOL_SIZE, dispose_engines
+from database.partition_maintenance import PARTITION_MAINTENANCE, partition_maintenance
+from common.metrics import instrument_app
+from common.overload import RouteLimit, protect_app
+from logging_config import configure_logging
 
-app = FastAPI(title="Activity Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Publishes activity events to the mood and notification services, see common/outbox.py
+    if OUTBOX_RELAY:
+        outbox_relay.start()
+    # Rolling per-user features for ml_mood_service, see common/feature_store.py
+    feature_updates.start()
+    # Monthly partitions ahead of time, see database/partition_maintenance.py
+    if PARTITION_MAINTENANCE:
+        partition_maintenance.start()
+    yield
+    await partition_maintenance.stop()
+    await feature_updates.stop()
+    await outbox_relay.stop()
+    # Close pooled connections to user_service (only opened when AUTH_MODE=remote)
+    await token_verifier.aclose()
+    await dispose_engines()
 
-# Include separate routers
-app.include_router(user_router)
-app.include_router(admin_router)
-logger.info("Activity Service Started.")
\ No newline at end of file
+def create_app() -> FastAPI:
+    """The Activity Service app. Engines and the user_service client are created on first use, not here."""
+    # JSON logs to stderr and logs/activity_<date>.log, read back by /admin/activity/logs
+    configure_logging("activity")
+    app = FastAPI(title="Activity Service", lifespan=lifespan)
+
+    # Include separate routers
+    app.include_router(user_router)
+    app.include_router(admin_router)
+    # Admission control, see common/overload.py: batch syncs hold a connection the longest,
+    # exports and log streams run past any request deadline
+    protect_app(app, "activity", {
+        "POST /activity/batch": RouteLimit(concurrency=max(DB_POOL_SIZE // 2, 1), queue=32, timeout=30),
+        "GET /api/v1/admin/activity/export": RouteLimit(concurrency=2, queue=0, timeout=None),
+        "GET /api/v1/admin/activity/logs/stream": RouteLimit(concurrency=2, queue=0, timeout=None),
+    })
+    # Per-route latency, DB time, auth and pool metrics on /metrics, see common/metrics.py
+    instrument_app(app, "activity")
+    logger.info("Activity Service Started.")
+    return app
+
+# `uvicorn activity_service.services:app`, or `--factory activity_service.services:create_app`
+app = create_app()
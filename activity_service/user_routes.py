@@ -1,95 +1,146 @@
-import os
-from functools import wraps
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from datetime import date
+from typing import List, Literal
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.exc import IntegrityError
-from .activity_model import Activity
-from .activity_schema import ActivityCreate, ActivityResponse
-from activity_service.dependencies import validate_token, logger  # Import centralized authentication & logger
-from database.db_connection import get_db
-from user_service.user_model import User
+from .activity_model import ACTIVITY_COLUMNS, SUMMARY_COLUMNS, Activity, ActivityRollup
+from .activity_schema import ActivityCreate, ActivityResponse, ActivityBatchResponse, ActivitySummary
+from .bulk_ingest import upsert_activities, upsert_statement
+from .rollups import period_start, refresh_rollups
+from .events import activity_logged, outbox_relay
+from activity_service.dependencies import logger
+from common.auth import validate_token, resolve_user_id, resolve_writer_id  # Bearer tokens, shared with ml_mood_service
+from common.batch_request import BatchTooLarge, handle_database_error, read_rows, validate_rows
+from database.db_connection import get_db, get_read_db
+from common.fast_json import FAST_RESPONSES, FastJSONResponse, dumps, row_dicts
+from common.response_cache import build_response_cache, cached_response
 
 router = APIRouter(prefix="/activity", tags=["User Activity"])
-# Decorator for handling database errors
-def handle_database_error(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        try:
-            return await func(*args, **kwargs)
-        except IntegrityError as e:
-            logger.error(f"Database IntegrityError: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Data consistency error occurred"
-            )
-        except Exception as e:
-            logger.error(f"Unexpected Database Error: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Unexpected Error: {str(e)}"
-            )
-    return wrapper
-
+# Serialized GET /activity/{id} bodies with ETags, keyed by owner so other users still get their 403
+activity_responses = build_response_cache("activity_response")
 # Log Activity (User Logs Daily Steps, Calories, etc.)
+# Upserted on (user_id, date, workout_type) like /activity/batch: a second workout of the same type that day replaces the first
 @router.post("/", response_model=ActivityResponse)
 @handle_database_error
 async def log_activity(
     activity_data: ActivityCreate,
     current_user: dict = Depends(validate_token),  # Extract `user_email` from token
+    user_id1: int = Depends(resolve_writer_id),  # Cached email -> user_id lookup
     db: AsyncSession = Depends(get_db)
 ):
-    logger.info(f"User {current_user['user_id']} logging activity: {activity_data}")
+    result = await db.execute(upsert_statement(*ACTIVITY_COLUMNS).values(user_id=user_id1, **activity_data.model_dump()))
+    row = result.one()
+    day_totals = await refresh_rollups(db, user_id1, [row.date])
+    await activity_logged(db, user_id1, day_totals)  # Committed together with the activity
+    await db.commit()
+    outbox_relay.wake()
+    if not row.inserted:
+        await activity_responses.invalidate(f"activity:{user_id1}:{row.id}")
 
-    # Fetch `user_id` using SQLAlchemy ORM (instead of raw SQL)
-    stmt = select(User.user_id).where(User.email == current_user["user_id"])
-    result = await db.execute(stmt)
-    user_id1 = result.scalar_one_or_none()
+    logger.debug("Activity %s %s for user %s", row.id, "logged" if row.inserted else "replaced", user_id1)
+    return row._asdict()
+
+# Bulk ingestion for wearable syncs, retried rows upsert on (user_id, date, workout_type)
+@router.post(
+    "/batch",
+    response_model=ActivityBatchResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": ActivityCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}},
+)
+@handle_database_error
+async def log_activity_batch(
+    request: Request,
+    current_user: dict = Depends(validate_token),
+    user_id1: int = Depends(resolve_writer_id),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        raw_rows = await read_rows(request)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed batch: {e}")
 
-    if not user_id1:
-        logger.warning(f"User email {current_user['user_id']} not found in user_service.users")
-        raise HTTPException(status_code=404, detail="User not found")
+    valid, invalid = validate_rows(ActivityCreate, raw_rows)
+    logger.info("User %s syncing %d activities (%d invalid)", user_id1, len(raw_rows), len(invalid))
 
-    # Store the retrieved `user_id` in activity_data
-    new_activity = Activity(**activity_data.model_dump(), user_id=user_id1)
-    
-    db.add(new_activity)
+    results = await upsert_activities(db, user_id1, valid)
+    day_totals = await refresh_rollups(db, user_id1, (activity.date for _, activity in valid))
+    if day_totals:
+        await activity_logged(db, user_id1, day_totals)
     await db.commit()
-    await db.refresh(new_activity)
+    outbox_relay.wake()
+    await activity_responses.invalidate(*(f"activity:{user_id1}:{result.id}" for result in results if result.status == "updated"))
 
-    logger.info(f"Activity logged successfully with ID: {new_activity.id}")
-    return new_activity
+    results = sorted(results + invalid, key=lambda result: result.index)
+    return ActivityBatchResponse(
+        inserted=sum(result.status == "inserted" for result in results),
+        updated=sum(result.status == "updated" for result in results),
+        invalid=len(invalid),
+        results=results,
+    )
+
+# Activity totals per day/week/month, read from the pre-aggregated rollups
+@router.get("/summary", response_model=List[ActivitySummary])
+@handle_database_error
+async def get_activity_summary(
+    start: date,
+    end: date,
+    granularity: Literal["day", "week", "month"] = "day",
+    current_user: dict = Depends(validate_token),
+    user_id1: int = Depends(resolve_user_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if start > end:
+        raise HTTPException(status_code=400, detail="`start` must not be after `end`")
+
+    # Periods are returned whole, including the one `start` falls in
+    stmt = (
+        select(*SUMMARY_COLUMNS)
+        .where(
+            ActivityRollup.user_id == user_id1,
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.period_start >= period_start(start, granularity),
+            ActivityRollup.period_start <= end,
+            ActivityRollup.activity_count > 0,
+        )
+        .order_by(ActivityRollup.period_start)
+    )
+    rows = row_dicts((await db.execute(stmt)).all())
+    return FastJSONResponse(rows) if FAST_RESPONSES else rows
 
 # Get Activity by ID (For Debugging)
 @router.get("/{id}", response_model=ActivityResponse)
 @handle_database_error
 async def get_activity(
     id: int,
+    request: Request,
     current_user: dict = Depends(validate_token),
-    db: AsyncSession = Depends(get_db)
+    user_id1: int = Depends(resolve_user_id),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    logger.info(f"Fetching activity {id} for user {current_user['user_id']}")
-    
-    # Fetch `user_id` using SQLAlchemy ORM (instead of raw SQL)
-    stmt = select(User.user_id).where(User.email == current_user["user_id"])
-    result = await db.execute(stmt)
-    user_id1 = result.scalar_one_or_none()
-    
-    if not user_id1:
-        logger.warning(f"User email {current_user['user_id']} not found in user_service.users")
-        raise HTTPException(status_code=404, detail="User not found")
+    key = f"activity:{user_id1}:{id}"
+    cached = await activity_responses.get(key)
+    if cached is None:
+        generation = activity_responses.generation(key)
+        # if user is valid, filter activity details 
+        result = await db.execute(select(*ACTIVITY_COLUMNS).filter(Activity.id == id))
+        activity = result.one_or_none()
+        
+        if not activity:
+            logger.warning("Activity id is invalid %s", id)
+            raise HTTPException(status_code=403, detail="Invalid Activity")
+        
+        if activity.user_id != user_id1:
+            logger.warning("Unauthorized access attempt by user %s for activity %s", user_id1, id)
+            raise HTTPException(status_code=403, detail="Access Denied")
 
-    # if user is valid, filter activity details 
-    result = await db.execute(select(Activity).filter(Activity.id == id))
-    activity = result.scalar_one_or_none()
-    
-    if not activity:
-        logger.warning(f"Activity id is invalid {id}")
-        raise HTTPException(status_code=403, detail="Invalid Activity")
-    
-    if activity.user_id != user_id1:
-        logger.warning(f"Unauthorized access attempt by user {current_user['user_id']} for activity {id}")
-        raise HTTPException(status_code=403, detail="Access Denied")
-    
-    logger.info(f"Activity {id} fetched successfully")
-    return activity
\ No newline at end of file
+        if FAST_RESPONSES:
+            body = dumps(activity._asdict())
+        else:
+            body = ActivityResponse.model_validate(activity).model_dump_json().encode()
+        cached = await activity_responses.set(key, body, generation)
+    # 304 when If-None-Match carries the current ETag
+    return cached_response(request, cached)
@@ -0,0 +1,117 @@
+"""Show GET /activity/summary latency staying flat as a user's history grows.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_activity_summary --years 1 5 10 --requests 200
+
+For every history size the bench user gets that many years of daily rows
+(generated server-side), then the endpoint is timed over a fixed 90-day
+window at each granularity, next to the equivalent aggregate scan of
+activity_data that the rollups replace.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+
+import httpx
+from jose import jwt
+from sqlalchemy import text
+
+from activity_service.rollups import refresh_rollups
+from activity_service.services import app
+from common.token_verifier import ALGORITHM, SECRET_KEY
+from benchmarks.utils import Timer, print_results, summarize
+from database.db_connection import async_session
+
+BENCH_EMAIL = "bench_summary@example.com"
+HISTORY_END = date(2024, 12, 31)
+WINDOW_DAYS = 90
+
+SCAN_QUERY = text("""
+    SELECT date_trunc(:granularity, date) AS period, SUM(steps), SUM(calories_burned), SUM(distance_km),
+           SUM(active_minutes), COUNT(*)
+    FROM activity_service.activity_data
+    WHERE user_id = :user_id AND date BETWEEN :start AND :end
+    GROUP BY period ORDER BY period
+""")
+
+
+async def prepare_history(years):
+    """(Re)create the bench user with `years` of daily rows and up-to-date rollups."""
+    first_day = HISTORY_END - timedelta(days=365 * years - 1)
+    async with async_session() as db:
+        await db.execute(text(
+            "INSERT INTO user_service.users (name, age, gender, weight, email, password_hash) "
+            "VALUES ('Bench User', 30, 'Male', 70, :email, 'x') ON CONFLICT (email) DO NOTHING"
+        ), {"email": BENCH_EMAIL})
+        user_id = (await db.execute(
+            text("SELECT user_id FROM user_service.users WHERE email = :email"), {"email": BENCH_EMAIL}
+        )).scalar_one()
+        await db.execute(text("DELETE FROM activity_service.activity_data WHERE user_id = :uid"), {"uid": user_id})
+        await db.execute(text("DELETE FROM activity_service.activity_rollup WHERE user_id = :uid"), {"uid": user_id})
+        await db.execute(text("""
+            INSERT INTO activity_service.activity_data
+                (user_id, date, steps, calories_burned, distance_km, active_minutes, workout_type)
+            SELECT :uid, d::date, (random() * 15000)::int, random() * 800, random() * 12, (random() * 120)::int, NULL
+            FROM generate_series(CAST(:first AS date), CAST(:last AS date), INTERVAL '1 day') AS d
+        """), {"uid": user_id, "first": first_day, "last": HISTORY_END})
+        days = [first_day + timedelta(days=i) for i in range((HISTORY_END - first_day).days + 1)]
+        await refresh_rollups(db, user_id, days)
+        await db.commit()
+    return user_id
+
+
+async def time_endpoint(client, token, granularity, n):
+    params = {
+        "start": (HISTORY_END - timedelta(days=WINDOW_DAYS)).isoformat(),
+        "end": HISTORY_END.isoformat(),
+        "granularity": granularity,
+    }
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    with Timer() as total:
+        for _ in range(n):
+            with Timer() as t:
+                response = await client.get("/activity/summary", params=params, headers=headers)
+                response.raise_for_status()
+            latencies.append(t.elapsed)
+    return total.elapsed, latencies
+
+
+async def time_scan(user_id, granularity, n):
+    params = {"granularity": granularity, "user_id": user_id,
+              "start": HISTORY_END - timedelta(days=WINDOW_DAYS), "end": HISTORY_END}
+    latencies = []
+    async with async_session() as db:
+        with Timer() as total:
+            for _ in range(n):
+                with Timer() as t:
+                    (await db.execute(SCAN_QUERY, params)).all()
+                latencies.append(t.elapsed)
+    return total.elapsed, latencies
+
+
+async def main(args):
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for years in args.years:
+            user_id = await prepare_history(years)
+            expire = datetime.utcnow() + timedelta(minutes=30)
+            token = jwt.encode({"sub": BENCH_EMAIL, "role": "user", "uid": user_id, "exp": expire},
+                               SECRET_KEY, algorithm=ALGORITHM)
+            for granularity in ("day", "week", "month"):
+                elapsed, latencies = await time_endpoint(client, token, granularity, args.requests)
+                results.append(summarize(f"{years}y summary/{granularity} (rollup)", args.requests, elapsed, latencies))
+                elapsed, latencies = await time_scan(user_id, granularity, args.requests)
+                results.append(summarize(f"{years}y {granularity} (raw scan query)", args.requests, elapsed, latencies))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""Export millions of synthetic activity rows and check that RSS stays bounded.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_admin_export --rows 2000000 --format ndjson
+
+Rows are generated server-side for a set of bench users, then the export
+generator behind GET /api/v1/admin/activity/export is consumed directly, so
+the measurement covers the server side only (httpx's ASGI transport would
+buffer the whole body). Exits non-zero when RSS grows past --max-rss-mb.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import select, text
+
+from activity_service.activity_model import Activity
+from activity_service.export import EXPORT_COLUMNS, export_rows
+from benchmarks.utils import Timer
+from database.db_connection import async_session
+
+BENCH_EMAIL_PATTERN = "bench_export_%@example.com"
+DAYS_PER_USER = 2000
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * 4096 / 1024 / 1024
+
+
+async def seed(rows):
+    users = -(-rows // DAYS_PER_USER)
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO user_service.users (name, age, gender, weight, email, password_hash)
+            SELECT 'Export Bench ' || i, 30, 'Male', 70, 'bench_export_' || i || '@example.com', 'x'
+            FROM generate_series(1, :users) AS i
+            ON CONFLICT (email) DO NOTHING
+        """), {"users": users})
+        await db.execute(text("""
+            DELETE FROM activity_service.activity_data
+            WHERE user_id IN (SELECT user_id FROM user_service.users WHERE email LIKE :pattern)
+        """), {"pattern": BENCH_EMAIL_PATTERN})
+        await db.execute(text("""
+            INSERT INTO activity_service.activity_data
+                (user_id, date, steps, calories_burned, distance_km, active_minutes, workout_type)
+            SELECT u.user_id, DATE '2015-01-01' + d, (random() * 15000)::int, random() * 800, random() * 12,
+                   (random() * 120)::int, 'walk'
+            FROM (SELECT user_id FROM user_service.users WHERE email LIKE :pattern ORDER BY user_id LIMIT :users) u
+            CROSS JOIN generate_series(0, :days - 1) AS d
+            LIMIT :rows
+        """), {"pattern": BENCH_EMAIL_PATTERN, "users": users, "days": DAYS_PER_USER, "rows": rows})
+        await db.commit()
+
+
+async def main(args):
+    if not args.skip_seed:
+        with Timer() as t:
+            await seed(args.rows)
+        print(f"seeded {args.rows:,} rows in {t.elapsed:.1f}s")
+
+    stmt = select(*(getattr(Activity, column) for column in EXPORT_COLUMNS)).order_by(Activity.id)
+    baseline = peak = current_rss_mb()
+    exported_bytes = chunks = 0
+    with Timer() as t:
+        async for chunk in export_rows(stmt, args.format):
+            exported_bytes += len(chunk)
+            chunks += 1
+            peak = max(peak, current_rss_mb())
+
+    growth = peak - baseline
+    print(f"exported {exported_bytes / 1024 / 1024:,.1f} MiB as {args.format} in {chunks} chunks, {t.elapsed:.1f}s")
+    print(f"RSS baseline {baseline:.1f} MiB, peak {peak:.1f} MiB, growth {growth:.1f} MiB")
+    if growth > args.max_rss_mb:
+        print(f"FAIL: RSS grew more than {args.max_rss_mb} MiB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv", "parquet"], default="ndjson")
+    parser.add_argument("--max-rss-mb", type=float, default=200)
+    parser.add_argument("--skip-seed", action="store_true", help="export what is already in the table")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""Feature lookups per prediction: recomputed from daily rows vs. the feature store.
+
+Runs offline on synthetic data, from the repository root:
+
+    python -m benchmarks.bench_feature_store --users 100000 --days 60
+
+"recompute" filters the user's last 30 days out of an indexed daily frame
+and rolls them, the in-process stand-in for the per-prediction queries it
+replaces (real ones add DB round-trips on top). The store rows are built
+with `FeatureStore.materialize`, whose time and memory are reported too.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.utils import Timer, print_results, summarize
+from common.feature_store import ROLLING_INPUTS, FeatureStore
+from ml_mood_service.features import rolling_features
+
+
+def daily_frame(users, days, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days).date
+    frame = pd.DataFrame({"user_id": np.repeat(np.arange(1, users + 1), days), "date": np.tile(dates, users)})
+    return frame.assign(
+        sleep_hours=rng.normal(7, 1.2, len(frame)).astype(np.float32),
+        heart_rate_avg=rng.normal(72, 8, len(frame)).astype(np.float32),
+        steps=rng.gamma(4.0, 2000.0, len(frame)).astype(np.float32),
+        active_minutes=rng.integers(0, 150, len(frame)).astype(np.float32),
+    )
+
+
+def timed_calls(call, keys):
+    latencies = []
+    with Timer() as t:
+        for key in keys:
+            with Timer() as one:
+                call(key)
+            latencies.append(one.elapsed)
+    return t.elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--recomputes", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    frame = daily_frame(args.users, args.days, args.seed)
+    random.seed(args.seed)
+    keys = [random.randint(1, args.users) for _ in range(args.lookups)]
+
+    with Timer() as t:
+        store = FeatureStore.materialize(frame)
+    size_mb = (store.values.nbytes + store.features.nbytes + store.last_day.nbytes) / 2**20
+    print(f"Materialized {len(frame):,} daily rows for {len(store):,} users in {t.elapsed:.2f}s ({size_mb:.0f} MiB)\n")
+
+    indexed = frame.set_index("user_id").sort_index()
+    cutoff = date.today() - timedelta(days=30)
+
+    def recompute(user_id):
+        history = indexed.loc[[user_id]].reset_index()
+        return rolling_features(history[history["date"] > cutoff]).iloc[-1]
+
+    results = [summarize("recompute from daily rows", args.recomputes,
+                         *timed_calls(recompute, keys[:args.recomputes]))]
+    results.append(summarize("feature store lookup", args.lookups, *timed_calls(store.lookup, keys)))
+
+    today = date.today()
+    inputs = {name: 1.0 for name in ROLLING_INPUTS}
+    results.append(summarize("feature store record", args.lookups,
+                             *timed_calls(lambda user_id: store.record(user_id, today, **inputs), keys)))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
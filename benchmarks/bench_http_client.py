@@ -0,0 +1,121 @@
+"""Service-to-service calls: a plain pooled httpx client vs. common/http_client.ServiceClient.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_http_client --requests 2000 --tokens 50
+
+The stub upstream answers GET /validate_token after --work-ms. Callers
+send --requests concurrent validations spread over --tokens distinct
+tokens, as a burst of first requests after a deploy does when the token
+cache is empty. ServiceClient coalesces identical in-flight calls, so the
+upstream sees about one call per token.
+
+The "outage" rows point both clients at an upstream that hangs until the
+timeout. The plain client waits out the timeout on every call. Once the
+breaker opens, ServiceClient fails at once.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+
+from benchmarks.utils import print_results, summarize
+from common.http_client import CircuitBreaker, ServiceClient
+
+
+class TimeoutTransport(httpx.ASGITransport):
+    """ASGITransport ignores timeouts, enforce the read timeout like a socket transport would."""
+
+    async def handle_async_request(self, request):
+        try:
+            return await asyncio.wait_for(super().handle_async_request(request), request.extensions["timeout"]["read"])
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout("upstream did not answer in time", request=request)
+
+
+def build_upstream(work, down):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/validate_token")
+    async def validate_token(request: Request):
+        app.state.calls += 1
+        await asyncio.sleep(3600 if down else work)
+        return {"user_id": request.headers["authorization"][7:], "role": "user"}
+
+    return app
+
+
+async def plain_get(client, token):
+    return await client.get("/validate_token", headers={"Authorization": f"Bearer {token}"})
+
+
+async def service_get(client, token):
+    return await client.get("/validate_token", headers={"Authorization": f"Bearer {token}"}, coalesce=token)
+
+
+async def run(name, args, down, service):
+    app = build_upstream(args.work_ms / 1000, down)
+    transport = TimeoutTransport(app=app)
+    timeout = args.timeout_ms / 1000
+    if service:
+        client = ServiceClient(name, base_url="http://upstream", timeout=timeout, retries=0, transport=transport,
+                               breaker=CircuitBreaker(name, failures=5, reset_timeout=60))
+        call = service_get
+    else:
+        client = httpx.AsyncClient(transport=transport, base_url="http://upstream", timeout=timeout)
+        call = plain_get
+
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await call(client, f"token-{i % args.tokens}")
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    if down:
+        # Sequential waves, so the breaker has seen failures before the later waves
+        for wave in range(0, args.requests, args.tokens):
+            await asyncio.gather(*(one(i) for i in range(wave, min(wave + args.tokens, args.requests))))
+    else:
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    result = summarize(name, args.requests, elapsed, latencies)
+    result["upstream_calls"] = app.state.calls
+    result["errors"] = errors
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--work-ms", type=float, default=20)
+    parser.add_argument("--timeout-ms", type=float, default=2000)
+    args = parser.parse_args()
+
+    results = [
+        await run("plain: healthy", args, down=False, service=False),
+        await run("ServiceClient: healthy", args, down=False, service=True),
+    ]
+    outage = argparse.Namespace(**{**vars(args), "requests": min(args.requests, args.tokens * 10)})
+    results += [
+        await run("plain: outage", outage, down=True, service=False),
+        await run("ServiceClient: outage", outage, down=True, service=True),
+    ]
+    print_results(results)
+    for result in results:
+        print(f"{result['name']:<24} upstream calls {result['upstream_calls']:>6}, errors {result['errors']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Benchmark the activity POST path with and without the email -> user_id cache.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_identity_cache --requests 2000 --concurrency 20
+
+The app is driven in-process through httpx's ASGI transport, so only the
+database round-trips are real network calls.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+
+import httpx
+from jose import jwt
+from sqlalchemy import text
+
+from activity_service.services import app
+from common.token_verifier import ALGORITHM, SECRET_KEY
+from benchmarks.utils import print_results, run_concurrent, summarize
+from common.identity_cache import identity_cache
+from database.db_connection import async_session
+
+BENCH_EMAIL = "bench_identity@example.com"
+
+
+async def ensure_user():
+    async with async_session() as db:
+        await db.execute(text(
+            "INSERT INTO user_service.users (name, age, gender, weight, email, password_hash) "
+            "VALUES ('Bench User', 30, 'Female', 60, :email, 'x') ON CONFLICT (email) DO NOTHING"
+        ), {"email": BENCH_EMAIL})
+        result = await db.execute(text("SELECT user_id FROM user_service.users WHERE email = :email"), {"email": BENCH_EMAIL})
+        await db.commit()
+        return result.scalar_one()
+
+
+async def clear_activities(user_id):
+    async with async_session() as db:
+        await db.execute(text("DELETE FROM activity_service.activity_data WHERE user_id = :uid"), {"uid": user_id})
+        await db.commit()
+
+
+def make_token(claims):
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    return jwt.encode({**claims, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+async def bench_post(client, name, token, n, concurrency, user_id):
+    # Each phase reuses the same days, which are unique per user
+    await clear_activities(user_id)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def post(i):
+        day = date(2020, 1, 1) + timedelta(days=i % 3650)
+        response = await client.post("/activity/", headers=headers, json={"date": day.isoformat(), "steps": 1000 + i})
+        response.raise_for_status()
+
+    elapsed, latencies = await run_concurrent(post, n, concurrency)
+    return summarize(name, n, elapsed, latencies)
+
+
+async def main(args):
+    user_id = await ensure_user()
+    email_token = make_token({"sub": BENCH_EMAIL, "role": "user"})
+    uid_token = make_token({"sub": BENCH_EMAIL, "role": "user", "uid": user_id})
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # maxsize 0 turns the LRU into a no-op, every request hits user_service.users
+        maxsize = identity_cache.local.maxsize
+        identity_cache.local.maxsize = 0
+        results.append(await bench_post(client, "POST /activity/ without cache", email_token, args.requests, args.concurrency, user_id))
+        identity_cache.local.maxsize = maxsize
+        results.append(await bench_post(client, "POST /activity/ with identity cache", email_token, args.requests, args.concurrency, user_id))
+        results.append(await bench_post(client, "POST /activity/ with uid claim", uid_token, args.requests, args.concurrency, user_id))
+
+    await clear_activities(user_id)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""Admin log queries: readlines() of the whole day vs. tail, cursors, mmap filters and the timestamp index.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_log_query --lines 1000000
+
+Writes a synthetic day of JSON log lines (one per 86 ms, 1% WARNING/ERROR)
+to a temporary directory. Peak Python memory per query is reported next to
+its latency; "index build" is the first time-range query of a day, later
+ones only extend the sidecar.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from activity_service.log_query import LogFilter, query_logs, stream_logs, timestamp_index
+from benchmarks.utils import Timer, print_results, summarize
+
+DAY = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def write_log(path, count):
+    step = 86400 / count
+    with open(path, "w") as f:
+        for i in range(count):
+            level = "ERROR" if i % 200 == 0 else "WARNING" if i % 200 == 1 else "INFO"
+            ts = (DAY + timedelta(seconds=i * step)).isoformat(timespec="milliseconds")
+            f.write(json.dumps({
+                "ts": ts, "level": level, "logger": "activity_service",
+                "msg": f"Activity {i} logged for user {i % 5000}",
+            }) + "\n")
+
+
+def measure(name, call, repeat):
+    latencies = []
+    with Timer() as t:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+    # Separate run, tracing allocations slows the query down several times
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = summarize(name, repeat, t.elapsed, latencies)
+    result["name"] = f"{name} ({peak / 2**20:.1f} MiB)"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "activity_2024-05-01.log")
+        write_log(path, args.lines)
+        print(f"{os.path.getsize(path) / 2**20:.0f} MiB, {args.lines:,} lines")
+        window = LogFilter(start=DAY + timedelta(hours=12), end=DAY + timedelta(hours=12, minutes=10))
+
+        def readlines():
+            with open(path) as f:
+                return f.readlines()
+
+        def rebuild_index():
+            if os.path.exists(f"{path}.idx"):
+                os.remove(f"{path}.idx")
+            timestamp_index(path)
+
+        def linear_window():
+            # What a time-range query costs without the index
+            return [line for line in open(path, "rb") if window.matches(line.rstrip(b"\n"))]
+
+        results = [
+            measure("readlines (before)", readlines, 3),
+            measure("tail 100", lambda: query_logs(path, LogFilter(), 100), args.repeat),
+            measure("page of 100 from a cursor", lambda: query_logs(path, LogFilter(), 100, cursor=10**7), args.repeat),
+            measure("tail 100 ERROR", lambda: query_logs(path, LogFilter(level="ERROR"), 100), args.repeat),
+            measure("text, no match (mmap find)", lambda: query_logs(path, LogFilter(text="no such text"), 100, cursor=0), 3),
+            measure("index build", rebuild_index, 3),
+            measure("index update", lambda: timestamp_index(path), args.repeat),
+            measure("10 min window, indexed", lambda: query_logs(path, window, 1000), args.repeat),
+            measure("10 min window, linear scan", linear_window, 3),
+            measure("stream ERROR lines", lambda: sum(map(len, stream_logs(path, LogFilter(level="ERROR")))), 3),
+        ]
+
+        # The indexed window must hold exactly the lines a full scan finds
+        indexed = query_logs(path, window, 10_000, cursor=0)["logs"]
+        expected = [line.decode() for line in (line.rstrip(b"\n") for line in open(path, "rb")) if window.matches(line)]
+        assert indexed == expected, (len(indexed), len(expected))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Logging cost per request on the calling thread, synchronous handlers vs. logging_config.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_logging --requests 20000
+
+Each simulated request logs three INFO lines shaped like the services' own
+(one with a payload dict). "sync f-strings" is the previous setup: f-string
+messages and stream/file handlers writing on the calling thread. The other
+rows use configure_logging(), whose listener thread writes JSON after the
+timed section; "drain" is how long it needed to catch up.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import Timer, print_results, summarize
+import logging_config
+
+PAYLOAD = {"date": "2024-05-01", "steps": 9000, "calories_burned": 350.5, "workout_type": "run", "token": "secret"}
+
+
+def fstring_request(logger, i):
+    logger.info(f"User user{i}@example.com logging activity: {PAYLOAD}")
+    logger.info(f"Activity logged successfully with ID: {i}")
+    logger.info(f"Fetching activity {i} for user user{i}@example.com")
+
+
+def lazy_request(logger, i):
+    logger.info("User %s logging activity: %s", i, PAYLOAD)
+    logger.info("Activity %s logged", i)
+    logger.info("Fetching activity %s for user %s", i, i)
+
+
+def timed(request, logger, count):
+    latencies = []
+    with Timer() as t:
+        for i in range(count):
+            start = time.perf_counter()
+            request(logger, i)
+            latencies.append(time.perf_counter() - start)
+    return t.elapsed, latencies
+
+
+def sync_handlers(directory):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    for handler in (logging.StreamHandler(sys.stderr), logging.FileHandler(os.path.join(directory, "sync.log"))):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    stderr = sys.stderr
+    results = []
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        sys.stderr = devnull  # Console handlers write here, the comparison is about the calling thread
+        try:
+            logging_config.LOG_DIR = directory
+            logger = logging.getLogger("bench.activity_service")
+
+            sync_handlers(directory)
+            results.append(summarize("sync f-strings", args.requests, *timed(fstring_request, logger, args.requests)))
+
+            for name, rate in (("queue + json", None), ("queue + json, 10% sampled", "0.1")):
+                logging_config.LOG_SAMPLE_RATES = f"bench={rate}" if rate else ""
+                logging_config.configure_logging("bench")
+                results.append(summarize(name, args.requests, *timed(lazy_request, logger, args.requests)))
+                with Timer() as drain:
+                    logging_config.stop_logging()
+                print(f"{name}: listener drained in {drain.elapsed * 1000:.0f} ms", file=stderr)
+
+            logging_config.LOG_SAMPLE_RATES = ""
+            logging_config.configure_logging("bench")
+            logger.setLevel(logging.WARNING)
+            results.append(summarize("level disabled", args.requests, *timed(lazy_request, logger, args.requests)))
+            logging_config.stop_logging()
+        finally:
+            sys.stderr = stderr
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Load test: p99 latency of GET /users/{id} while a login storm is running.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_login_storm --logins 200 --login-concurrency 50
+
+Three phases run against one in-process user_service (one event loop, like
+a single uvicorn worker): no logins, a login storm with bcrypt offloaded to
+the worker pool, and the same storm with bcrypt run inline on the event
+loop as it was before.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.utils import Timer, print_results, run_concurrent, summarize
+from database.db_connection import async_session
+from user_service.password_hashing import password_hasher
+from user_service.user_service import app
+
+BENCH_EMAIL = "bench_login@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+async def ensure_user():
+    hashed = await password_hasher.hash(BENCH_PASSWORD)
+    async with async_session() as db:
+        await db.execute(text(
+            "INSERT INTO user_service.users (name, age, gender, weight, email, password_hash) "
+            "VALUES ('Bench User', 30, 'Female', 60, :email, :hash) "
+            "ON CONFLICT (email) DO UPDATE SET password_hash = EXCLUDED.password_hash"
+        ), {"email": BENCH_EMAIL, "hash": hashed})
+        user_id = (await db.execute(
+            text("SELECT user_id FROM user_service.users WHERE email = :email"), {"email": BENCH_EMAIL}
+        )).scalar_one()
+        await db.commit()
+    return user_id
+
+
+async def run_phase(client, name, user_id, args, storm):
+    storm_task = None
+    if storm:
+        async def login(_):
+            # 503s are expected once the hash queue is full, they are part of the storm
+            await client.post("/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+        storm_task = asyncio.create_task(run_concurrent(login, args.logins, args.login_concurrency))
+        await asyncio.sleep(0.05)  # let the storm ramp up
+
+    latencies = []
+    with Timer() as t:
+        for _ in range(args.reads):
+            with Timer() as one:
+                response = await client.get(f"/users/{user_id}")
+                response.raise_for_status()
+            latencies.append(one.elapsed)
+    if storm_task:
+        await storm_task
+    return summarize(name, args.reads, t.elapsed, latencies)
+
+
+async def main(args):
+    user_id = await ensure_user()
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        results.append(await run_phase(client, "GET /users/{id}, idle", user_id, args, storm=False))
+        results.append(await run_phase(client, "GET /users/{id}, storm, offloaded", user_id, args, storm=True))
+
+        # Reproduce the old behaviour: bcrypt on the event loop thread
+        async def inline(operation, func, *func_args):
+            return password_hasher._timed(operation, func, *func_args)
+
+        password_hasher._run = inline
+        results.append(await run_phase(client, "GET /users/{id}, storm, inline bcrypt", user_id, args, storm=True))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=200, help="GET /users/{id} calls per phase")
+    parser.add_argument("--logins", type=int, default=200, help="login attempts per storm")
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""Per-request cost of common/metrics.py instrumentation and of a running profile.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_metrics --requests 20000
+
+Requests are driven straight through the ASGI interface (no server, no
+HTTP client) against a FastAPI app with one path-parameter route, so the
+difference between rows is the middleware, the histogram observations and
+the profiler's sampling thread.
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+
+from benchmarks.utils import Timer, print_results, summarize
+from common.metrics import add_db_time, instrument_app
+from common.profiler import sample_stacks
+
+
+def build_app(instrumented: bool):
+    app = FastAPI()
+
+    @app.get("/activity/{activity_id}")
+    async def get_activity(activity_id: int):
+        add_db_time(0.0004)  # what one statement reports through database/pool_metrics.py
+        return {"id": activity_id, "steps": 9000}
+
+    if instrumented:
+        instrument_app(app, "bench")
+    return app
+
+
+async def call(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app, count):
+    latencies = []
+    with Timer() as t:
+        for i in range(count):
+            start = time.perf_counter()
+            await call(app, f"/activity/{i}")
+            latencies.append(time.perf_counter() - start)
+    return t.elapsed, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain, instrumented = build_app(False), build_app(True)
+    for app in (plain, instrumented):
+        await run(app, 1000)  # warm up routing and label children
+
+    # Rounds alternate between the apps and the fastest round of each counts, single runs are noisier
+    # than the difference being measured
+    best = {}
+    for _ in range(args.rounds):
+        for name, app in (("no instrumentation", plain), ("instrument_app", instrumented)):
+            elapsed, latencies = await run(app, args.requests)
+            if name not in best or elapsed < best[name][0]:
+                best[name] = (elapsed, latencies)
+    results = [summarize(name, args.requests, *measured) for name, measured in best.items()]
+
+    profiler = threading.Thread(target=sample_stacks, args=(60, 0.005), daemon=True)
+    profiler.start()
+    results.append(summarize("instrument_app + profile at 5 ms", args.requests, *await run(instrumented, args.requests)))
+    print_results(results)
+    base, metered = results[0]["mean_ms"], results[1]["mean_ms"]
+    print(f"Instrumentation overhead: {(metered - base) * 1000:.1f} us per request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""Mood analytics per request: Python loops over rows vs. cached columnar snapshots.
+
+Runs offline on synthetic histories, from the repository root:
+
+    python -m benchmarks.bench_mood_analytics --users 2000 --years 5 --requests 2000
+
+Each request picks a user and a two-year range and computes both
+GET /mood/distribution (by month) and GET /mood/correlation. "python loop"
+walks the user's (date, mood, sleep_hours, heart_rate_avg) rows the way a
+per-request implementation over ORM results would; "snapshot" slices the
+user's MoodHistory and runs ml_mood_service.mood_history's vectorized
+reductions. Building the snapshots from row chunks (what MoodSnapshots
+does on a miss, minus the DB round-trips) is timed separately.
+"""
+import argparse
+import math
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import numpy as np
+
+from benchmarks.utils import Timer, print_results, summarize
+from ml_mood_service.features import MOOD_LABELS
+from ml_mood_service.mood_history import MOOD_CHUNK_ROWS, MoodHistory, correlations, distribution
+
+SCORES = {"Happy": 2, "Neutral": 1, "Stressed": 0}
+
+
+def user_rows(rng, days, first_day):
+    moods = rng.choice(MOOD_LABELS + [None], days, p=[0.3, 0.35, 0.3, 0.05]).tolist()
+    sleep = np.round(rng.normal(7, 1.2, days), 1).tolist()
+    heart = rng.integers(50, 110, days).tolist()
+    return [(first_day + timedelta(days=i), moods[i], sleep[i], heart[i]) for i in range(days)]
+
+
+def loop_request(rows, start, end):
+    """Both endpoints with per-row Python over the user's rows."""
+    counts = {}
+    pairs = {"sleep_hours": [], "heart_rate_avg": []}
+    for day, mood, sleep, heart in rows:
+        if not start <= day <= end or mood is None:
+            continue
+        month = counts.setdefault(day.replace(day=1), Counter())
+        month[mood] += 1
+        for name, value in (("sleep_hours", sleep), ("heart_rate_avg", heart)):
+            if value is not None:
+                pairs[name].append((value, SCORES[mood], mood))
+    result = {}
+    for name, values in pairs.items():
+        n = len(values)
+        mean_x = sum(v[0] for v in values) / n
+        mean_y = sum(v[1] for v in values) / n
+        cov = sum((v[0] - mean_x) * (v[1] - mean_y) for v in values)
+        var = sum((v[0] - mean_x) ** 2 for v in values) * sum((v[1] - mean_y) ** 2 for v in values)
+        by_mood = {}
+        for value, _, mood in values:
+            by_mood.setdefault(mood, []).append(value)
+        result[name] = (cov / math.sqrt(var), {mood: sum(v) / len(v) for mood, v in by_mood.items()})
+    return sorted(counts.items()), result
+
+
+def snapshot_request(history, start, end):
+    window = history.between(start, end)
+    return distribution(window, "month"), correlations(window)
+
+
+def timed(requests, call):
+    latencies = []
+    with Timer() as t:
+        for args in requests:
+            with Timer() as one:
+                call(*args)
+            latencies.append(one.elapsed)
+    return t.elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    days = 365 * args.years
+    first_day = date(2020, 1, 1)
+    rows = [user_rows(rng, days, first_day) for _ in range(args.users)]
+    print(f"{args.users} users x {days} days = {args.users * days:,} rows")
+
+    with Timer() as build:
+        snapshots = [
+            MoodHistory.concat([
+                MoodHistory.from_rows(user[i:i + MOOD_CHUNK_ROWS]) for i in range(0, len(user), MOOD_CHUNK_ROWS)
+            ])
+            for user in rows
+        ]
+    size = sum(sum(getattr(h, f).nbytes for f in MoodHistory.__dataclass_fields__) for h in snapshots)
+    print(f"Snapshots built in {build.elapsed:.2f}s ({build.elapsed / args.users * 1000:.2f} ms per user), "
+          f"{size / 2**20:.1f} MiB")
+
+    picker = random.Random(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        user = picker.randrange(args.users)
+        start = first_day + timedelta(days=picker.randrange(max(days - 730, 1)))
+        requests.append((user, start, start + timedelta(days=729)))
+
+    # The same answers either way
+    user, start, end = requests[0]
+    months, factors = loop_request(rows[user], start, end)
+    periods, correlation = snapshot_request(snapshots[user], start, end)
+    assert [dict(counts) for _, counts in months] == [{k: v for k, v in p["counts"].items() if v} for p in periods]
+    assert math.isclose(factors["sleep_hours"][0], correlation["sleep_hours"]["correlation"], rel_tol=1e-6)
+
+    print_results([
+        summarize("python loop", args.requests, *timed(requests, lambda u, s, e: loop_request(rows[u], s, e))),
+        summarize("snapshot", args.requests, *timed(requests, lambda u, s, e: snapshot_request(snapshots[u], s, e))),
+    ])
+
+
+if __name__ == "__main__":
+    main()
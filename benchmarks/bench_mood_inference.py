@@ -0,0 +1,76 @@
+"""Throughput and latency of the mood inference server, with and without micro-batching.
+
+Run from the repository root after training a model (ml_mood_service/train_model.py):
+
+    python -m benchmarks.bench_mood_inference --requests 5000 --concurrency 200
+
+Inputs are random rows shaped like mood_service.mood_data. The app runs
+in-process (lifespan included), so the worker processes are real.
+"""
+import argparse
+import asyncio
+
+import httpx
+import numpy as np
+
+from benchmarks.utils import Timer, print_results, run_concurrent, summarize
+from database.seed_db import LOCATIONS, WEATHER
+from ml_mood_service.app import app, predictor
+
+
+def mood_rows(count, seed=7):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "heart_rate_avg": float(hr), "sleep_hours": float(sleep),
+            "weather_conditions": str(weather), "location": str(location),
+        }
+        for hr, sleep, weather, location in zip(
+            rng.normal(72, 8, count).round(), rng.normal(7, 1.2, count).clip(3, 11).round(1),
+            rng.choice(WEATHER, count), rng.choice(LOCATIONS, count),
+        )
+    ]
+
+
+async def bench_single(client, name, rows, concurrency):
+    async def predict(i):
+        response = await client.post("/predict", json=rows[i])
+        response.raise_for_status()
+
+    elapsed, latencies = await run_concurrent(predict, len(rows), concurrency)
+    return summarize(name, len(rows), elapsed, latencies)
+
+
+async def bench_batch(client, rows, batch_size):
+    latencies = []
+    with Timer() as total:
+        for start in range(0, len(rows), batch_size):
+            with Timer() as t:
+                response = await client.post("/predict/batch", json={"items": rows[start:start + batch_size]})
+                response.raise_for_status()
+            latencies.append(t.elapsed)
+    return summarize(f"/predict/batch x{batch_size} (rows/s)", len(rows), total.elapsed, latencies)
+
+
+async def main(args):
+    rows = mood_rows(args.requests)
+    async with app.router.lifespan_context(app):
+        if not predictor.ready:
+            raise SystemExit("Model is not loaded, train one with ml_mood_service/train_model.py first")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            results = [await bench_single(client, "/predict, micro-batched", rows, args.concurrency)]
+            max_batch = predictor.batcher.max_batch
+            predictor.batcher.max_batch = 1
+            results.append(await bench_single(client, "/predict, batching disabled", rows, args.concurrency))
+            predictor.batcher.max_batch = max_batch
+            results.append(await bench_batch(client, rows, args.batch_size))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""Notification delivery throughput, one-at-a-time vs. the batched asyncio worker.
+
+Offline by default: notifications come from an in-memory queue that adds
+--db-latency per claim/complete round-trip, delivery goes through FakeSender.
+Run from the repository root:
+
+    python -m benchmarks.bench_notifications --notifications 5000 --send-latency 0.05
+
+With --postgres, the rows are queued in notification_service.notifications
+(DATABASE_URL, migrations applied, user --user-id must exist) and drained
+by --processes worker processes claiming with SKIP LOCKED.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.utils import Timer, print_results, summarize
+from notification_service.queue import ENQUEUE, MemoryQueue, PostgresQueue
+from notification_service.senders import FakeSender, Notification
+from notification_service.worker import NotificationWorker
+
+CHANNELS = ["email", "sms", "push"]
+
+
+class SlowMemoryQueue(MemoryQueue):
+    def __init__(self, notifications, db_latency):
+        super().__init__(notifications)
+        self.db_latency = db_latency
+
+    async def claim(self, batch_size, lease):
+        await asyncio.sleep(self.db_latency)
+        return await super().claim(batch_size, lease)
+
+    async def complete(self, results):
+        await asyncio.sleep(self.db_latency)
+        await super().complete(results)
+
+
+async def drain(queue, worker):
+    while not queue.done:
+        await worker.run(until_empty=True)
+        await asyncio.sleep(0.01)  # retries not yet due
+
+
+async def offline(args, name, batch_size, concurrency, lanes):
+    notifications = [Notification(i, 1, CHANNELS[i % len(CHANNELS)], "bench", 0) for i in range(args.notifications)]
+    queue = SlowMemoryQueue(notifications, args.db_latency)
+    sender = FakeSender(args.send_latency, args.failure_rate, seed=42)
+    worker = NotificationWorker(queue, sender, rates={}, batch_size=batch_size, concurrency=concurrency, lanes=lanes)
+    with Timer() as t:
+        await drain(queue, worker)
+    return summarize(name, sender.sent, t.elapsed)
+
+
+async def _drain_postgres(args):
+    from database.db_connection import dispose_engines
+
+    worker = NotificationWorker(PostgresQueue(), FakeSender(args.send_latency, args.failure_rate), rates={})
+    await worker.run(until_empty=True)
+    await dispose_engines()
+    return worker.counts["sent"]
+
+
+def drain_postgres(args):
+    return asyncio.run(_drain_postgres(args))
+
+
+async def enqueue_postgres(args):
+    from database.db_connection import async_session, dispose_engines
+
+    async with async_session() as db:
+        await db.execute(ENQUEUE, {
+            "user_ids": [args.user_id] * args.notifications,
+            "channels": [CHANNELS[i % len(CHANNELS)] for i in range(args.notifications)],
+            "texts": ["bench"] * args.notifications,
+        })
+        await db.commit()
+    await dispose_engines()
+
+
+def postgres(args):
+    asyncio.run(enqueue_postgres(args))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        sent = sum(pool.map(drain_postgres, [args] * args.processes))
+    return summarize(f"postgres, {args.processes} worker process(es)", sent, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notifications", type=int, default=5000)
+    parser.add_argument("--send-latency", type=float, default=0.05, help="seconds per FakeSender delivery")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of transient delivery failures")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per simulated queue round-trip")
+    parser.add_argument("--serial-notifications", type=int, default=200, help="sample size for the serial baseline")
+    parser.add_argument("--postgres", action="store_true")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--user-id", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.postgres:
+        print_results([postgres(args)])
+        return
+
+    serial = argparse.Namespace(**{**vars(args), "notifications": args.serial_notifications})
+    results = [
+        asyncio.run(offline(serial, "one at a time", batch_size=1, concurrency=1, lanes=1)),
+        asyncio.run(offline(args, "batch 100, 1 lane", batch_size=100, concurrency=200, lanes=1)),
+        asyncio.run(offline(args, "batch 100, 2 lanes", batch_size=100, concurrency=200, lanes=2)),
+    ]
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
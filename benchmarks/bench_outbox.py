@@ -0,0 +1,128 @@
+"""Outbox cost on the write path, relay throughput and publish-to-consume lag.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_outbox --events 20000
+    OUTBOX_BROKER=memory python -m benchmarks.bench_outbox
+
+Write path: a transaction updating one rollup row, with and without the
+outbox insert. Relay: --events queued events published in batches, and the
+time until a consumer has seen all of them.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from benchmarks.utils import Timer, print_results, run_concurrent, summarize
+from common.outbox import Consumer, OutboxRelay, add_event, get_broker
+from database.db_connection import async_session, dispose_engines
+
+BENCH_EMAIL = "bench_outbox@example.com"
+# A day no real activity falls on, removed again by cleanup()
+TOUCH_ROLLUP = text("""
+    INSERT INTO activity_service.activity_rollup (user_id, granularity, period_start, total_steps)
+    VALUES (:user_id, 'day', DATE '1900-01-01', 1)
+    ON CONFLICT (user_id, granularity, period_start) DO UPDATE SET total_steps = activity_rollup.total_steps + 1
+""")
+
+
+async def ensure_user():
+    async with async_session() as db:
+        await db.execute(text(
+            "INSERT INTO user_service.users (name, age, gender, weight, email, password_hash) "
+            "VALUES ('Bench User', 30, 'Female', 60, :email, 'x') ON CONFLICT (email) DO NOTHING"
+        ), {"email": BENCH_EMAIL})
+        result = await db.execute(text("SELECT user_id FROM user_service.users WHERE email = :email"), {"email": BENCH_EMAIL})
+        await db.commit()
+        return result.scalar_one()
+
+
+async def write(user_id, with_event):
+    async with async_session() as db:
+        await db.execute(TOUCH_ROLLUP, {"user_id": user_id})
+        if with_event:
+            await add_event(db, "bench.touched", user_id, {"days": [{"date": "1900-01-01", "steps": 1}]})
+        await db.commit()
+
+
+async def cleanup(user_id):
+    async with async_session() as db:
+        await db.execute(text(
+            "DELETE FROM activity_service.activity_rollup WHERE user_id = :user_id AND period_start = DATE '1900-01-01'"
+        ), {"user_id": user_id})
+        await db.execute(text("DELETE FROM activity_service.outbox WHERE topic LIKE 'bench.%'"))
+        await db.execute(text("DELETE FROM activity_service.outbox_checkpoints WHERE consumer = 'bench'"))
+        await db.commit()
+
+
+async def queue_events(user_id, count):
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO activity_service.outbox (topic, user_id, payload)
+            SELECT 'bench.queued', :user_id, '{"days": []}'::jsonb FROM generate_series(1, :count)
+        """), {"user_id": user_id, "count": count})
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    user_id = await ensure_user()
+    await cleanup(user_id)
+    results = []
+    for name, with_event in (("write without outbox event", False), ("write with outbox event", True)):
+        elapsed, latencies = await run_concurrent(lambda i: write(user_id, with_event), args.writes, args.concurrency)
+        results.append(summarize(name, args.writes, elapsed, latencies))
+
+    # Start from the current end of the outbox, only the benchmark's events count
+    relay = OutboxRelay(get_broker())
+    while await relay.relay_once():
+        pass
+    relay.published = 0
+    async with async_session() as db:
+        start_position = (await db.execute(text("SELECT COALESCE(MAX(position), 0) FROM activity_service.outbox"))).scalar()
+
+    seen = asyncio.Event()
+    consumed = []
+
+    async def handler(events):
+        consumed.extend(event for event in events if event.topic == "bench.queued")
+        if len(consumed) >= args.events:
+            seen.set()
+
+    class StartAt:
+        async def load(self, consumer):
+            return start_position
+
+        async def save(self, consumer, position):
+            pass
+
+    consumer = Consumer("bench", handler, checkpoints=StartAt())
+    consumer.start()
+    await asyncio.sleep(0.5)  # subscribed and caught up
+    await queue_events(user_id, args.events)
+
+    with Timer() as t:
+        while await relay.relay_once():
+            pass
+    results.append(summarize(f"relay, batches of {relay.batch_size}", relay.published, t.elapsed))
+    await asyncio.wait_for(seen.wait(), 60)
+    print(f"Consumer had all {args.events:,} events {(time.perf_counter() - t.start) * 1000:.0f} ms "
+          "after the relay started")
+
+    await consumer.stop()
+    await cleanup(user_id)
+    await dispose_engines()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
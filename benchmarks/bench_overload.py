@@ -0,0 +1,93 @@
+"""Burst behaviour with and without common/overload.py admission control.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_overload --rate 1000 --seconds 3
+
+The route holds one of --pool "connections" for --work-ms, like a handler
+waiting on the DB pool, so it serves pool / work requests per second.
+Requests then arrive at --rate per second, open loop, above that capacity.
+Unprotected, every request queues on the pool and latency grows with the
+backlog. With protect_app, requests beyond the concurrency slots and the
+bounded queue are answered 503 at once, and admitted ones finish within
+the queue timeout plus their own work. "Goodput" counts successes that
+finished within --slo-ms.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.utils import percentile
+from common.overload import RouteLimit, protect_app
+
+
+def build_app(pool_size, work, protected, queue_timeout):
+    app = FastAPI()
+    pool = asyncio.Semaphore(pool_size)
+
+    @app.get("/work")
+    async def work_route():
+        async with pool:
+            await asyncio.sleep(work)
+        return {"ok": True}
+
+    if protected:
+        protect_app(app, "bench", {
+            "GET /work": RouteLimit(concurrency=pool_size, queue=pool_size * 4, queue_timeout=queue_timeout),
+        })
+    return app
+
+
+async def burst(app, args):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call():
+            start = time.perf_counter()
+            response = await client.get("/work")
+            latencies.append((response.status_code, time.perf_counter() - start))
+
+        calls = []
+        started = time.perf_counter()
+        for i in range(int(args.rate * args.seconds)):
+            # Arrivals keep their schedule however slow the responses get
+            await asyncio.sleep(max(0.0, started + i / args.rate - time.perf_counter()))
+            calls.append(asyncio.create_task(call()))
+        await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - started
+    ok = [latency for status, latency in latencies if status == 200]
+    shed = [latency for status, latency in latencies if status != 200]
+    return {
+        "elapsed_s": elapsed,
+        "ok": len(ok),
+        "shed": len(shed),
+        "goodput_per_s": sum(latency <= args.slo_ms / 1000 for latency in ok) / elapsed,
+        "ok_p50_ms": percentile(ok, 50) * 1000,
+        "ok_p99_ms": percentile(ok, 99) * 1000,
+        "shed_p99_ms": percentile(shed, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1000)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--pool", type=int, default=10)
+    parser.add_argument("--work-ms", type=float, default=20)
+    parser.add_argument("--queue-timeout", type=float, default=0.25)
+    parser.add_argument("--slo-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    print(f"Capacity {args.pool / args.work_ms * 1000:.0f}/s, arrivals {args.rate:.0f}/s for {args.seconds:.0f}s")
+    print(f"{'':<16} {'ok':>6} {'shed':>6} {'goodput/s':>10} {'ok p50':>9} {'ok p99':>9} {'shed p99':>9}")
+    for name, protected in (("unprotected", False), ("protect_app", True)):
+        result = await burst(build_app(args.pool, args.work_ms / 1000, protected, args.queue_timeout), args)
+        print(f"{name:<16} {result['ok']:>6} {result['shed']:>6} {result['goodput_per_s']:>10.1f} "
+              f"{result['ok_p50_ms']:>7.1f}ms {result['ok_p99_ms']:>7.1f}ms {result['shed_p99_ms']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Query plans and latency for activity lookups before/after indexing and partitioning.
+
+Requires DATABASE_URL_SYNC and a database migrated with database/migrate.py
+(for `public.ensure_monthly_partitions`). Run from the repository root:
+
+    python -m benchmarks.bench_query_plans --rows 10000000
+
+Everything is built in a scratch `bench_plans` schema: `activity_flat` has
+the original layout (serial primary key only), `activity_tuned` the layout
+of migration 0002 (monthly partitions, daily key). Both hold the same rows.
+Use --keep to reuse the loaded tables on the next run.
+"""
+import argparse
+import os
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL_SYNC")
+
+DAYS = 3650  # ten years of daily rows per user
+
+SETUP = """
+    DROP SCHEMA IF EXISTS bench_plans CASCADE;
+    CREATE SCHEMA bench_plans;
+    CREATE TABLE bench_plans.activity_flat (
+        id SERIAL PRIMARY KEY, user_id INT NOT NULL, date DATE NOT NULL, steps INT, calories_burned FLOAT,
+        distance_km FLOAT, active_minutes INT, workout_type VARCHAR(50)
+    );
+    CREATE TABLE bench_plans.activity_tuned (
+        id INT NOT NULL, user_id INT NOT NULL, date DATE NOT NULL, steps INT, calories_burned FLOAT,
+        distance_km FLOAT, active_minutes INT, workout_type VARCHAR(50),
+        PRIMARY KEY (id, date),
+        CONSTRAINT activity_tuned_daily_key UNIQUE NULLS NOT DISTINCT (user_id, date, workout_type)
+    ) PARTITION BY RANGE (date);
+    CREATE TABLE bench_plans.activity_tuned_default PARTITION OF bench_plans.activity_tuned DEFAULT;
+    SELECT public.ensure_monthly_partitions('bench_plans.activity_tuned', DATE '2015-01-01', 3);
+"""
+
+LOAD = [
+    """
+    INSERT INTO bench_plans.activity_flat (user_id, date, steps, calories_burned, distance_km, active_minutes)
+    SELECT u, DATE '2015-01-01' + d, (random() * 15000)::int, random() * 800, random() * 12, (random() * 120)::int
+    FROM generate_series(1, %(users)s) AS u CROSS JOIN generate_series(0, %(days)s - 1) AS d
+    """,
+    "INSERT INTO bench_plans.activity_tuned SELECT * FROM bench_plans.activity_flat",
+    "ANALYZE bench_plans.activity_flat",
+    "ANALYZE bench_plans.activity_tuned",
+]
+
+QUERIES = {
+    "one user, 90 days": """
+        SELECT * FROM bench_plans.{table}
+        WHERE user_id = %(user_id)s AND date BETWEEN DATE '2020-01-01' AND DATE '2020-03-31'
+    """,
+    "one user-day": """
+        SELECT * FROM bench_plans.{table} WHERE user_id = %(user_id)s AND date = DATE '2021-06-15'
+    """,
+    "all users, one month totals": """
+        SELECT user_id, SUM(steps) FROM bench_plans.{table}
+        WHERE date >= DATE '2022-02-01' AND date < DATE '2022-03-01' GROUP BY user_id
+    """,
+}
+
+
+def timed(cursor, sql, params, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="reuse bench_plans tables from a previous run")
+    args = parser.parse_args()
+
+    users = max(1, args.rows // DAYS)
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    if not args.keep:
+        cursor.execute(SETUP)
+        start = time.perf_counter()
+        for statement in LOAD:
+            cursor.execute(statement, {"users": users, "days": DAYS})
+        print(f"Loaded {users * DAYS:,} rows per table in {time.perf_counter() - start:.1f}s\n")
+
+    params = {"user_id": users // 2 or 1}
+    for name, template in QUERIES.items():
+        print(f"=== {name}")
+        for table in ("activity_flat", "activity_tuned"):
+            sql = template.format(table=table)
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + sql, params)
+            plan = [row[0] for row in cursor.fetchall()]
+            median = timed(cursor, sql, params, args.repeats)
+            print(f"--- {table}: median {median * 1000:.2f} ms")
+            print("\n".join(plan if len(plan) <= 10 else plan[:8] + ["  ..."] + plan[-2:]))
+        print()
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark GET /users/{user_id} and GET /activity/{id} with and without the response cache.
+
+Requires DATABASE_URL pointing at a database migrated with database/migrate.py.
+Run from the repository root:
+
+    python -m benchmarks.bench_response_cache --requests 5000 --concurrency 20
+
+Both apps are driven in-process through httpx's ASGI transport. Each
+endpoint is measured uncached (every request reads the database), with a
+warm cache, and with a warm cache where the client revalidates with
+If-None-Match and gets an empty 304.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+
+import httpx
+from jose import jwt
+from sqlalchemy import text
+
+from activity_service.services import app as activity_app
+from common.token_verifier import ALGORITHM, SECRET_KEY
+from activity_service.user_routes import activity_responses
+from benchmarks.utils import print_results, run_concurrent, summarize
+from database.db_connection import async_session
+from user_service.user_service import app as user_app, user_responses
+
+BENCH_EMAIL = "bench_response_cache@example.com"
+
+
+async def ensure_rows():
+    async with async_session() as db:
+        await db.execute(text(
+            "INSERT INTO user_service.users (name, age, gender, weight, email, password_hash) "
+            "VALUES ('Bench User', 30, 'Female', 60, :email, 'x') ON CONFLICT (email) DO NOTHING"
+        ), {"email": BENCH_EMAIL})
+        result = await db.execute(text("SELECT user_id FROM user_service.users WHERE email = :email"), {"email": BENCH_EMAIL})
+        user_id = result.scalar_one()
+        result = await db.execute(text(
+            "INSERT INTO activity_service.activity_data (user_id, date, steps, calories_burned, workout_type) "
+            "VALUES (:uid, :day, 9000, 350.5, 'walk') "
+            "ON CONFLICT (user_id, date, workout_type) DO UPDATE SET steps = EXCLUDED.steps RETURNING id"
+        ), {"uid": user_id, "day": date(2020, 1, 1)})
+        activity_id = result.scalar_one()
+        await db.commit()
+        return user_id, activity_id
+
+
+def make_token(claims):
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    return jwt.encode({**claims, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+async def bench_get(client, name, path, headers, n, concurrency, expected=200):
+    async def get(i):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == expected, response.status_code
+
+    elapsed, latencies = await run_concurrent(get, n, concurrency)
+    return summarize(name, n, elapsed, latencies)
+
+
+async def bench_endpoint(client, label, cache, path, headers, args):
+    results = []
+    # maxsize 0 turns the LRU into a no-op, every request reads the database
+    maxsize = cache.local.maxsize
+    cache.local.maxsize = 0
+    cache.local.clear()
+    results.append(await bench_get(client, f"{label} uncached", path, headers, args.requests, args.concurrency))
+    cache.local.maxsize = maxsize
+
+    etag = (await client.get(path, headers=headers)).headers["ETag"]  # warms the cache
+    results.append(await bench_get(client, f"{label} warm cache", path, headers, args.requests, args.concurrency))
+    results.append(await bench_get(
+        client, f"{label} If-None-Match (304)", path, {**headers, "If-None-Match": etag},
+        args.requests, args.concurrency, expected=304,
+    ))
+    return results
+
+
+async def main(args):
+    user_id, activity_id = await ensure_rows()
+    token = make_token({"sub": BENCH_EMAIL, "role": "user", "uid": user_id})
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=user_app), base_url="http://bench") as client:
+        results += await bench_endpoint(client, "GET /users/{id}", user_responses, f"/users/{user_id}", {}, args)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=activity_app), base_url="http://bench") as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        results += await bench_endpoint(client, "GET /activity/{id}", activity_responses, f"/activity/{activity_id}", headers, args)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+"""Cost per 1k activity rows of building and serializing list responses.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_serialization --rows 1000 --requests 200
+
+Rows come from an in-memory SQLite copy of activity_data, fetched either
+as ORM entities or as Core rows of ACTIVITY_COLUMNS. Responses are driven
+straight through the ASGI interface against FastAPI routes shaped like
+GET /api/v1/admin/activity/all, so the rows measure the fetch and the
+response path: ActivityPage validation of entities, Rows or row dicts, or
+FAST_RESPONSES' orjson encoding of the row dicts (common/fast_json.py).
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from activity_service.activity_model import ACTIVITY_COLUMNS, Activity
+from activity_service.activity_schema import ActivityPage
+from benchmarks.utils import Timer, print_results, summarize
+from common.fast_json import FastJSONResponse, orjson, row_dicts
+
+
+def build_engine(count):
+    engine = create_engine("sqlite://").execution_options(schema_translate_map={"activity_service": None})
+    Activity.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(Activity.__table__.insert(), [
+            {
+                "id": i, "user_id": i % 100, "date": date(2024, 1, 1) + timedelta(days=i % 365), "steps": 8000 + i,
+                "calories_burned": 420.5, "distance_km": 6.2, "active_minutes": 55, "workout_type": "run",
+            }
+            for i in range(1, count + 1)
+        ])
+    return engine
+
+
+def fetch_entities(engine):
+    with Session(engine, expire_on_commit=False) as db:
+        return db.scalars(select(Activity).order_by(Activity.id)).all()
+
+
+def fetch_rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(*ACTIVITY_COLUMNS).order_by(Activity.id)).all()
+
+
+def build_app(entities, rows):
+    app = FastAPI()
+
+    @app.get("/entities", response_model=ActivityPage)
+    async def entities_page():
+        return {"items": entities, "next_after_id": None}
+
+    @app.get("/rows", response_model=ActivityPage)
+    async def rows_page():
+        return {"items": rows, "next_after_id": None}
+
+    @app.get("/dicts", response_model=ActivityPage)
+    async def dicts_page():
+        return {"items": row_dicts(rows), "next_after_id": None}
+
+    @app.get("/fast")
+    async def fast_page():
+        return FastJSONResponse({"items": row_dicts(rows), "next_after_id": None})
+
+    return app
+
+
+async def call(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def run(app, path, count):
+    latencies = []
+    with Timer() as t:
+        for _ in range(count):
+            start = time.perf_counter()
+            await call(app, path)
+            latencies.append(time.perf_counter() - start)
+    return t.elapsed, latencies
+
+
+def time_fetch(fetch, engine, count):
+    latencies = []
+    with Timer() as t:
+        for _ in range(count):
+            start = time.perf_counter()
+            fetch(engine)
+            latencies.append(time.perf_counter() - start)
+    return t.elapsed, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = build_engine(args.rows)
+    app = build_app(fetch_entities(engine), fetch_rows(engine))
+    sizes = {path: await call(app, path) for path in ("/entities", "/rows", "/dicts", "/fast")}  # also warms up
+
+    results = [
+        summarize("fetch ORM entities", args.requests, *time_fetch(fetch_entities, engine, args.requests)),
+        summarize("fetch Core rows", args.requests, *time_fetch(fetch_rows, engine, args.requests)),
+        summarize("entities + response model", args.requests, *await run(app, "/entities", args.requests)),
+        summarize("Core rows + response model", args.requests, *await run(app, "/rows", args.requests)),
+        summarize("row dicts + response model", args.requests, *await run(app, "/dicts", args.requests)),
+    ]
+    if orjson is not None:
+        results.append(summarize("Core rows + FastJSONResponse", args.requests, *await run(app, "/fast", args.requests)))
+    print_results(results)
+
+    scale = 1000 / args.rows
+    print(f"\nPer 1k rows ({args.rows} rows per response, {sizes['/rows']:,} bytes):")
+    for result in results:
+        print(f"  {result['name']:<32} {result['mean_ms'] * scale:8.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""Cold start of each service entry point, with a startup-time budget.
+
+Offline, from the repository root:
+
+    python -m benchmarks.bench_startup --repeat 5 --budget-ms 1500
+
+Each entry point is imported --repeat times in a fresh interpreter under
+`python -X importtime`, which is also what builds its app through
+`create_app()`. The time reported is the importtime total past what a bare
+interpreter already imports, so interpreter startup is left out. The self
+time of every module is summed by top-level package to show where the
+time goes. The exit status is 1 when an entry point's median is over
+--budget-ms, so the check can gate a pipeline. Run it on an idle machine,
+the numbers are per core and noisy under load.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = (
+    "user_service.user_service",
+    "activity_service.services",
+    "ml_mood_service.app",
+    "notification_service.app",
+    "notification_service.worker",
+)
+
+
+def importtime(statement):
+    """[(depth, module, self_us, cumulative_us)] for one fresh interpreter running `statement`."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # One space after the bar, then two per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_ms(rows, baseline):
+    """Total of the top-level imports a bare interpreter doesn't make."""
+    return sum(cumulative for depth, module, _, cumulative in rows if depth == 0 and module not in baseline) / 1000
+
+
+def by_package(rows, baseline):
+    totals = Counter()
+    for _, module, self_us, _ in rows:
+        if module not in baseline:
+            totals[module.split(".")[0]] += self_us / 1000
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="largest median import time per entry point")
+    parser.add_argument("--top", type=int, default=6, help="packages listed per entry point")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    baseline = {module for _, module, _, _ in importtime("pass")}
+    over = []
+    print(f"{'entry point':<30} {'median':>9} {'min':>9} {'max':>9}  heaviest packages (self time)")
+    for entry_point in args.entry_points:
+        runs = [importtime(f"import {entry_point}") for _ in range(args.repeat)]
+        times = [import_ms(rows, baseline) for rows in runs]
+        median = statistics.median(times)
+        packages = by_package(runs[-1], baseline).most_common(args.top)
+        flag = " over budget" if median > args.budget_ms else ""
+        print(f"{entry_point:<30} {median:>7.0f}ms {min(times):>7.0f}ms {max(times):>7.0f}ms  "
+              + ", ".join(f"{name} {ms:.0f}" for name, ms in packages) + flag)
+        if flag:
+            over.append(entry_point)
+
+    if over:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
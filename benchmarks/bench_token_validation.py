@@ -0,0 +1,105 @@
+"""Compare token validation throughput before/after local JWT verification.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_token_validation --requests 2000
+
+"before" reproduces the old path: a blocking `requests.get` to a validator
+endpoint per call. A stand-in for user_service `/validate_token` is served
+from a local thread so the benchmark needs no database.
+"""
+import argparse
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from jose import jwt, JWTError
+
+from common.token_verifier import ALGORITHM, SECRET_KEY, TokenCache, TokenVerifier
+from benchmarks.utils import Timer, print_results, summarize
+
+
+class ValidateTokenServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class ValidateTokenHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like uvicorn
+
+    def do_GET(self):
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            status, body = 200, {"user_id": payload["sub"], "role": payload["role"]}
+        except JWTError:
+            status, body = 401, {"detail": "Token is invalid or expired"}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_tokens(count):
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    return [
+        jwt.encode({"sub": f"user{i}@example.com", "role": "user", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+        for i in range(count)
+    ]
+
+
+def bench_blocking_remote(url, tokens, n):
+    with Timer() as t:
+        for i in range(n):
+            requests.get(url, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+    return summarize("before: blocking requests.get", n, t.elapsed)
+
+
+async def bench_verifier(name, verifier, tokens, n, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(token):
+        async with semaphore:
+            await verifier.verify(token)
+
+    with Timer() as t:
+        await asyncio.gather(*(one(tokens[i % len(tokens)]) for i in range(n)))
+    await verifier.aclose()
+    return summarize(name, n, t.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100, help="distinct tokens in the workload")
+    parser.add_argument("--concurrency", type=int, default=20, help="in-flight validations for the async paths")
+    args = parser.parse_args()
+
+    server = ValidateTokenServer(("127.0.0.1", 0), ValidateTokenHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/validate_token"
+
+    tokens = make_tokens(args.users)
+    # A cache of size 0 forces every call through the verification path itself
+    verifiers = [
+        ("after: remote via pooled async client", TokenVerifier("remote", TokenCache(maxsize=0), url=url)),
+        ("after: local verify, no cache", TokenVerifier("local", TokenCache(maxsize=0))),
+        ("after: local verify + TTL cache", TokenVerifier("local")),
+    ]
+    results = [bench_blocking_remote(url, tokens, args.requests)]
+    for name, verifier in verifiers:
+        results.append(asyncio.run(bench_verifier(name, verifier, tokens, args.requests, args.concurrency)))
+    server.shutdown()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
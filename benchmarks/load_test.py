@@ -0,0 +1,493 @@
+"""End-to-end load test: user_service and activity_service over HTTP with a realistic traffic mix.
+
+From the repository root:
+
+    # Throwaway PostgreSQL from the local initdb/pg_ctl binaries, migrated and seeded
+    python -m benchmarks.load_test run --postgres ephemeral --users 2000 --days 90 --duration 60 --concurrency 50
+
+    # Database from DATABASE_URL / DATABASE_URL_SYNC, seeded from data/users.csv
+    python -m benchmarks.load_test run --seed csv --mix login=10,log_activity=30,get_activity=30,summary=30
+
+    # Services that are already running
+    python -m benchmarks.load_test run --user-url http://127.0.0.1:8002 --activity-url http://127.0.0.1:8001
+
+    # Compare two runs, exits 1 when throughput or p99 regressed by more than --threshold percent
+    python -m benchmarks.load_test compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Unless URLs are given, both services are started as uvicorn processes on
+free ports. Virtual users log in with SEED_USER_PASSWORD as seeded users
+(synthetic ones and those of data/users.csv), then loop over weighted
+operations until --duration runs out. Each operation is timed client-side.
+After the run, the services' own /metrics (common/metrics.py) add server
+latency and DB time per route. Results are written to
+benchmarks/results/<time>-<commit>.json.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+import psycopg2
+from jose import jwt
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.utils import print_results, summarize
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+USERS_CSV = ROOT / "data" / "users.csv"
+
+OPERATIONS = ("login", "log_activity", "get_activity", "get_user", "summary")
+DEFAULT_MIX = "login=5,log_activity=20,get_activity=30,get_user=20,summary=25"
+
+
+# --- Database and services -------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def pg_bin(name: str) -> str:
+    """Server binaries are often outside PATH (e.g. /usr/lib/postgresql/16/bin), pg_config knows where."""
+    found = shutil.which(name)
+    if found:
+        return found
+    try:
+        bindir = subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        bindir = ""
+    candidate = os.path.join(bindir, name)
+    if not os.path.exists(candidate):
+        raise SystemExit(f"`{name}` not found, install the PostgreSQL 15+ server or use --postgres env")
+    return candidate
+
+
+class EphemeralPostgres:
+    """PostgreSQL cluster in a temporary directory, removed again on exit, no container needed."""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="load_test_pg_")
+        self.data = os.path.join(self.directory, "data")
+        self.port = free_port()
+
+    @property
+    def sync_url(self):
+        return f"postgresql://postgres@127.0.0.1:{self.port}/postgres"
+
+    @property
+    def async_url(self):
+        return f"postgresql+asyncpg://postgres@127.0.0.1:{self.port}/postgres"
+
+    def __enter__(self):
+        subprocess.run([pg_bin("initdb"), "-D", self.data, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_bin("pg_ctl"), "-D", self.data, "-l", os.path.join(self.directory, "postgres.log"), "-w",
+                        "-o", f"-p {self.port} -k {self.directory} -c max_connections=200", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.run([pg_bin("pg_ctl"), "-D", self.data, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def run_script(env, *command):
+    subprocess.run([sys.executable, *command], cwd=ROOT, env=env, check=True)
+
+
+def login_emails(sync_url: str, limit: int):
+    """Seeded accounts, the ones that log in with SEED_USER_PASSWORD."""
+    with open(USERS_CSV, newline="") as f:
+        csv_emails = [row["email"] for row in csv.DictReader(f)]
+    conn = psycopg2.connect(sync_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT email FROM user_service.users WHERE email LIKE 'synthetic\\_%%' OR email = ANY(%s) "
+                "ORDER BY user_id DESC LIMIT %s",
+                (csv_emails, limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+class Service:
+    """One uvicorn process, its output goes to `<log_dir>/<name>.out` and is shown if it fails to start."""
+
+    def __init__(self, name, app, env, log_dir, workers):
+        self.name = name
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.output = os.path.join(log_dir, f"{name}.out")
+        self._log = open(self.output, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    def _failed(self, reason):
+        self._log.flush()
+        with open(self.output) as f:
+            tail = "".join(f.readlines()[-20:])
+        return SystemExit(f"{self.name} {reason}:\n{tail}")
+
+    async def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.url, timeout=2) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise self._failed(f"exited with {self.process.returncode}")
+                try:
+                    if (await client.get("/openapi.json")).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise self._failed(f"did not start within {timeout}s")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+# --- Workload --------------------------------------------------------------
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in filter(None, spec.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}, choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class VirtualUser:
+    """One logged-in client. Its operations return the response status."""
+
+    def __init__(self, number, email, password, users, activity, run_id, seed):
+        self.number = number
+        self.email = email
+        self.password = password
+        self.users = users
+        self.activity = activity
+        self.run_id = run_id
+        self.rng = random.Random(seed + number)
+        self.headers = {}
+        self.uid = None
+        self.activity_ids = []
+        self._sequence = 0
+
+    async def setup(self):
+        if await self.login() != 200:
+            raise SystemExit(f"Login failed for {self.email}, was it seeded with SEED_USER_PASSWORD?")
+        await self.log_activity()  # something of its own for get_activity
+
+    async def login(self):
+        response = await self.users.post("/login", json={"email": self.email, "password": self.password})
+        if response.status_code == 200:
+            token = response.json()["access_token"]
+            self.headers = {"Authorization": f"Bearer {token}"}
+            self.uid = jwt.get_unverified_claims(token).get("uid")
+        return response.status_code
+
+    async def log_activity(self):
+        # Unique per request, activity_data allows one row per (user, date, workout_type)
+        self._sequence += 1
+        steps = self.rng.randint(500, 20000)
+        response = await self.activity.post("/activity/", headers=self.headers, json={
+            "date": date.today().isoformat(),
+            "steps": steps,
+            "calories_burned": round(steps * 0.04, 1),
+            "distance_km": round(steps * 0.0007, 2),
+            "active_minutes": self.rng.randint(0, 120),
+            "workout_type": f"load-{self.run_id}-{self.number}-{self._sequence}",
+        })
+        if response.status_code == 200:
+            self.activity_ids.append(response.json()["id"])
+        return response.status_code
+
+    async def get_activity(self):
+        if not self.activity_ids:
+            return await self.log_activity()
+        activity_id = self.rng.choice(self.activity_ids)
+        return (await self.activity.get(f"/activity/{activity_id}", headers=self.headers)).status_code
+
+    async def get_user(self):
+        return (await self.users.get(f"/users/{self.uid}")).status_code
+
+    async def summary(self):
+        end = date.today() - timedelta(days=self.rng.randint(0, 60))
+        params = {
+            "start": (end - timedelta(days=self.rng.choice((7, 30, 90)))).isoformat(),
+            "end": end.isoformat(),
+            "granularity": self.rng.choice(("day", "week", "month")),
+        }
+        return (await self.activity.get("/activity/summary", headers=self.headers, params=params)).status_code
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, operation, seconds, status):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status] += 1
+
+
+async def drive(user, mix, measure_from, deadline, recorder, think):
+    operations, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        operation = user.rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        try:
+            status = await getattr(user, operation)()
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if start >= measure_from:  # requests started during warm-up are not counted
+            recorder.record(operation, time.perf_counter() - start, status)
+        if think:
+            await asyncio.sleep(think)
+
+
+def server_metrics(text: str) -> dict:
+    """Mean server-side latency and DB time per route from a /metrics scrape (one worker's view)."""
+    sums = defaultdict(dict)
+    for family in text_string_to_metric_families(text):
+        if family.name not in ("http_request_duration_seconds", "http_request_db_seconds"):
+            continue
+        for sample in family.samples:
+            if sample.name.endswith(("_sum", "_count")):
+                key = f"{sample.labels['method']} {sample.labels['route']}"
+                sums[key][sample.name] = sample.value
+    routes = {}
+    for route, values in sums.items():
+        count = values.get("http_request_duration_seconds_count")
+        if not count:
+            continue
+        db_count = values.get("http_request_db_seconds_count") or 0
+        routes[route] = {
+            "requests": int(count),
+            "mean_ms": round(values["http_request_duration_seconds_sum"] / count * 1000, 3),
+            "db_mean_ms": round(values["http_request_db_seconds_sum"] / db_count * 1000, 3) if db_count else None,
+        }
+    return routes
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "HEAD") or "unknown", bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+async def run_load(args, users_url, activity_url, emails, password):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    run_id = f"{int(time.time()) % 100000:05d}"
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=users_url, limits=limits, timeout=timeout) as users, \
+            httpx.AsyncClient(base_url=activity_url, limits=limits, timeout=timeout) as activity:
+        virtual_users = [
+            VirtualUser(i, emails[i % len(emails)], password, users, activity, run_id, args.rng_seed)
+            for i in range(args.concurrency)
+        ]
+        await asyncio.gather(*(user.setup() for user in virtual_users))
+
+        start = time.perf_counter()
+        measure_from, deadline = start + args.warmup, start + args.warmup + args.duration
+        await asyncio.gather(*(
+            drive(user, args.mix, measure_from, deadline, recorder, args.think_ms / 1000) for user in virtual_users
+        ))
+        elapsed = time.perf_counter() - measure_from
+
+        server = {}
+        for name, client in (("user_service", users), ("activity_service", activity)):
+            server[name] = {}
+            for _ in range(2):  # a kept-alive connection may have been closed after a 500
+                try:
+                    server[name] = server_metrics((await client.get("/metrics/")).text)
+                    break
+                except httpx.HTTPError:
+                    pass
+    return recorder, elapsed, server
+
+
+def build_report(args, recorder, elapsed, server):
+    operations = {}
+    all_latencies = []
+    for operation in OPERATIONS:
+        latencies = recorder.latencies.get(operation)
+        if not latencies:
+            continue
+        all_latencies.extend(latencies)
+        statuses = recorder.statuses[operation]
+        row = summarize(operation, len(latencies), elapsed, latencies)
+        row["errors"] = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 400)
+        row["statuses"] = {str(status): count for status, count in statuses.items()}
+        operations[operation] = row
+    commit, dirty = git_revision()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "think_ms": args.think_ms, "mix": args.mix, "workers": args.workers, "auth_mode": args.auth_mode,
+            "postgres": args.postgres, "seed": args.seed_source, "users": args.users, "days": args.days,
+        },
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "total": summarize("total", len(all_latencies), elapsed, all_latencies),
+        "operations": operations,
+        "server": server,
+    }
+
+
+def print_report(report):
+    rows = list(report["operations"].values()) + [report["total"]]
+    print_results(rows)
+    for row in rows[:-1]:
+        if row["errors"]:
+            print(f"  {row['name']}: {row['errors']} errors {row['statuses']}")
+
+
+async def run(args):
+    args.seed_source = args.seed_source or ("synthetic" if args.postgres == "ephemeral" else "none")
+    from database.seed_db import SEED_USER_PASSWORD
+
+    with ExitStack() as stack:
+        env = dict(os.environ)
+        log_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="load_test_"))
+        env["LOG_DIR"] = log_dir  # service logs stay out of logs/
+        if args.postgres == "ephemeral":
+            postgres = stack.enter_context(EphemeralPostgres())
+            env.update(DATABASE_URL=postgres.async_url, DATABASE_URL_SYNC=postgres.sync_url)
+        sync_url = env.get("DATABASE_URL_SYNC")
+        if not sync_url:
+            raise SystemExit("DATABASE_URL_SYNC is not set, use --postgres ephemeral or point it at the database")
+
+        if args.postgres == "ephemeral" or args.migrate:
+            run_script(env, "database/migrate.py")
+        if args.seed_source == "csv":
+            run_script(env, "-m", "database.seed_db")
+        elif args.seed_source == "synthetic":
+            run_script(env, "-m", "database.seed_db", "--synthetic-users", str(args.users), "--days", str(args.days))
+
+        users_url, activity_url = args.user_url, args.activity_url
+        if not (users_url and activity_url):
+            user_service = Service("user_service", "user_service.user_service:app", env, log_dir, args.workers)
+            stack.callback(user_service.stop)
+            env["USER_SERVICE_URL"] = f"{user_service.url}/validate_token"
+            env["AUTH_MODE"] = args.auth_mode
+            activity_service = Service("activity_service", "activity_service.services:app", env, log_dir, args.workers)
+            stack.callback(activity_service.stop)
+            await asyncio.gather(user_service.wait_ready(), activity_service.wait_ready())
+            users_url, activity_url = user_service.url, activity_service.url
+
+        emails = login_emails(sync_url, args.concurrency)
+        if not emails:
+            raise SystemExit("No seeded users to log in as, use --seed csv or --seed synthetic")
+        recorder, elapsed, server = await run_load(args, users_url, activity_url, emails, SEED_USER_PASSWORD)
+
+    report = build_report(args, recorder, elapsed, server)
+    print_report(report)
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'][:8]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+
+# --- Comparison ------------------------------------------------------------
+
+def compare(args) -> int:
+    base, new = (json.loads(Path(path).read_text()) for path in (args.base, args.new))
+    print(f"base {base['commit'][:8]}{'+' if base['dirty'] else ''}  ->  new {new['commit'][:8]}{'+' if new['dirty'] else ''}")
+    if base["config"] != new["config"]:
+        print("warning: the runs used different configurations")
+
+    regressions = []
+    names = [name for name in OPERATIONS if name in base["operations"] and name in new["operations"]]
+    for name, old, current in [(name, base["operations"][name], new["operations"][name]) for name in names] + [
+        ("total", base["total"], new["total"])
+    ]:
+        changes = []
+        for key, worse_when_higher in (("ops_per_s", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True)):
+            before, after = old.get(key), current.get(key)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            changes.append(f"{key}={before:,.1f}->{after:,.1f} ({change:+.1f}%)")
+            if key in ("ops_per_s", "p99_ms") and (change if worse_when_higher else -change) > args.threshold:
+                regressions.append(f"{name} {key}")
+        print(f"{name:<14} " + "  ".join(changes))
+
+    if regressions:
+        print(f"Regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="start the services, drive the traffic mix, save the results")
+    run_parser.add_argument("--postgres", choices=["env", "ephemeral"], default="env",
+                            help="DATABASE_URL/DATABASE_URL_SYNC, or a throwaway local server")
+    run_parser.add_argument("--migrate", action="store_true", help="apply migrations (always done for ephemeral)")
+    run_parser.add_argument("--seed", dest="seed_source", choices=["none", "csv", "synthetic"],
+                            help="default: synthetic for ephemeral, none otherwise")
+    run_parser.add_argument("--users", type=int, default=1000, help="synthetic users to seed")
+    run_parser.add_argument("--days", type=int, default=90, help="days of synthetic history per user")
+    run_parser.add_argument("--user-url", help="use a running user_service instead of starting one")
+    run_parser.add_argument("--activity-url", help="use a running activity_service instead of starting one")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per service")
+    run_parser.add_argument("--auth-mode", choices=["local", "remote"], default="local",
+                            help="AUTH_MODE of the started activity_service")
+    run_parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    run_parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    run_parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="seconds of traffic before measuring")
+    run_parser.add_argument("--think-ms", type=float, default=0, help="pause between a virtual user's requests")
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--rng-seed", type=int, default=42, help="seed of the virtual users' choices")
+    run_parser.add_argument("--output", help="results file, default benchmarks/results/<time>-<commit>.json")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="percent")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import asyncio
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of latencies (seconds)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name, count, elapsed, latencies=None):
+    """Build a result row with throughput and latency percentiles (ms)."""
+    result = {
+        "name": name,
+        "count": count,
+        "elapsed_s": round(elapsed, 4),
+        "ops_per_s": round(count / elapsed, 1) if elapsed else 0.0,
+    }
+    if latencies:
+        result.update({
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        })
+    return result
+
+
+def print_results(results):
+    for result in results:
+        extras = "".join(
+            f"  {key}={result[key]}" for key in ("p50_ms", "p95_ms", "p99_ms") if key in result
+        )
+        print(f"{result['name']:<40} {result['ops_per_s']:>12,.1f} ops/s{extras}")
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+async def run_concurrent(call, count, concurrency):
+    """Await `call(i)` `count` times with at most `concurrency` in flight, returns (elapsed, latencies)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - start)
+
+    with Timer() as t:
+        await asyncio.gather(*(one(i) for i in range(count)))
+    return t.elapsed, latencies
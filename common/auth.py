@@ -0,0 +1,58 @@
+"""Bearer token dependencies shared by activity_service and ml_mood_service."""
+from fastapi import Depends, HTTPException, Security
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.identity_cache import identity_cache
+from common.token_verifier import token_verifier
+from database.db_connection import get_db, get_read_db
+from logging_config import get_logger
+from user_service.user_model import User
+
+logger = get_logger("auth")
+
+security = HTTPBearer()
+
+
+async def validate_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """Validate JWT token locally, or through `user_service/validate_token` when AUTH_MODE=remote."""
+    return await token_verifier.verify(credentials.credentials)  # Returns {"user_id": "...", "role": "..."}
+
+
+async def get_current_admin(user_data: dict = Depends(validate_token)):
+    if user_data.get("role") != "admin":
+        logger.warning("Unauthorized admin access attempt by %s", user_data.get("user_id"))
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return user_data  # Returns admin user details
+
+
+async def lookup_user_id(current_user: dict, db: AsyncSession) -> int:
+    """Numeric `user_id` of the caller, from the token's `uid` claim, the identity cache or the users table."""
+    if current_user.get("uid") is not None:
+        return int(current_user["uid"])
+
+    email = current_user["user_id"]
+    user_id = await identity_cache.get(email)
+    if user_id is not None:
+        return user_id
+
+    result = await db.execute(select(User.user_id).where(User.email == email))
+    user_id = result.scalar_one_or_none()
+    if not user_id:
+        logger.warning("Token subject not found in user_service.users")
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await identity_cache.set(email, user_id)
+    return user_id
+
+
+async def resolve_user_id(current_user: dict = Depends(validate_token), db: AsyncSession = Depends(get_read_db)) -> int:
+    """`lookup_user_id` for read routes, on their `get_read_db` session."""
+    return await lookup_user_id(current_user, db)
+
+
+async def resolve_writer_id(current_user: dict = Depends(validate_token), db: AsyncSession = Depends(get_db)) -> int:
+    """`lookup_user_id` for write routes, on the request's own `get_db` session instead of a second pooled one."""
+    return await lookup_user_id(current_user, db)
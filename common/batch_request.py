@@ -0,0 +1,90 @@
+import json
+import os
+from functools import wraps
+from typing import List, Literal, Optional
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from logging_config import get_logger
+
+logger = get_logger("batch_request")
+
+# Rows accepted by one POST /activity/batch or /mood/batch request
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "5000"))
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+# Per-row outcome of POST /activity/batch and /mood/batch, `index` is the row's position in the request
+class BatchResult(BaseModel):
+    index: int
+    status: Literal["inserted", "updated", "superseded", "invalid"]
+    id: Optional[int] = None
+    errors: Optional[List[str]] = None
+
+
+async def read_rows(request: Request) -> list:
+    """Raw rows of a batch request, dicts for a JSON array body or undecoded lines for NDJSON."""
+    if "ndjson" not in request.headers.get("content-type", ""):
+        rows = json.loads(await request.body())
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of records")
+        if len(rows) > BULK_MAX_ROWS:
+            raise BatchTooLarge(f"Batch exceeds {BULK_MAX_ROWS} rows")
+        return rows
+
+    # NDJSON is consumed as it streams in, lines are parsed later by pydantic
+    rows, pending = [], b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        rows.extend(line for line in lines if line.strip())
+        if len(rows) > BULK_MAX_ROWS:
+            raise BatchTooLarge(f"Batch exceeds {BULK_MAX_ROWS} rows")
+    if pending.strip():
+        rows.append(pending)
+    return rows
+
+
+def validate_rows(model, raw_rows: list):
+    """Split raw rows into validated `(index, model)` pairs and `invalid` results."""
+    valid, invalid = [], []
+    for index, raw in enumerate(raw_rows):
+        try:
+            if isinstance(raw, (bytes, str)):
+                record = model.model_validate_json(raw)
+            else:
+                record = model.model_validate(raw)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()]
+            invalid.append(BatchResult(index=index, status="invalid", errors=errors))
+            continue
+        valid.append((index, record))
+    return valid, invalid
+
+
+# Decorator for handling database errors in the activity and mood routes
+def handle_database_error(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except HTTPException:
+            raise  # Already carries the intended status code
+        except IntegrityError as e:
+            logger.error("Database IntegrityError: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Data consistency error occurred"
+            )
+        except Exception as e:
+            logger.error("Unexpected Database Error: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
+            )
+    return wrapper
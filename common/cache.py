@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process LRU with a TTL per entry, bounded to `maxsize` entries."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FakeSharedStore:
+    """Local stand-in for a shared store, exposes the async subset of redis we use."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at | None)
+
+    async def get(self, name):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[name]
+            return None
+        return value
+
+    async def set(self, name, value, ex: int | None = None):
+        self._data[name] = (value, time.time() + ex if ex else None)
+        return True
+
+    async def delete(self, *names):
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+
+def redis_client(url: str):
+    """Async redis client for shared caches, redis is only needed when a shared backend is configured."""
+    import redis.asyncio as redis
+
+    return redis.from_url(url)
@@ -0,0 +1,11 @@
+"""Loads `.env` into os.environ, imported first by every service entry point.
+
+Modules read their settings with os.getenv when they are imported, so the
+service apps and the notification worker import this module before anything
+else. Library modules never load `.env` themselves. The scripts under
+database/ and `train_model` / `python -m common.feature_store` load it when
+run as `__main__`. Variables already set in the environment take precedence.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,6 @@
+"""Outbox topics, shared by the services that write and consume them, see common/outbox.py."""
+
+# Day totals from activity writes: {"days": [{"date", "steps", "active_minutes"}]}
+ACTIVITY_LOGGED = "activity.logged"
+# Sleep and heart rate from mood writes: {"days": [{"date", "sleep_hours", "heart_rate_avg"}]}
+MOOD_LOGGED = "mood.logged"
@@ -0,0 +1,248 @@
+"""Per-user rolling activity/sleep features for mood predictions.
+
+activity_service records each user's daily totals as they are written and
+snapshots the store to FEATURE_STORE_PATH; ml_mood_service loads that
+snapshot and reloads it when it changes. Rebuild it from the database with
+
+    python -m common.feature_store --since 2024-01-01
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+import numpy as np
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()  # Settings below come from .env too when run as a script, see common/env.py
+
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH", "data/feature_store.npz")
+DATABASE_URL = os.getenv("DATABASE_URL_SYNC")
+
+# Per-user rolling means over calendar days, computed from daily mood + activity rows
+ROLLING_INPUTS = ["sleep_hours", "heart_rate_avg", "steps", "active_minutes"]
+ROLLING_WINDOWS = (7, 30)
+ROLLING_FEATURES = [f"{column}_{days}d" for column in ROLLING_INPUTS for days in ROLLING_WINDOWS]
+
+HISTORY_DAYS = max(ROLLING_WINDOWS)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# One row per user and day: activity totals from the day rollups, sleep/heart rate from mood_data
+DAILY_QUERY = """
+    SELECT COALESCE(m.user_id, r.user_id) AS user_id, COALESCE(m.date, r.period_start) AS date,
+           m.sleep_hours, m.heart_rate_avg, r.total_steps AS steps, r.total_active_minutes AS active_minutes
+    FROM (SELECT * FROM mood_service.mood_data WHERE date >= %(since)s) m
+    FULL JOIN (
+        SELECT * FROM activity_service.activity_rollup WHERE granularity = 'day' AND period_start >= %(since)s
+    ) r ON r.user_id = m.user_id AND r.period_start = m.date
+"""
+
+
+def _window_means(values, last_day):
+    """Rolling means of `values` (users, HISTORY_DAYS, inputs) for windows ending on `last_day` (users,)."""
+    # Day d lives in slot d % HISTORY_DAYS, so a slot's age follows from the user's last day
+    ages = (last_day[:, None] - np.arange(HISTORY_DAYS)[None, :]) % HISTORY_DAYS
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0)
+    means = np.empty((len(values), len(ROLLING_FEATURES)), dtype=np.float32)
+    for w, days in enumerate(ROLLING_WINDOWS):
+        in_window = (ages < days)[:, :, None]
+        total = (filled * in_window).sum(axis=1)
+        count = (present & in_window).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            window = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        # ROLLING_FEATURES is ordered input-major: <input>_7d, <input>_30d, ...
+        means[:, w::len(ROLLING_WINDOWS)] = window
+    return means
+
+
+class FeatureStore:
+    """Array-backed rolling features, one row per user.
+
+    `values` keeps the last HISTORY_DAYS days of ROLLING_INPUTS per user in a
+    ring indexed by day ordinal, and `features` the ROLLING_FEATURES derived
+    from it, refreshed on every write. Lookups are a dict access plus a row
+    read. Windows end on the user's latest recorded day, like the rolling
+    means computed for training in ml_mood_service.features.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.index = {}  # user_id -> row
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.last_day = np.zeros(capacity, dtype=np.int32)  # date.toordinal()
+        self.values = np.full((capacity, HISTORY_DAYS, len(ROLLING_INPUTS)), np.nan, dtype=np.float32)
+        self.features = np.full((capacity, len(ROLLING_FEATURES)), np.nan, dtype=np.float32)
+        self.version = 0  # mtime of the snapshot this store was loaded from
+        self.position = 0  # last outbox event applied, see activity_service/feature_updates.py
+
+    def __len__(self):
+        return len(self.index)
+
+    def _row(self, user_id: int) -> int:
+        row = self.index.get(user_id)
+        if row is not None:
+            return row
+        row = len(self.index)
+        if row == len(self.user_ids):
+            self._grow(2 * row)
+        self.index[user_id] = row
+        self.user_ids[row] = user_id
+        return row
+
+    def _grow(self, capacity: int):
+        def extend(array, fill):
+            grown = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        self.user_ids = extend(self.user_ids, 0)
+        self.last_day = extend(self.last_day, 0)
+        self.values = extend(self.values, np.nan)
+        self.features = extend(self.features, np.nan)
+
+    def record(self, user_id: int, day: date, **inputs):
+        """Sets the day's totals for some of ROLLING_INPUTS, e.g. record(1, day, steps=9000, active_minutes=45)."""
+        row = self._row(user_id)
+        ordinal = day.toordinal()
+        last = int(self.last_day[row])
+        if ordinal <= last - HISTORY_DAYS:
+            return  # Older than every window
+        if ordinal > last:
+            # Slots of the days being skipped over still hold data from HISTORY_DAYS ago
+            for skipped in range(max(last + 1, ordinal - HISTORY_DAYS + 1), ordinal + 1):
+                self.values[row, skipped % HISTORY_DAYS] = np.nan
+            self.last_day[row] = ordinal
+        slot = self.values[row, ordinal % HISTORY_DAYS]
+        for name, value in inputs.items():
+            slot[ROLLING_INPUTS.index(name)] = np.nan if value is None else value
+        self.features[row] = _window_means(self.values[row:row + 1], self.last_day[row:row + 1])[0]
+
+    def lookup(self, user_id: int):
+        """ROLLING_FEATURES for the user as {name: value}, None for unknown users, NaN for empty windows."""
+        row = self.index.get(user_id)
+        if row is None:
+            return None
+        return dict(zip(ROLLING_FEATURES, self.features[row].tolist()))
+
+    @classmethod
+    def materialize(cls, frame):
+        """Builds the store in one vectorized pass from daily rows (user_id, date, ROLLING_INPUTS)."""
+        import pandas as pd
+
+        days = pd.to_datetime(frame["date"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+        ordinals = (days + EPOCH_ORDINAL).astype(np.int32)
+        user_ids = frame["user_id"].to_numpy(np.int64)
+        unique_users, rows = np.unique(user_ids, return_inverse=True)
+        store = cls(capacity=max(len(unique_users), 1))
+        store.index = {int(user_id): row for row, user_id in enumerate(unique_users)}
+        store.user_ids[:len(unique_users)] = unique_users
+
+        last_day = np.zeros(len(unique_users), dtype=np.int32)
+        np.maximum.at(last_day, rows, ordinals)
+        recent = ordinals > last_day[rows] - HISTORY_DAYS
+        inputs = frame[ROLLING_INPUTS].to_numpy(np.float32)
+        store.values[rows[recent], ordinals[recent] % HISTORY_DAYS] = inputs[recent]
+        store.last_day[:len(unique_users)] = last_day
+        store.features[:len(unique_users)] = _window_means(store.values[:len(unique_users)], last_day)
+        return store
+
+    def to_frame(self):
+        """Current features of every user as a DataFrame, for offline training and inspection."""
+        import pandas as pd
+
+        count = len(self.index)
+        frame = pd.DataFrame(self.features[:count], columns=ROLLING_FEATURES)
+        frame.insert(0, "user_id", self.user_ids[:count])
+        frame.insert(1, "date", [date.fromordinal(int(day)) for day in self.last_day[:count]])
+        return frame
+
+    def snapshot_arrays(self):
+        """Copies of the live arrays, cheap to take on the event loop and safe to write from a thread."""
+        count = len(self.index)
+        return {
+            "user_ids": self.user_ids[:count].copy(),
+            "last_day": self.last_day[:count].copy(),
+            "values": self.values[:count].copy(),
+            "position": np.array([self.position], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        count = len(arrays["user_ids"])
+        store = cls(capacity=max(count, 1))
+        store.user_ids[:count] = arrays["user_ids"]
+        store.last_day[:count] = arrays["last_day"]
+        store.values[:count] = arrays["values"]
+        store.index = {int(user_id): row for row, user_id in enumerate(arrays["user_ids"])}
+        store.features[:count] = _window_means(store.values[:count], store.last_day[:count])
+        if "position" in arrays:
+            store.position = int(arrays["position"][0])
+        return store
+
+
+def save_snapshot(arrays, path: str = FEATURE_STORE_PATH):
+    """Writes `snapshot_arrays()` atomically, readers never see a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str = FEATURE_STORE_PATH) -> FeatureStore:
+    with np.load(path) as arrays:
+        store = FeatureStore.from_arrays(arrays)
+    store.version = os.stat(path).st_mtime_ns
+    return store
+
+
+def snapshot_changed(store: FeatureStore, path: str = FEATURE_STORE_PATH) -> bool:
+    try:
+        return os.stat(path).st_mtime_ns != store.version
+    except FileNotFoundError:
+        return False
+
+
+def load_daily_frame(since, chunk_rows=200_000):
+    """Daily rows for materialize(), read from the database in chunks."""
+    import pandas as pd
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql_query(DAILY_QUERY, conn, params={"since": since}, chunksize=chunk_rows)
+        return pd.concat([chunk.astype({column: np.float32 for column in ROLLING_INPUTS}) for chunk in chunks],
+                         ignore_index=True)
+
+
+def outbox_position():
+    import psycopg2
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(position), 0) FROM activity_service.outbox")
+            return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize the feature store snapshot from the database")
+    parser.add_argument("--since", default=None, help=f"first day to read (default: {HISTORY_DAYS} days ago)")
+    parser.add_argument("--output", default=FEATURE_STORE_PATH)
+    args = parser.parse_args()
+
+    since = args.since or date.fromordinal(date.today().toordinal() - HISTORY_DAYS).isoformat()
+    started = time.perf_counter()
+    # Read first: activity_service replays outbox events after this position on top of the snapshot
+    position = outbox_position()
+    store = FeatureStore.materialize(load_daily_frame(since))
+    store.position = position
+    save_snapshot(store.snapshot_arrays(), args.output)
+    print(f"Materialized features for {len(store):,} users in {time.perf_counter() - started:.2f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Async HTTP client for calls between the services.
+
+`ServiceClient(name)` keeps one keep-alive httpx connection pool per
+upstream and adds:
+
+- timeouts, capped by the current request's deadline (common/overload.py);
+- retries of idempotent calls (GET, HEAD, OPTIONS, PUT, DELETE, or
+  `idempotent=True`) on transport errors and 502/503/504, after
+  full-jitter exponential backoff;
+- a circuit breaker. After HTTP_CIRCUIT_FAILURES failures in a row, calls
+  fail at once with CircuitOpenError for HTTP_CIRCUIT_RESET seconds. One
+  probe call then decides whether the circuit closes again;
+- single-flight: concurrent calls with the same `coalesce` key share one
+  upstream request and its response.
+
+CircuitOpenError is an httpx.HTTPError, so callers that already handle
+httpx errors need no changes.
+"""
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from common.metrics import CIRCUIT_STATE, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+from common.overload import remaining_time
+from logging_config import get_logger
+
+logger = get_logger("http_client")
+
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "2.0"))
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "0.5"))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+HTTP_CLIENT_KEEPALIVE = int(os.getenv("HTTP_CLIENT_KEEPALIVE", "20"))
+# Retries after the first attempt, backoff is random up to base * 2**retry, at most the cap
+HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+HTTP_CLIENT_BACKOFF = float(os.getenv("HTTP_CLIENT_BACKOFF", "0.05"))
+HTTP_CLIENT_BACKOFF_CAP = float(os.getenv("HTTP_CLIENT_BACKOFF_CAP", "1.0"))
+HTTP_CIRCUIT_FAILURES = int(os.getenv("HTTP_CIRCUIT_FAILURES", "5"))
+HTTP_CIRCUIT_RESET = float(os.getenv("HTTP_CIRCUIT_RESET", "10"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+
+class CircuitOpenError(httpx.HTTPError):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"Circuit to {upstream} is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures and lets one probe through after `reset_timeout`."""
+
+    def __init__(self, name: str, failures: int = HTTP_CIRCUIT_FAILURES, reset_timeout: float = HTTP_CIRCUIT_RESET):
+        self.name = name
+        self.threshold = failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self._gauge = CIRCUIT_STATE.labels(name)
+        self._gauge.set(CLOSED)
+
+    def _set(self, state: int):
+        self.state = state
+        self._gauge.set(state)
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set(CLOSED)
+
+    def failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                logger.warning("Circuit to %s opened after %d failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+    def abandon(self):
+        """The call was cancelled by its caller, which says nothing about the upstream."""
+        self._probing = False
+
+
+def backoff(retry: int) -> float:
+    return random.uniform(0, min(HTTP_CLIENT_BACKOFF_CAP, HTTP_CLIENT_BACKOFF * 2 ** retry))
+
+
+class ServiceClient:
+    """Pooled, retrying, circuit-broken HTTP client for one upstream service."""
+
+    def __init__(self, name: str, base_url: str = "", timeout: float = HTTP_CLIENT_TIMEOUT,
+                 retries: int = HTTP_CLIENT_RETRIES, breaker: CircuitBreaker | None = None, transport=None):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = breaker if breaker is not None else CircuitBreaker(name)
+        self._transport = transport  # e.g. httpx.ASGITransport in benchmarks
+        self._client = None
+        self._inflight = {}  # coalesce key -> task of the shared request
+        self._seconds = UPSTREAM_SECONDS.labels(name)
+        self._outcomes = {}
+
+    def _count(self, outcome: str):
+        counter = self._outcomes.get(outcome)
+        if counter is None:
+            counter = self._outcomes[outcome] = UPSTREAM_REQUESTS.labels(self.name, outcome)
+        counter.inc()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self._transport,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, HTTP_CLIENT_CONNECT_TIMEOUT)),
+                limits=httpx.Limits(
+                    max_connections=HTTP_CLIENT_MAX_CONNECTIONS, max_keepalive_connections=HTTP_CLIENT_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, *, coalesce=None, idempotent: bool | None = None,
+                      **kwargs) -> httpx.Response:
+        """Response of the upstream, 5xx included once retries are used up. Raises httpx.HTTPError."""
+        if coalesce is None:
+            return await self._send(method, url, idempotent, kwargs)
+        key = (method, url, coalesce)
+        task = self._inflight.get(key)
+        if task is None:
+            # A task of its own, so a cancelled first caller doesn't cancel the others
+            task = asyncio.ensure_future(self._send(method, url, idempotent, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller was cancelled
+
+    async def _send(self, method: str, url: str, idempotent: bool | None, kwargs: dict) -> httpx.Response:
+        retryable = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        attempts = 1 + (self.retries if retryable else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self._count("circuit_open")
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            remaining = remaining_time()
+            if remaining is not None:
+                if remaining <= 0:
+                    self.breaker.abandon()
+                    raise httpx.TimeoutException(f"Request deadline passed before calling {self.name}")
+                kwargs["timeout"] = min(self.timeout, remaining)
+
+            last = attempt + 1 == attempts
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                self.breaker.failure()
+                self._count("transport_error")
+                if last:
+                    raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.success()
+                    self._count("ok")
+                    return response
+                self.breaker.failure()
+                self._count("error_status")
+                if last or response.status_code not in RETRY_STATUSES:
+                    return response
+                await response.aclose()
+            finally:
+                self._seconds.observe(time.perf_counter() - start)
+
+            delay = backoff(attempt)
+            remaining = remaining_time()
+            if remaining is not None and delay >= remaining:
+                break
+            self._count("retried")
+            await asyncio.sleep(delay)
+        raise httpx.TimeoutException(f"No time left to retry {self.name}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,64 @@
+import os
+
+from common.cache import LRUCache, redis_client
+from common.metrics import CACHE_REQUESTS
+
+# `local` keeps an LRU per process, `redis` shares entries between services (REDIS_URL)
+IDENTITY_CACHE_BACKEND = os.getenv("IDENTITY_CACHE_BACKEND", "local")
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "50000"))
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class IdentityCache:
+    """Cache of user email -> numeric user_id.
+
+    Lookups go through the in-process LRU first and then the optional shared
+    store. Only hits are cached, so a newly registered email is never masked
+    by a stale miss. `invalidate` clears the shared store and this process's
+    LRU; LRUs in other processes age out after IDENTITY_CACHE_TTL.
+    """
+
+    key_prefix = "identity:"
+
+    def __init__(self, maxsize: int = IDENTITY_CACHE_SIZE, ttl: int = IDENTITY_CACHE_TTL, shared=None):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+
+    async def get(self, email: str):
+        user_id = self.local.get(email)
+        if user_id is not None:
+            CACHE_REQUESTS.labels("identity", "hit").inc()
+            return user_id
+        if self.shared is None:
+            CACHE_REQUESTS.labels("identity", "miss").inc()
+            return None
+
+        value = await self.shared.get(self.key_prefix + email)
+        if value is None:
+            CACHE_REQUESTS.labels("identity", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels("identity", "shared_hit").inc()
+        user_id = int(value)
+        self.local.set(email, user_id)
+        return user_id
+
+    async def set(self, email: str, user_id: int):
+        self.local.set(email, user_id)
+        if self.shared is not None:
+            await self.shared.set(self.key_prefix + email, user_id, ex=self.ttl)
+
+    async def invalidate(self, *emails: str):
+        for email in emails:
+            self.local.delete(email)
+        if self.shared is not None and emails:
+            await self.shared.delete(*(self.key_prefix + email for email in emails))
+
+
+def build_identity_cache() -> IdentityCache:
+    shared = redis_client(REDIS_URL) if IDENTITY_CACHE_BACKEND == "redis" else None
+    return IdentityCache(shared=shared)
+
+
+identity_cache = build_identity_cache()
@@ -0,0 +1,143 @@
+"""Prometheus metrics shared by the services.
+
+`instrument_app(app, service)` adds per-route request counts, latency and
+DB-time histograms, an in-flight gauge and `/metrics`, plus the sampling
+profiler at `/debug/profile` for admin tokens when METRICS_PROFILER=true (see
+common/profiler.py). `/metrics` has no auth, so it is meant to be reachable
+only from the Prometheus scraper, not through the public ingress.
+The other collectors are observed where the work happens: statements in
+database/pool_metrics.py, bcrypt in user_service/password_hashing.py, token
+validation and cache lookups in the auth paths, admission control in
+common/overload.py and calls between services in common/http_client.py.
+"""
+import contextvars
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, make_asgi_app
+
+METRICS_PROFILER = os.getenv("METRICS_PROFILER", "false").lower() == "true"
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests by route template and status", ["service", "method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the last byte of the response was sent", ["service", "method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Statement execution time summed per request", ["service", "method", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled", ["service"])
+
+AUTH_SECONDS = Histogram(
+    "auth_validation_seconds", "Bearer token validation time, `source` is cache, local or remote", ["service", "source"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1),
+)
+# Hit rate: rate(cache_requests_total{result="hit"}) / rate(cache_requests_total)
+CACHE_REQUESTS = Counter("cache_requests_total", "In-process cache lookups", ["cache", "result"])
+BCRYPT_SECONDS = Histogram(
+    "bcrypt_seconds", "bcrypt work per call, measured in the worker thread", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2.5),
+)
+BCRYPT_QUEUE_DEPTH = Gauge("bcrypt_queue_depth", "Hashes waiting for a free bcrypt worker")
+
+# Admission control, see common/overload.py. `route` is the limited route or "*" for the service default
+OVERLOAD_SHED = Counter(
+    "overload_shed_total", "Requests rejected before reaching the route, by reason", ["service", "route", "reason"],
+)
+OVERLOAD_ACTIVE = Gauge("overload_active", "Requests holding a concurrency slot", ["service", "route"])
+OVERLOAD_QUEUED = Gauge("overload_queued", "Requests waiting for a concurrency slot", ["service", "route"])
+OVERLOAD_QUEUE_SECONDS = Histogram(
+    "overload_queue_seconds", "Wait for a concurrency slot of admitted requests", ["service", "route"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Calls to other services through common/http_client.py, `upstream` is the client's name
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "Calls to other services: ok, error_status, transport_error, circuit_open, "
+    "retried or coalesced", ["upstream", "outcome"],
+)
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_seconds", "Time per attempt of a call to another service", ["upstream"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+CIRCUIT_STATE = Gauge("circuit_state", "Circuit breaker per upstream: 0 closed, 1 half open, 2 open", ["upstream"])
+
+# Statement time of the request being handled, added to by database/pool_metrics.py
+_request_db_time = contextvars.ContextVar("request_db_time", default=None)
+
+
+def add_db_time(seconds: float):
+    timer = _request_db_time.get()
+    if timer is not None:
+        timer[0] += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware labelling requests by route template (`/activity/{id}`), not by raw path."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        self.in_flight = HTTP_IN_FLIGHT.labels(service)
+        self._children = {}  # (method, route, status) -> collectors, `labels()` takes a lock per call
+
+    def _collectors(self, method: str, route: str, status: int):
+        key = (method, route, status)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                HTTP_REQUESTS.labels(self.service, method, route, status),
+                HTTP_LATENCY.labels(self.service, method, route),
+                HTTP_DB_SECONDS.labels(self.service, method, route),
+            )
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # unless a response was started before an error escaped
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db_time = [0.0]
+        token = _request_db_time.set(db_time)
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight.dec()
+            _request_db_time.reset(token)
+            # FastAPI sets `route` on the shared scope for API routes, mounts and docs share "other"
+            route = getattr(scope.get("route"), "path", None) or ("unmatched" if status == 404 else "other")
+            requests, latency, db_seconds = self._collectors(scope["method"], route, status)
+            requests.inc()
+            latency.observe(elapsed)
+            if db_time[0]:
+                db_seconds.observe(db_time[0])
+
+
+def instrument_app(app, service: str):
+    """Adds request metrics, `/metrics` and the opt-in profiler to a FastAPI app."""
+    app.add_middleware(MetricsMiddleware, service=service)
+    app.mount("/metrics", make_asgi_app())
+    if METRICS_PROFILER:
+        from fastapi import Depends
+
+        from common.auth import get_current_admin
+        from common.profiler import profile
+
+        app.add_api_route(
+            "/debug/profile", profile, methods=["GET"], include_in_schema=False,
+            dependencies=[Depends(get_current_admin)],
+        )
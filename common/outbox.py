@@ -0,0 +1,330 @@
+"""Transactional outbox: events written with the data, relayed to consumers afterwards.
+
+Writers call `add_event` inside their own transaction. `OutboxRelay` numbers
+committed events in commit order (`position`) and publishes them in batches
+through a broker: PostgreSQL NOTIFY (`postgres`, across processes) or an
+in-process fan-out (`memory`). A `Consumer` catches up from the outbox table
+from its last checkpoint, then follows the broker, so events published while
+it was down or disconnected are never lost (at-least-once delivery).
+
+NOTIFY only carries the last published position, never payloads: an event of
+any size is relayed, and consumers read the payloads from the outbox table.
+"""
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from database.db_connection import DATABASE_URL, get_sessionmaker
+from logging_config import get_logger
+
+logger = get_logger("outbox")
+
+OUTBOX_BROKER = os.getenv("OUTBOX_BROKER", "postgres")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+# Relay poll interval besides being woken up by writers in its own process
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+# Idle consumers re-read the table this often, covering lost notifications and the in-process broker
+OUTBOX_CATCH_UP_SECONDS = float(os.getenv("OUTBOX_CATCH_UP_SECONDS", "30"))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", "72"))
+
+NOTIFY_CHANNEL = "outbox_events"
+# Only one relay transaction at a time, so positions become visible in increasing order
+RELAY_LOCK_ID = 4173
+
+
+@dataclass
+class Event:
+    position: int
+    topic: str
+    user_id: int | None
+    payload: dict
+    created_at: datetime | None = None
+
+    def to_json(self) -> dict:
+        return {"position": self.position, "topic": self.topic, "user_id": self.user_id, "payload": self.payload}
+
+
+INSERT_EVENT = text("""
+    INSERT INTO activity_service.outbox (topic, user_id, payload) VALUES (:topic, :user_id, CAST(:payload AS jsonb))
+""")
+
+# Positions follow id order within a batch
+RELAY_BATCH = text("""
+    WITH numbered AS (
+        SELECT id, nextval('activity_service.outbox_position_seq') AS position
+        FROM (SELECT id FROM activity_service.outbox WHERE position IS NULL ORDER BY id LIMIT :batch_size) pending
+    )
+    UPDATE activity_service.outbox o
+    SET position = numbered.position, published_at = LOCALTIMESTAMP
+    FROM numbered
+    WHERE o.id = numbered.id
+    RETURNING o.position, o.topic, o.user_id, CAST(o.payload AS text), o.created_at
+""")
+
+READ_AFTER = text("""
+    SELECT position, topic, user_id, CAST(payload AS text), created_at FROM activity_service.outbox
+    WHERE position > :position ORDER BY position LIMIT :batch_size
+""")
+
+PRUNE = text("""
+    DELETE FROM activity_service.outbox
+    WHERE position IS NOT NULL AND published_at < LOCALTIMESTAMP - make_interval(hours => CAST(:hours AS int))
+""")
+
+LOAD_CHECKPOINT = text("SELECT position FROM activity_service.outbox_checkpoints WHERE consumer = :consumer")
+SAVE_CHECKPOINT = text("""
+    INSERT INTO activity_service.outbox_checkpoints (consumer, position) VALUES (:consumer, :position)
+    ON CONFLICT (consumer) DO UPDATE SET position = EXCLUDED.position, updated_at = LOCALTIMESTAMP
+""")
+
+
+def _events(rows):
+    return sorted((Event(position, topic, user_id, json.loads(payload), created_at)
+                   for position, topic, user_id, payload, created_at in rows), key=lambda event: event.position)
+
+
+async def add_event(db, topic: str, user_id: int | None, payload: dict):
+    """Queues an event in the caller's transaction, it is only relayed if that transaction commits."""
+    await db.execute(INSERT_EVENT, {"topic": topic, "user_id": user_id, "payload": json.dumps(payload, default=str)})
+
+
+# --- Brokers ---------------------------------------------------------------
+
+class Subscription:
+    def __init__(self, close=None):
+        self.queue = asyncio.Queue()
+        self._close = close
+
+    async def get(self, timeout: float) -> list | int:
+        """Next published batch, its last position for brokers that don't carry events, or [] after `timeout`."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+    async def close(self):
+        if self._close is not None:
+            await self._close(self)
+
+
+class InMemoryBroker:
+    """Fans batches out to subscribers of this process, a stand-in for an external broker."""
+
+    def __init__(self):
+        self.subscriptions = set()
+
+    async def publish(self, db, events):
+        # Delivered once the relay transaction commits, see `committed`
+        pass
+
+    async def committed(self, events):
+        for subscription in self.subscriptions:
+            subscription.queue.put_nowait(events)
+
+    async def subscribe(self) -> Subscription:
+        async def close(subscription):
+            self.subscriptions.discard(subscription)
+
+        subscription = Subscription(close)
+        self.subscriptions.add(subscription)
+        return subscription
+
+
+class PostgresBroker:
+    """NOTIFY inside the relay transaction, so listeners only hear about committed batches.
+
+    The notification is the batch's last position. Payloads stay in the outbox
+    table, as NOTIFY rejects anything over 8000 bytes and one large event would
+    otherwise fail every relay transaction it is part of.
+    """
+
+    async def publish(self, db, events):
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": str(events[-1].position)},
+        )
+
+    async def committed(self, events):
+        pass
+
+    async def subscribe(self) -> Subscription:
+        import asyncpg
+
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = await asyncpg.connect(dsn)
+
+        def on_notify(connection, pid, channel, payload):
+            try:
+                subscription.queue.put_nowait(int(payload))
+            except ValueError as e:
+                logger.error("Dropped malformed outbox notification: %r", e)  # the consumer catches up from the table
+
+        async def close(subscription):
+            await conn.close()
+
+        subscription = Subscription(close)
+        await conn.add_listener(NOTIFY_CHANNEL, on_notify)
+        return subscription
+
+
+BROKERS = {"postgres": PostgresBroker, "memory": InMemoryBroker}
+_broker = None
+
+
+def get_broker():
+    """Process-wide broker selected by OUTBOX_BROKER."""
+    global _broker
+    if _broker is None:
+        _broker = BROKERS[OUTBOX_BROKER]()
+    return _broker
+
+
+# --- Relay -----------------------------------------------------------------
+
+class OutboxRelay:
+    """Publishes committed outbox events in batches, woken by writers of this process or by polling."""
+
+    def __init__(self, broker=None, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.broker = broker or get_broker()
+        self.batch_size = batch_size
+        self.pending = asyncio.Event()
+        self.published = 0
+        self._task = None
+        self._pruned_at = 0.0
+
+    def wake(self):
+        """Call after committing events, so they are relayed without waiting for the next poll."""
+        self.pending.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def relay_once(self) -> int:
+        async with get_sessionmaker("write")() as db:
+            await db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": RELAY_LOCK_ID})
+            events = _events((await db.execute(RELAY_BATCH, {"batch_size": self.batch_size})).all())
+            if events:
+                await self.broker.publish(db, events)
+            await db.commit()
+        if events:
+            await self.broker.committed(events)
+            self.published += len(events)
+        return len(events)
+
+    async def prune(self):
+        async with get_sessionmaker("write")() as db:
+            await db.execute(PRUNE, {"hours": OUTBOX_RETENTION_HOURS})
+            await db.commit()
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep going while full batches come back, then wait for a wake-up or the poll interval
+                while await self.relay_once() == self.batch_size:
+                    pass
+                if time.monotonic() - self._pruned_at > 3600:
+                    await self.prune()
+                    self._pruned_at = time.monotonic()
+            except Exception as e:
+                logger.error("Outbox relay failed: %r", e)
+            try:
+                await asyncio.wait_for(self.pending.wait(), OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.pending.clear()
+
+
+# --- Consumers -------------------------------------------------------------
+
+class DatabaseCheckpoints:
+    """Consumer positions in activity_service.outbox_checkpoints."""
+
+    async def load(self, consumer: str) -> int:
+        async with get_sessionmaker("write")() as db:
+            return (await db.execute(LOAD_CHECKPOINT, {"consumer": consumer})).scalar() or 0
+
+    async def save(self, consumer: str, position: int):
+        async with get_sessionmaker("write")() as db:
+            await db.execute(SAVE_CHECKPOINT, {"consumer": consumer, "position": position})
+            await db.commit()
+
+
+class Consumer:
+    """Feeds events after the last checkpoint to `handler(events)`, one batch at a time.
+
+    The checkpoint is saved after the handler returns, so a crash replays the
+    last batch: handlers must be idempotent.
+    """
+
+    def __init__(self, name: str, handler, broker=None, checkpoints=None, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.name = name
+        self.handler = handler
+        self.broker = broker or get_broker()
+        self.checkpoints = checkpoints or DatabaseCheckpoints()
+        self.batch_size = batch_size
+        self.position = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _handle(self, events):
+        await self.handler(events)
+        self.position = events[-1].position
+        await self.checkpoints.save(self.name, self.position)
+
+    async def catch_up(self, role: str = "read"):
+        """Handles everything already published after the checkpoint, straight from the outbox table."""
+        while True:
+            async with get_sessionmaker(role)() as db:
+                rows = (await db.execute(READ_AFTER, {"position": self.position, "batch_size": self.batch_size})).all()
+            if rows:
+                await self._handle(_events(rows))
+            if len(rows) < self.batch_size:
+                return
+
+    async def _run(self):
+        while True:
+            subscription = None
+            try:
+                self.position = await self.checkpoints.load(self.name)
+                # Subscribed before catching up, so nothing published in between is missed
+                subscription = await self.broker.subscribe()
+                await self.catch_up()
+                while True:
+                    published = await subscription.get(OUTBOX_CATCH_UP_SECONDS)
+                    if isinstance(published, int):
+                        # Only the position was published, read the events on the primary, a replica may lag
+                        if published > self.position:
+                            await self.catch_up("write")
+                        continue
+                    events = [event for event in published if event.position > self.position]
+                    if not events or events[0].position != self.position + 1:
+                        # Idle, or a batch arrived out of order / was missed: the table is authoritative
+                        await self.catch_up()
+                    else:
+                        await self._handle(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Outbox consumer %s failed, restarting: %r", self.name, e)
+                await asyncio.sleep(OUTBOX_POLL_SECONDS)
+            finally:
+                if subscription is not None:
+                    await subscription.close()
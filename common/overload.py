@@ -0,0 +1,309 @@
+"""Admission control for the FastAPI services: rate limits, concurrency limits and deadlines.
+
+`protect_app(app, service, routes)` adds OverloadMiddleware, which handles
+every request before it reaches its route:
+
+1. takes a token from the caller's bucket, RATE_LIMIT per second with
+   bursts of RATE_LIMIT_BURST, keyed by the bearer token's subject as
+   verified by common/token_verifier.py (sharing its cache) or else the
+   client address; without one it answers 429;
+2. takes a slot of the route's concurrency limiter, waiting at most
+   `queue_timeout` behind at most `queue` other requests; failing that it
+   answers 503;
+3. starts the route's deadline. Every transaction of the request's
+   `get_db`/`get_read_db` sessions sets its statement_timeout to the time
+   left (see `apply_deadline`); sessions outside such a request are left alone.
+
+Both rejections carry Retry-After and are counted in overload_shed_total.
+Unlisted routes share the service default limiter ("*"). Paths under
+/metrics, /health and /debug are never limited.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event, text
+from starlette.responses import JSONResponse
+from starlette.routing import Match, compile_path
+
+from common.cache import LRUCache, redis_client
+from common.metrics import OVERLOAD_ACTIVE, OVERLOAD_QUEUED, OVERLOAD_QUEUE_SECONDS, OVERLOAD_SHED
+from common.rate_limit import TokenBucket
+from logging_config import get_logger
+
+logger = get_logger("overload")
+
+# Limits of every route, overridden per route by `protect_app(routes=...)` and OVERLOAD_ROUTES
+OVERLOAD_CONCURRENCY = int(os.getenv("OVERLOAD_CONCURRENCY", "64"))
+OVERLOAD_QUEUE = int(os.getenv("OVERLOAD_QUEUE", "256"))
+OVERLOAD_QUEUE_TIMEOUT = float(os.getenv("OVERLOAD_QUEUE_TIMEOUT", "2"))
+# Seconds from arrival (queueing included) that DB statements may run until, 0 turns deadlines off
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "10"))
+# Per-route concurrency:queue, e.g. "POST /login=8:32,POST /activity/batch=4:16"
+OVERLOAD_ROUTES = os.getenv("OVERLOAD_ROUTES", "")
+
+# Requests per second per caller, 0 turns rate limiting off
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+# `local` keeps buckets per process, `redis` shares them between processes and services (REDIS_URL)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_KEYS = int(os.getenv("RATE_LIMIT_KEYS", "100000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+EXEMPT_PREFIXES = ("/metrics", "/health", "/debug")
+
+# Time by which the current request's statements must finish, see `remaining_time`
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+@dataclass
+class RouteLimit:
+    concurrency: int = OVERLOAD_CONCURRENCY
+    queue: int = OVERLOAD_QUEUE
+    queue_timeout: float = OVERLOAD_QUEUE_TIMEOUT
+    timeout: float | None = REQUEST_TIMEOUT or None  # None for routes that stream for longer, e.g. exports
+
+
+def parse_routes(spec: str) -> dict:
+    """Parses "POST /login=8:32" into {"POST /login": (8, 32)}."""
+    routes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, limits = item.rpartition("=")
+        concurrency, _, queue = limits.partition(":")
+        routes[" ".join(name.split())] = (int(concurrency), int(queue or 0))
+    return routes
+
+
+class ConcurrencyLimiter:
+    """At most `concurrency` requests at once, up to `queue` more wait `queue_timeout` for a slot."""
+
+    def __init__(self, service: str, name: str, limit: RouteLimit):
+        self.name = name
+        self.limit = limit
+        self.retry_after = max(1, math.ceil(limit.queue_timeout))
+        self._slots = asyncio.Semaphore(limit.concurrency)
+        self._waiting = 0
+        self.service = service
+        self.active = OVERLOAD_ACTIVE.labels(service, name)
+        self.queued = OVERLOAD_QUEUED.labels(service, name)
+        self.queue_seconds = OVERLOAD_QUEUE_SECONDS.labels(service, name)
+
+    async def acquire(self):
+        """None once a slot is held, otherwise why the request is shed."""
+        if not self._slots.locked():
+            await self._slots.acquire()  # Free slot and nobody queued, does not wait
+            self.active.inc()
+            return None
+        if self._waiting >= self.limit.queue:
+            return "queue_full"
+        self._waiting += 1
+        self.queued.inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.limit.queue_timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self._waiting -= 1
+            self.queued.dec()
+        self.queue_seconds.observe(time.perf_counter() - start)
+        self.active.inc()
+        return None
+
+    def release(self):
+        self.active.dec()
+        self._slots.release()
+
+    def shed(self, reason: str):
+        OVERLOAD_SHED.labels(self.service, self.name, reason).inc()
+
+
+class LocalRateLimiter:
+    """TokenBucket per caller in this process, idle buckets are dropped once they would be full again."""
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: float = RATE_LIMIT_BURST, maxsize: int = RATE_LIMIT_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = LRUCache(maxsize=maxsize, ttl=burst / rate + 1)
+
+    async def take(self, key: str) -> float:
+        """0 when the request may go ahead, otherwise seconds until the caller has a token again."""
+        bucket = self.buckets.get(key) or TokenBucket(self.rate, self.burst)
+        self.buckets.set(key, bucket)  # Refreshes the TTL of active callers
+        return 0.0 if bucket.try_acquire() else bucket.wait_time()
+
+
+# Token bucket in a redis hash, refilled from the server clock so that processes agree
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+tokens = math.min(burst, tokens + math.max(0, now - (tonumber(state[2]) or now)) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedRateLimiter:
+    """Token buckets in redis, one atomic script call per request. Fails open when redis is unavailable."""
+
+    key_prefix = "ratelimit:"
+
+    def __init__(self, store, rate: float = RATE_LIMIT, burst: float = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.script = store.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str) -> float:
+        try:
+            return float(await self.script(keys=[self.key_prefix + key], args=[self.rate, self.burst]))
+        except Exception as e:
+            logger.warning("Rate limit store unavailable, admitting request: %r", e)
+            return 0.0
+
+
+class CallerKeys:
+    """Rate limit key of a request: the verified subject of its bearer token, else the client address."""
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 300):
+        # Imported here, token_verifier imports common/http_client.py, which imports this module
+        from common.token_verifier import token_verifier
+
+        self.verifier = token_verifier  # Verified claims are cached there and reused by the route
+        self.rejected = LRUCache(maxsize=maxsize, ttl=ttl)  # Tokens that don't verify
+
+    def __call__(self, scope) -> str:
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                token = value[7:].decode("latin-1")
+                break
+        if token and self.rejected.get(token) is None:
+            claims = self.verifier.peek(token)
+            if claims is not None:
+                return f"user:{claims.get('uid') or claims.get('user_id')}"
+            self.rejected.set(token, True)  # Forged or expired, limited with the rest of its address
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+
+def build_rate_limiter():
+    if RATE_LIMIT <= 0:
+        return None
+    if RATE_LIMIT_BACKEND == "redis":
+        return SharedRateLimiter(redis_client(REDIS_URL))
+    return LocalRateLimiter()
+
+
+def _reject(status_code: int, detail: str, retry_after: float):
+    return JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class OverloadMiddleware:
+    """ASGI middleware shedding requests early with 429/503, see the module docstring."""
+
+    def __init__(self, app, service: str, router, routes: dict, rate_limiter=None):
+        self.app = app
+        self.service = service
+        self.router = router
+        self.routes = routes  # "METHOD /path" -> RouteLimit
+        self.default = ConcurrencyLimiter(service, "*", RouteLimit())
+        self.rate_limiter = rate_limiter
+        self.caller_key = CallerKeys()
+        self._limiters = None  # [(method, path regex, limiter)], resolved on the first request
+
+    def _resolve(self):
+        limiters = []
+        for name, limit in self.routes.items():
+            method, _, path = name.partition(" ")
+            # Routes of included routers aren't listed in router.routes, so look the route up by routing
+            # a request for it, once all routes are added
+            sample = {"type": "http", "method": method, "path": re.sub(r"{[^}]*}", "1", path), "root_path": ""}
+            if not any(route.matches(sample)[0] is Match.FULL for route in self.router.routes):
+                logger.warning("No %s route for its overload limit", name)
+                continue
+            limiters.append((method, compile_path(path)[0], ConcurrencyLimiter(self.service, name, limit)))
+        return limiters
+
+    def limiter(self, scope) -> ConcurrencyLimiter:
+        if self._limiters is None:
+            self._limiters = self._resolve()
+        for method, regex, limiter in self._limiters:
+            if scope["method"] == method and regex.match(scope["path"]):
+                return limiter
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        limiter = self.limiter(scope)
+        if self.rate_limiter is not None:
+            wait = await self.rate_limiter.take(self.caller_key(scope))
+            if wait:
+                limiter.shed("rate_limited")
+                await _reject(429, "Too many requests", wait)(scope, receive, send)
+                return
+
+        reason = await limiter.acquire()
+        if reason is not None:
+            limiter.shed(reason)
+            await _reject(503, "Service overloaded, retry later", limiter.retry_after)(scope, receive, send)
+            return
+
+        timeout = limiter.limit.timeout
+        token = _deadline.set(arrived + timeout) if timeout else None
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+            if token is not None:
+                _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left before the current request's deadline, None outside a request with one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def apply_deadline(session):
+    """Bounds every transaction of `session` (an AsyncSession) by the current request's deadline, if it has one."""
+    if _deadline.get() is not None:
+        event.listen(session.sync_session, "after_begin", _apply_statement_timeout)
+
+
+def _apply_statement_timeout(session, transaction, connection):
+    remaining = remaining_time()
+    if remaining is not None:
+        # Local to the transaction, pooled connections go back with their default. A bind parameter
+        # keeps asyncpg's prepared statement cache from filling with one statement per value
+        connection.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {"timeout": str(max(1, int(remaining * 1000)))},
+        )
+
+
+def protect_app(app, service: str, routes: dict | None = None):
+    """Adds OverloadMiddleware to a FastAPI app with per-route limits ({"POST /login": RouteLimit(...)}).
+
+    Call it before `instrument_app`, so that shed requests still show up in the request metrics.
+    """
+    routes = dict(routes or {})
+    for name, (concurrency, queue) in parse_routes(OVERLOAD_ROUTES).items():
+        base = routes.get(name, RouteLimit())
+        routes[name] = RouteLimit(concurrency, queue, base.queue_timeout, base.timeout)
+    app.add_middleware(
+        OverloadMiddleware, service=service, router=app.router, routes=routes, rate_limiter=build_rate_limiter(),
+    )
@@ -0,0 +1,62 @@
+"""Wall-clock sampling profiler, mounted by common/metrics.py when METRICS_PROFILER=true.
+
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" \
+        'localhost:8001/debug/profile?seconds=10&interval_ms=5' > out.folded
+
+samples the stack of every thread and returns them in collapsed format
+(`thread;frame;frame count` per line), ready for flamegraph.pl or
+speedscope. Sampling runs in its own thread and only while a profile is
+being taken, so it costs nothing otherwise. Only admin tokens may take a
+profile, and one runs at a time for at most PROFILE_MAX_SECONDS.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+# Longest profile one request may take
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+_running = threading.Lock()
+
+
+def _collapse(thread_name: str, frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """Collapsed stacks of all other threads, counted every `interval` seconds for `seconds`."""
+    own = threading.get_ident()
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                stacks[_collapse(names.get(ident, str(ident)), frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+async def profile(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    if not _running.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
+    try:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    finally:
+        _running.release()
+    return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average with bursts of up to `burst`.
+
+    `try_acquire` never waits; `acquire` sleeps until a token is available.
+    A rate of 0 or less means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` would be available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        # Taking the tokens up front (possibly going negative) queues waiters fairly
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+def parse_rates(spec: str) -> dict:
+    """Parses "email=50,sms=5" into {"email": 50.0, "sms": 5.0}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
@@ -0,0 +1,110 @@
+import hashlib
+import os
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+
+from common.cache import LRUCache, redis_client
+from common.metrics import CACHE_REQUESTS
+
+# `local` keeps an LRU per process, `redis` shares entries between processes (REDIS_URL)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "local")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Part of every key, bump it when a cached response model changes shape
+RESPONSE_CACHE_VERSION = "v1"
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+class ResponseCache:
+    """Serialized JSON responses by resource key, each with an ETag of its bytes.
+
+    Lookups go through the in-process LRU first and then the optional shared
+    store. `invalidate` clears both for this process; LRUs in other processes
+    age out after RESPONSE_CACHE_TTL. A response read from the database
+    before an invalidation of its key is not stored afterwards, see `set`.
+    """
+
+    def __init__(self, name: str, maxsize: int = RESPONSE_CACHE_SIZE, ttl: int = RESPONSE_CACHE_TTL, shared=None):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self.key_prefix = f"response:{RESPONSE_CACHE_VERSION}:{name}:"
+        self._generations = {}  # key -> invalidation count, only for keys invalidated in this process
+        self._hit = CACHE_REQUESTS.labels(name, "hit")
+        self._shared_hit = CACHE_REQUESTS.labels(name, "shared_hit")
+        self._miss = CACHE_REQUESTS.labels(name, "miss")
+
+    async def get(self, key: str):
+        cached = self.local.get(key)
+        if cached is not None:
+            self._hit.inc()
+            return cached
+        if self.shared is not None:
+            value = await self.shared.get(self.key_prefix + key)
+            if value is not None:
+                self._shared_hit.inc()
+                etag, _, body = value.partition(b"\n")
+                cached = CachedResponse(body, etag.decode())
+                self.local.set(key, cached)
+                return cached
+        self._miss.inc()
+        return None
+
+    def generation(self, key: str) -> int:
+        """Taken before reading from the database and passed on to `set`."""
+        return self._generations.get(key, 0)
+
+    async def set(self, key: str, body: bytes, generation: int | None = None) -> CachedResponse:
+        cached = CachedResponse(body, make_etag(body))
+        # A write invalidated the key while the body was being read, it may already be stale
+        if generation is not None and generation != self.generation(key):
+            return cached
+        self.local.set(key, cached)
+        if self.shared is not None:
+            await self.shared.set(self.key_prefix + key, cached.etag.encode() + b"\n" + body, ex=self.ttl)
+        return cached
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            self.local.delete(key)
+            self._generations[key] = self._generations.get(key, 0) + 1
+        limit = max(self.local.maxsize, 1000)
+        if len(self._generations) > limit:
+            # Only in-flight reads look at generations, old counters can go
+            self._generations = dict(list(self._generations.items())[-(limit // 2):])
+        if self.shared is not None and keys:
+            await self.shared.delete(*(self.key_prefix + key for key in keys))
+
+
+def build_response_cache(name: str) -> ResponseCache:
+    shared = redis_client(REDIS_URL) if RESPONSE_CACHE_BACKEND == "redis" else None
+    return ResponseCache(name, shared=shared)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """304 when the client already holds this body, otherwise the cached JSON, both with its ETag."""
+    # no-cache: clients revalidate every time, so invalidations are seen immediately
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,139 @@
+import os
+import time
+
+import httpx
+from fastapi import HTTPException
+from jose import jwt, JWTError
+from logging_config import get_logger
+from common.cache import LRUCache
+from common.http_client import CircuitOpenError, ServiceClient
+from common.metrics import AUTH_SECONDS, CACHE_REQUESTS
+
+logger = get_logger("auth")
+
+# Shared with user_service, tokens are HS256 signed with the same key
+SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret")
+ALGORITHM = "HS256"
+
+# "local" verifies the signature in-process, "remote" asks user_service `/validate_token`
+AUTH_MODE = os.getenv("AUTH_MODE", "local")
+USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://127.0.0.1:8002/validate_token")
+AUTH_TIMEOUT = float(os.getenv("AUTH_TIMEOUT", "2.0"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+_CACHE_HITS = CACHE_REQUESTS.labels("token", "hit")
+_CACHE_MISSES = CACHE_REQUESTS.labels("token", "miss")
+_CACHED_SECONDS = AUTH_SECONDS.labels("activity", "cache")
+
+
+def decode_token(token: str):
+    """(claims, exp) of a token signed with SECRET_KEY, raises JWTError for forged, expired or incomplete ones."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user_id = payload.get("sub")
+    role = payload.get("role")
+    if not user_id or not role:
+        raise JWTError("Token is missing `sub` or `role` claims")
+
+    claims = {"user_id": user_id, "role": role}
+    if payload.get("uid") is not None:
+        claims["uid"] = payload["uid"]  # numeric user_id, present in tokens issued by `/login`
+    return claims, payload.get("exp")
+
+
+class TokenCache(LRUCache):
+    """Bounded LRU of verified token claims, entries never outlive the token's `exp`."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+
+    def set(self, token: str, claims: dict, exp: float | None = None):
+        super().set(token, claims, ttl=None if exp is None else exp - time.time())
+
+
+class TokenVerifier:
+    """Verifies bearer tokens for activity_service and ml_mood_service routes."""
+
+    def __init__(self, mode: str = AUTH_MODE, cache: TokenCache | None = None, url: str = USER_SERVICE_URL):
+        self.mode = mode
+        self.url = url
+        self.cache = cache if cache is not None else TokenCache()
+        self.client = ServiceClient("user_service", timeout=AUTH_TIMEOUT)
+
+    async def verify(self, token: str) -> dict:
+        start = time.perf_counter()
+        claims = self.cache.get(token)
+        if claims is not None:
+            _CACHE_HITS.inc()
+            _CACHED_SECONDS.observe(time.perf_counter() - start)
+            return claims
+        _CACHE_MISSES.inc()
+
+        try:
+            if self.mode == "remote":
+                claims, exp = await self._verify_remote(token)
+            else:
+                claims, exp = self._verify_local(token)
+        finally:
+            AUTH_SECONDS.labels("activity", self.mode).observe(time.perf_counter() - start)
+
+        self.cache.set(token, claims, exp)
+        return claims
+
+    def peek(self, token: str) -> dict | None:
+        """Claims of `token` from the cache or a local signature check, None if it doesn't verify.
+
+        Never calls user_service, so in remote mode locally checked claims are not cached for `verify`.
+        """
+        claims = self.cache.get(token)
+        if claims is not None:
+            return claims
+        try:
+            claims, exp = decode_token(token)
+        except JWTError:
+            return None
+        if self.mode != "remote":
+            self.cache.set(token, claims, exp)
+        return claims
+
+    def _verify_local(self, token: str):
+        try:
+            return decode_token(token)
+        except JWTError as e:
+            logger.warning("Token validation failed: %s", str(e))
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    async def _verify_remote(self, token: str):
+        try:
+            # Concurrent requests carrying the same uncached token share one call
+            response = await self.client.get(
+                self.url,
+                headers={"Authorization": f"Bearer {token}"},
+                coalesce=token,
+            )
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail="Authentication service unavailable",
+                                headers={"Retry-After": str(max(1, round(e.retry_after)))})
+        except httpx.HTTPError as e:
+            logger.error("Error contacting user_service: %s", str(e))
+            raise HTTPException(status_code=503, detail="Authentication service unavailable")
+
+        if response.status_code >= 500:
+            logger.error("user_service answered %s to token validation", response.status_code)
+            raise HTTPException(status_code=503, detail="Authentication service unavailable")
+        if response.status_code != 200:
+            logger.warning("Token validation failed with status %s", response.status_code)
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+        # user_service already checked the signature, `exp` is only needed to bound the cache entry
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            exp = None
+        return response.json(), exp
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+token_verifier = TokenVerifier()
@@ -1,25 +1,77 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base
 import os
-from dotenv import load_dotenv
+from common.overload import apply_deadline
+from database.pool_metrics import instrument_engine, pool_class
 
-# Load database URL from .env
-load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica, routes that depend on `get_read_db` use it (defaults to the primary)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
 
-# Create an asynchronous engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Engine configuration, shared by the write and read engines
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statement cache per connection, set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
 
-# Create an asynchronous session maker
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+# Engines are created on first use, so importing models or scripts never connects
+_engines = {}
+_sessionmakers = {}
+
+def _create_engine(url, role):
+    url = make_url(url).update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=pool_class(role),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    instrument_engine(engine, role)
+    return engine
+
+def get_engine(role="write"):
+    """Engine for `write` (primary) or `read` (replica when DATABASE_READ_URL is set)."""
+    if role == "read" and not DATABASE_READ_URL:
+        role = "write"
+    if role not in _engines:
+        _engines[role] = _create_engine(DATABASE_READ_URL if role == "read" else DATABASE_URL, role)
+    return _engines[role]
+
+def get_sessionmaker(role="write"):
+    if role not in _sessionmakers:
+        _sessionmakers[role] = async_sessionmaker(get_engine(role), class_=AsyncSession, expire_on_commit=False)
+    return _sessionmakers[role]
+
+def async_session():
+    """New session on the primary, usable as `async with async_session() as db`."""
+    return get_sessionmaker("write")()
+
+async def dispose_engines():
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
+    _sessionmakers.clear()
 
 # Base class for models
 Base = declarative_base()
 
 # API for creating db session, can be used from other APIs
 async def get_db():
-    async with async_session() as db:
+    async with get_sessionmaker("write")() as db:
+        apply_deadline(db)  # statement_timeout from the request's deadline, see common/overload.py
         yield db  # Session will be automatically closed after exiting the block
+
+# Same as `get_db` but on the read replica, for routes that only read
+async def get_read_db():
+    async with get_sessionmaker("read")() as db:
+        apply_deadline(db)
+        yield db
@@ -0,0 +1,123 @@
+"""Apply pending SQL migrations and keep monthly partitions ahead of time.
+
+    python database/migrate.py              # apply pending migrations, then extend partitions
+    python database/migrate.py --status     # list applied and pending migrations
+    python database/migrate.py --partitions # only create upcoming partitions (run daily, e.g. from cron)
+
+activity_service also runs the partition step daily, see
+database/partition_maintenance.py. Rows that landed in a DEFAULT partition
+are moved into their month's partition when it is created.
+
+Migrations are the `database/migrations/NNNN_name.sql` files, applied in
+order, each in its own transaction, and recorded in `public.schema_migrations`.
+"""
+import argparse
+import os
+from pathlib import Path
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()  # Settings below come from .env too when run as a script, see common/env.py
+
+DATABASE_URL = os.getenv("DATABASE_URL_SYNC")
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# Tables partitioned by month on `date`, see 0002_partition_activity_and_mood.sql
+PARTITIONED_TABLES = ["activity_service.activity_data", "mood_service.mood_data"]
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+# Serializes concurrent runs, e.g. several pods starting at once
+MIGRATION_LOCK_ID = 4172
+
+
+def migration_files():
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.sql"))
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS public.schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM public.schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(conn):
+    """Applies every pending migration, returns the versions that were applied."""
+    applied = []
+    with conn.cursor() as cursor:
+        done = applied_versions(cursor)
+        conn.commit()
+        for path in migration_files():
+            version = path.stem
+            if version in done:
+                continue
+            try:
+                cursor.execute(path.read_text())
+                cursor.execute("INSERT INTO public.schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version}")
+            applied.append(version)
+    return applied
+
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Creates missing monthly partitions from the current month to `months_ahead` months out.
+
+    Also creates the months of rows sitting in a DEFAULT partition and moves them there.
+    """
+    created = 0
+    with conn.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            cursor.execute("SELECT public.ensure_monthly_partitions(%s, current_date, %s)", (table, months_ahead))
+            created += cursor.fetchone()[0]
+    conn.commit()
+    return created
+
+
+def print_status(conn):
+    with conn.cursor() as cursor:
+        done = applied_versions(cursor)
+    conn.commit()
+    for path in migration_files():
+        print(f"[{'x' if path.stem in done else ' '}] {path.stem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--partitions", action="store_true", help="only create upcoming monthly partitions")
+    args = parser.parse_args()
+
+    import psycopg2  # only needed to run migrations, not by services importing the settings above
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.status:
+            print_status(conn)
+            return
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            if not args.partitions:
+                applied = apply_migrations(conn)
+                print(f"Database is up to date ({len(applied)} migration(s) applied)")
+            print(f"Created {ensure_partitions(conn)} new partition(s)")
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,22 @@ CREATE TABLE IF NOT EXISTS activity_service.activity_data  (
     distance_km FLOAT,
     active_minutes INT,
     workout_type VARCHAR(50),
+    FOREIGN KEY (user_id) REFERENCES user_service.users(user_id),
+    -- Idempotency key for bulk syncs (PostgreSQL 15+ for NULLS NOT DISTINCT)
+    CONSTRAINT activity_data_daily_key UNIQUE NULLS NOT DISTINCT (user_id, date, workout_type)
+);
+
+-- Pre-aggregated activity totals per day/week/month, maintained on every activity write
+CREATE TABLE IF NOT EXISTS activity_service.activity_rollup (
+    user_id INT NOT NULL,
+    granularity VARCHAR(5) NOT NULL CHECK (granularity IN ('day', 'week', 'month')),
+    period_start DATE NOT NULL,
+    total_steps BIGINT NOT NULL DEFAULT 0,
+    total_calories FLOAT NOT NULL DEFAULT 0,
+    total_distance FLOAT NOT NULL DEFAULT 0,
+    total_active_minutes BIGINT NOT NULL DEFAULT 0,
+    activity_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, granularity, period_start),
     FOREIGN KEY (user_id) REFERENCES user_service.users(user_id)
 );
 
@@ -0,0 +1,113 @@
+-- Monthly range partitions and per-user daily keys for activity and mood data.
+-- Requires PostgreSQL 15+ (UNIQUE NULLS NOT DISTINCT).
+--
+-- The daily keys double as the composite (user_id, date) indexes: their
+-- leading columns serve per-user and per-user-per-date lookups, and date
+-- ranges additionally prune whole partitions.
+
+-- Creates `<parent>_YYYY_MM` partitions from `first_month` up to `months_ahead` past the current month
+CREATE OR REPLACE FUNCTION public.ensure_monthly_partitions(parent regclass, first_month date, months_ahead int)
+RETURNS int LANGUAGE plpgsql AS $$
+DECLARE
+    parent_schema text;
+    parent_name text;
+    cur_month date := date_trunc('month', first_month)::date;
+    last_month date := (date_trunc('month', current_date) + make_interval(months => months_ahead))::date;
+    partition_name text;
+    created int := 0;
+BEGIN
+    SELECT n.nspname, c.relname INTO parent_schema, parent_name
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = parent;
+
+    WHILE cur_month <= last_month LOOP
+        partition_name := format('%s_%s', parent_name, to_char(cur_month, 'YYYY_MM'));
+        IF to_regclass(format('%I.%I', parent_schema, partition_name)) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           parent_schema, partition_name, parent, cur_month, (cur_month + interval '1 month')::date);
+            created := created + 1;
+        END IF;
+        cur_month := (cur_month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END $$;
+
+-- Activity data ------------------------------------------------------------
+
+ALTER TABLE activity_service.activity_data RENAME TO activity_data_old;
+ALTER INDEX activity_service.activity_data_pkey RENAME TO activity_data_old_pkey;
+ALTER INDEX IF EXISTS activity_service.activity_data_daily_key RENAME TO activity_data_old_daily_key;
+ALTER SEQUENCE activity_service.activity_data_id_seq OWNED BY NONE;
+
+-- The partition key has to be part of every unique constraint, hence PRIMARY KEY (id, date)
+CREATE TABLE activity_service.activity_data (
+    id INT NOT NULL DEFAULT nextval('activity_service.activity_data_id_seq'),
+    user_id INT NOT NULL,
+    date DATE NOT NULL,
+    steps INT,
+    calories_burned FLOAT,
+    distance_km FLOAT,
+    active_minutes INT,
+    workout_type VARCHAR(50),
+    PRIMARY KEY (id, date),
+    FOREIGN KEY (user_id) REFERENCES user_service.users(user_id),
+    CONSTRAINT activity_data_daily_key UNIQUE NULLS NOT DISTINCT (user_id, date, workout_type)
+) PARTITION BY RANGE (date);
+ALTER SEQUENCE activity_service.activity_data_id_seq OWNED BY activity_service.activity_data.id;
+
+-- Safety net for dates outside the managed range
+CREATE TABLE activity_service.activity_data_default PARTITION OF activity_service.activity_data DEFAULT;
+
+SELECT public.ensure_monthly_partitions(
+    'activity_service.activity_data',
+    COALESCE((SELECT MIN(date) FROM activity_service.activity_data_old), current_date),
+    3
+);
+
+-- Databases created before the daily key existed may hold duplicates, the latest row wins
+INSERT INTO activity_service.activity_data
+    (id, user_id, date, steps, calories_burned, distance_km, active_minutes, workout_type)
+SELECT DISTINCT ON (user_id, date, workout_type)
+    id, user_id, date, steps, calories_burned, distance_km, active_minutes, workout_type
+FROM activity_service.activity_data_old
+ORDER BY user_id, date, workout_type, id DESC;
+
+DROP TABLE activity_service.activity_data_old;
+
+-- Mood data ----------------------------------------------------------------
+
+ALTER TABLE mood_service.mood_data RENAME TO mood_data_old;
+ALTER INDEX mood_service.mood_data_pkey RENAME TO mood_data_old_pkey;
+ALTER SEQUENCE mood_service.mood_data_id_seq OWNED BY NONE;
+
+CREATE TABLE mood_service.mood_data (
+    id INT NOT NULL DEFAULT nextval('mood_service.mood_data_id_seq'),
+    user_id INT NOT NULL,
+    date DATE NOT NULL,
+    heart_rate_avg INT,
+    sleep_hours FLOAT,
+    mood VARCHAR(50),
+    weather_conditions VARCHAR(50),
+    location VARCHAR(100),
+    PRIMARY KEY (id, date),
+    FOREIGN KEY (user_id) REFERENCES user_service.users(user_id),
+    CONSTRAINT mood_data_daily_key UNIQUE (user_id, date)
+) PARTITION BY RANGE (date);
+ALTER SEQUENCE mood_service.mood_data_id_seq OWNED BY mood_service.mood_data.id;
+
+CREATE TABLE mood_service.mood_data_default PARTITION OF mood_service.mood_data DEFAULT;
+
+SELECT public.ensure_monthly_partitions(
+    'mood_service.mood_data',
+    COALESCE((SELECT MIN(date) FROM mood_service.mood_data_old), current_date),
+    3
+);
+
+INSERT INTO mood_service.mood_data
+    (id, user_id, date, heart_rate_avg, sleep_hours, mood, weather_conditions, location)
+SELECT DISTINCT ON (user_id, date)
+    id, user_id, date, heart_rate_avg, sleep_hours, mood, weather_conditions, location
+FROM mood_service.mood_data_old
+ORDER BY user_id, date, id DESC;
+
+DROP TABLE mood_service.mood_data_old;
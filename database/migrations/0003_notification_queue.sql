@@ -0,0 +1,27 @@
+-- Delivery state for notification_service.notifications, which becomes the
+-- worker's job queue (see notification_service/worker.py).
+--
+-- A row is `pending` until a worker claims it (`sending`, leased until
+-- `locked_until`), then `sent`, back to `pending` with a later
+-- `available_at` for a retry, or `failed` after the last attempt. Leases that
+-- expire (crashed worker) make the row claimable again.
+
+ALTER TABLE notification_service.notifications
+    ADD COLUMN channel VARCHAR(20) NOT NULL DEFAULT 'email' CHECK (channel IN ('email', 'sms', 'push')),
+    -- Rows that predate the queue were delivered on insert
+    ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'sent' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    ADD COLUMN attempts INT NOT NULL DEFAULT 0,
+    ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN locked_until TIMESTAMP,
+    ADD COLUMN last_error TEXT;
+
+ALTER TABLE notification_service.notifications ALTER COLUMN status SET DEFAULT 'pending';
+-- Set when delivery succeeds, not on insert
+ALTER TABLE notification_service.notifications ALTER COLUMN sent_at DROP DEFAULT;
+
+-- Claim scans: due pending rows, and expired leases
+CREATE INDEX notifications_pending_idx ON notification_service.notifications (available_at)
+    WHERE status = 'pending';
+CREATE INDEX notifications_leased_idx ON notification_service.notifications (locked_until)
+    WHERE status = 'sending';
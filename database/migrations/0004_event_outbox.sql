@@ -0,0 +1,30 @@
+-- Transactional outbox for activity events (see common/outbox.py).
+--
+-- Writers insert events in the same transaction as the data they describe.
+-- The relay numbers committed events with `position`, in commit order, and
+-- publishes them; consumers remember the last position they processed.
+
+CREATE SEQUENCE activity_service.outbox_position_seq;
+
+CREATE TABLE activity_service.outbox (
+    id BIGSERIAL PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    user_id INT,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    position BIGINT UNIQUE,  -- NULL until relayed
+    published_at TIMESTAMP
+);
+
+-- The relay only scans events it has not published yet
+CREATE INDEX outbox_unpublished_idx ON activity_service.outbox (id) WHERE position IS NULL;
+CREATE INDEX outbox_published_at_idx ON activity_service.outbox (published_at) WHERE position IS NOT NULL;
+
+CREATE TABLE activity_service.outbox_checkpoints (
+    consumer VARCHAR(100) PRIMARY KEY,
+    position BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Lets event consumers enqueue a notification at most once per key, e.g. one step-goal message per user and day
+ALTER TABLE notification_service.notifications ADD COLUMN dedupe_key VARCHAR(100) UNIQUE;
@@ -0,0 +1,79 @@
+-- Monthly partitions for months that already have rows in the DEFAULT partition.
+--
+-- Rows dated past the managed range land in `<parent>_default`. Creating the
+-- partition for their month with `CREATE TABLE ... PARTITION OF` then fails
+-- ("updated partition constraint for default partition would be violated"),
+-- and so did every later migrate.py run. For such a month the partition is
+-- now built detached, the month's rows are moved into it from the default
+-- partition, and it is attached, all in the caller's transaction. Months that
+-- have rows in the default partition are created even outside the requested
+-- range, so stranded rows are moved out by the next run.
+
+-- Creates `<parent>_YYYY_MM` partitions from `first_month` up to `months_ahead` past the current month,
+-- plus every month that has rows in the default partition
+CREATE OR REPLACE FUNCTION public.ensure_monthly_partitions(parent regclass, first_month date, months_ahead int)
+RETURNS int LANGUAGE plpgsql AS $$
+DECLARE
+    parent_schema text;
+    parent_name text;
+    key_column text;
+    default_partition regclass;
+    last_month date := (date_trunc('month', current_date) + make_interval(months => months_ahead))::date;
+    has_stranded boolean := false;
+    stranded date[] := '{}';
+    cur_month date;
+    next_month date;
+    partition_table text;
+    created int := 0;
+BEGIN
+    SELECT n.nspname, c.relname INTO parent_schema, parent_name
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = parent;
+
+    SELECT a.attname INTO key_column
+    FROM pg_partitioned_table p JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent;
+
+    SELECT i.inhrelid::regclass INTO default_partition
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+
+    IF default_partition IS NOT NULL THEN
+        EXECUTE format('SELECT EXISTS (SELECT FROM %s)', default_partition) INTO has_stranded;
+    END IF;
+    IF has_stranded THEN
+        -- Writes wait until the rows are moved. The parent is locked first, in the same order writers lock
+        EXECUTE format('LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE', parent);
+        EXECUTE format('SELECT COALESCE(array_agg(DISTINCT date_trunc(''month'', %I)::date), ''{}'') FROM %s',
+                       key_column, default_partition)
+        INTO stranded;
+    END IF;
+
+    FOR cur_month IN
+        SELECT month_start::date FROM generate_series(date_trunc('month', first_month), last_month, interval '1 month') AS month_start
+        UNION
+        SELECT unnest(stranded)
+        ORDER BY 1
+    LOOP
+        next_month := (cur_month + interval '1 month')::date;
+        partition_table := format('%I.%I', parent_schema, format('%s_%s', parent_name, to_char(cur_month, 'YYYY_MM')));
+        CONTINUE WHEN to_regclass(partition_table) IS NOT NULL;
+
+        IF cur_month = ANY (stranded) THEN
+            EXECUTE format('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_table, parent);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %s SELECT * FROM moved',
+                default_partition, key_column, cur_month, key_column, next_month, partition_table
+            );
+            -- Indexes, the primary key and foreign keys of the parent are added to the partition on attach
+            EXECUTE format('ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (%L) TO (%L)',
+                           parent, partition_table, cur_month, next_month);
+            RAISE NOTICE 'Moved the rows of % out of the default partition', partition_table;
+        ELSE
+            EXECUTE format('CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           partition_table, parent, cur_month, next_month);
+        END IF;
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END $$;
@@ -0,0 +1,68 @@
+"""Keeps monthly partitions ahead of time from inside a service.
+
+`python database/migrate.py --partitions` does the same when run from cron.
+Without either, rows dated past the created months pile up in the DEFAULT
+partitions until someone runs it. Each run calls
+`public.ensure_monthly_partitions` (0005_partition_default_rows.sql), which
+also moves rows out of the default partition into their new month. Runs
+share migrate.py's advisory lock, so only one process does the work at a
+time.
+"""
+import asyncio
+import os
+
+from sqlalchemy import text
+
+from database.db_connection import get_sessionmaker
+from database.migrate import MIGRATION_LOCK_ID, PARTITION_MONTHS_AHEAD, PARTITIONED_TABLES
+from logging_config import get_logger
+
+logger = get_logger("partition_maintenance")
+
+# Run partition upkeep in this process, once at startup and then every PARTITION_MAINTENANCE_SECONDS
+PARTITION_MAINTENANCE = os.getenv("PARTITION_MAINTENANCE", "true").lower() == "true"
+PARTITION_MAINTENANCE_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "86400"))
+
+
+class PartitionMaintenance:
+    def __init__(self, interval: float = PARTITION_MAINTENANCE_SECONDS):
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run_once(self) -> int | None:
+        """Partitions created, None when another process holds the lock."""
+        async with get_sessionmaker("write")() as db:
+            locked = (await db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID}
+            )).scalar()
+            if not locked:
+                return None
+            created = 0
+            for table in PARTITIONED_TABLES:
+                created += (await db.execute(
+                    text("SELECT public.ensure_monthly_partitions(CAST(:table AS regclass), current_date, :months)"),
+                    {"table": table, "months": PARTITION_MONTHS_AHEAD},
+                )).scalar()
+            await db.commit()
+        return created
+
+    async def _run(self):
+        while True:
+            try:
+                created = await self.run_once()
+                if created:
+                    logger.info("Created %d monthly partition(s)", created)
+            except Exception as e:
+                logger.error("Partition maintenance failed: %r", e)
+            await asyncio.sleep(self.interval)
+
+
+partition_maintenance = PartitionMaintenance()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+import time
+
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from common.metrics import add_db_time
+
+# Distinct statements labelled individually, later ones share "other" to bound label cardinality
+DB_STATEMENT_LABELS = int(os.getenv("DB_STATEMENT_LABELS", "200"))
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection (including new connects)", ["role"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool", ["role"])
+DB_POOL_SIZE = Gauge("db_pool_connections_open", "Connections currently held by the pool", ["role"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Statement execution time", ["role", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_STATEMENT_SECONDS = Histogram(
+    "db_statement_seconds", "Execution time per statement, parameters and IN lists collapsed", ["role", "statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# `$1::INTEGER, $2::INTEGER, ...` (asyncpg) or `%(name)s` (psycopg2) placeholders
+_PLACEHOLDERS = re.compile(r"\$\d+(?:::[\w\[\]]+)?(?:\s*,\s*\$\d+(?:::[\w\[\]]+)?)*|%\(\w+\)s")
+_statement_labels = {}  # raw statement -> label
+_labels = set()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times how long checkouts wait for a connection."""
+
+    role = "write"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.role).observe(time.perf_counter() - start)
+
+
+def statement_label(statement: str) -> str:
+    label = _statement_labels.get(statement)
+    if label is not None:
+        return label
+    label = " ".join(_PLACEHOLDERS.sub("?", statement).split())
+    if len(label) > 120:
+        label = f"{label[:110]}... {hashlib.sha1(label.encode()).hexdigest()[:8]}"
+    if label not in _labels:
+        if len(_labels) >= DB_STATEMENT_LABELS:
+            label = "other"
+        else:
+            _labels.add(label)
+    if len(_statement_labels) < DB_STATEMENT_LABELS * 10:
+        _statement_labels[statement] = label
+    return label
+
+
+def pool_class(role: str):
+    return type(f"{role.title()}InstrumentedQueuePool", (InstrumentedQueuePool,), {"role": role})
+
+
+def instrument_engine(async_engine, role: str):
+    """Exports pool gauges and per-statement latency for one engine, and adds it to the request's DB time."""
+    sync_engine = async_engine.sync_engine
+    DB_POOL_IN_USE.labels(role).set_function(lambda: sync_engine.pool.checkedout())
+    DB_POOL_SIZE.labels(role).set_function(lambda: sync_engine.pool.checkedin() + sync_engine.pool.checkedout())
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # On the statement's own context, so a statement that fails leaves nothing behind on the connection
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(role, operation).observe(elapsed)
+        DB_STATEMENT_SECONDS.labels(role, statement_label(statement)).observe(elapsed)
+        add_db_time(elapsed)
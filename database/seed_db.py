@@ -1,46 +1,288 @@
-import psycopg2
+"""Seed the database from the CSVs in data/ or with synthetic data, through COPY.
+
+    python -m database.seed_db                                   # data/users.csv + data/student_health_data.csv
+    python -m database.seed_db --synthetic-users 10000 --days 365
+
+Tables are loaded in dependency order: users first, then activity and mood
+data in parallel worker processes, each with its own connection and
+transaction. Rows are validated and transformed in vectorized pandas/NumPy
+batches of --chunk-rows and streamed with `COPY ... FROM STDIN`.
+Run `database/migrate.py` first.
+"""
+import argparse
+import io
 import os
-import csv
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg2
+if __name__ == "__main__":
+    from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+    load_dotenv()  # Settings below come from .env too when run as a script, see common/env.py
 
 DATABASE_URL = os.getenv("DATABASE_URL_SYNC")
+# Every seeded user can log in with this password
+SEED_USER_PASSWORD = os.getenv("SEED_USER_PASSWORD", "changeme")
+
+USERS_CSV = "data/users.csv"
+HEALTH_CSV = "data/student_health_data.csv"
+
+USER_COLUMNS = ["user_id", "name", "age", "gender", "weight", "email", "password_hash", "role"]
+ACTIVITY_COLUMNS = ["user_id", "date", "steps", "calories_burned", "distance_km", "active_minutes", "workout_type"]
+MOOD_COLUMNS = ["user_id", "date", "heart_rate_avg", "sleep_hours", "mood", "weather_conditions", "location"]
+
+GENDERS = ["Male", "Female", "Prefer not to say"]
+WORKOUT_TYPES = ["walk", "run", "cycle", "swim", "gym", "yoga"]
+WEATHER = ["Sunny", "Cloudy", "Rainy", "Snowy"]
+LOCATIONS = ["Home", "Office", "Campus", "Gym", "Outdoors"]
 
-# Define the file paths for each table
-DATA_FILES = {
-    "users": "data/users_updated1.csv",
-    "activity": "data/activity.csv",
-    "mood": "data/mood.csv",
-}
 
-def insert_data_from_csv(table_name, file_path, insert_query):
-    """Reads CSV file and inserts data into the corresponding table."""
+def mood_from_stress(stress: pd.Series) -> pd.Series:
+    """Mood label for a 1-10 stress level, the dataset has no mood column of its own."""
+    return pd.cut(stress, bins=[0, 3, 6, 10], labels=["Happy", "Neutral", "Stressed"]).astype(object)
+
+
+def copy_frame(cursor, table, columns, frame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, columns=columns, header=False, index=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_table(table, columns, chunks, partitioned=False):
+    """COPY every frame of `chunks` into `table` in one transaction, returns (table, rows, seconds)."""
+    start = time.perf_counter()
+    rows = 0
+    conn = psycopg2.connect(DATABASE_URL)
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
+        with conn.cursor() as cursor:
+            for frame in chunks:
+                if frame.empty:
+                    continue
+                if partitioned:
+                    # Historical months get real partitions instead of landing in the default one
+                    cursor.execute("SELECT public.ensure_monthly_partitions(%s, %s, 0)", (table, frame["date"].min()))
+                copy_frame(cursor, table, columns, frame)
+                rows += len(frame)
+        conn.commit()
+    finally:
+        conn.close()
+    return table, rows, time.perf_counter() - start
+
+
+# --- CSV sources -----------------------------------------------------------
+
+def user_chunks(path, password_hash, chunk_rows, report):
+    seen_emails = set()
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        frame = chunk.rename(columns={"Name": "name", "Age": "age", "Gender": "gender", "Weight": "weight"})
+        # Same checks as the users table, rows that would fail the COPY are dropped up front
+        valid = (
+            frame["age"].between(20, 60)
+            & frame["weight"].between(50, 100)
+            & frame["gender"].isin(GENDERS)
+            & frame["email"].notna()
+        )
+        report["users dropped"] = report.get("users dropped", 0) + int((~valid).sum())
+        # Emails are unique across the whole file, not only within a chunk
+        frame = frame[valid].drop_duplicates("email")
+        frame = frame[~frame["email"].isin(seen_emails)]
+        seen_emails.update(frame["email"])
+        yield frame.assign(password_hash=password_hash, role="user")
+
+
+def health_keys(path, user_ids):
+    """(user_id, date) of every health record and which records to keep.
+
+    Student ids are mapped from the smallest id in the whole file, so a
+    student maps to the same user whatever chunk its records fall in. One mood
+    record is kept per user and day (mood_data_daily_key), the last reading in
+    the file.
+    """
+    keys = pd.read_csv(path, usecols=["Student ID", "Date and Time"])
+    student_ids = keys["Student ID"].to_numpy()
+    frame = pd.DataFrame({
+        "user_id": user_ids[(student_ids - student_ids.min()) % len(user_ids)],
+        "date": pd.to_datetime(keys["Date and Time"]).dt.date,
+    })
+    return frame, ~frame.duplicated(["user_id", "date"], keep="last").to_numpy()
+
+
+def mood_chunks_from_health(path, user_ids, chunk_rows):
+    """Maps student health records onto seeded users, student ids are assigned to users round-robin."""
+    keys, keep = health_keys(path, np.sort(np.asarray(user_ids)))
+    offset = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        rows = slice(offset, offset + len(chunk))
+        offset += len(chunk)
+        frame = pd.DataFrame({
+            "user_id": keys["user_id"].to_numpy()[rows],
+            "date": keys["date"].to_numpy()[rows],
+            "heart_rate_avg": chunk["Heart Rate (bpm)"].round().astype("Int64"),
+            "sleep_hours": chunk["Sleep Duration (hours)"],
+            "mood": mood_from_stress(chunk["Stress Level (1-10)"]),
+            "weather_conditions": None,
+            "location": None,
+        }, index=chunk.index)
+        yield frame[keep[rows]]
+
+
+def load_users_csv(path, password_hash, chunk_rows):
+    report = {}
+    result = load_table("user_service.users", USER_COLUMNS, user_chunks(path, password_hash, chunk_rows, report))
+    return result, report
+
+
+def load_mood_csv(path, user_ids, chunk_rows):
+    return load_table("mood_service.mood_data", MOOD_COLUMNS, mood_chunks_from_health(path, user_ids, chunk_rows),
+                      partitioned=True)
+
+
+# --- Synthetic sources -----------------------------------------------------
+
+def synthetic_user_chunks(count, password_hash, chunk_rows, seed, run_id):
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk_rows):
+        index = np.arange(start, min(count, start + chunk_rows))
+        yield pd.DataFrame({
+            "name": [f"Synthetic {i}" for i in index],
+            "age": rng.integers(20, 61, len(index)),
+            "gender": rng.choice(GENDERS, len(index)),
+            "weight": rng.uniform(50, 100, len(index)).round(1),
+            "email": [f"synthetic_{run_id}_{i}@example.com" for i in index],
+            "password_hash": password_hash,
+            "role": "user",
+        })
+
 
-        with open(file_path, "r", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip header row
-            cur.executemany(insert_query, reader)
+def synthetic_daily_chunks(user_ids, days, chunk_rows, seed, make_columns):
+    """Yields one row per user and day for the last `days` days, `chunk_rows` rows at a time."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days).date
+    users_per_chunk = max(1, chunk_rows // days)
+    for start in range(0, len(user_ids), users_per_chunk):
+        block = np.asarray(user_ids[start:start + users_per_chunk])
+        frame = pd.DataFrame({"user_id": np.repeat(block, days), "date": np.tile(dates, len(block))})
+        yield frame.assign(**make_columns(rng, len(frame)))
 
+
+def activity_columns(rng, n):
+    steps = rng.gamma(4.0, 2000.0, n).astype(int)
+    return {
+        "steps": steps,
+        "calories_burned": (steps * rng.uniform(0.03, 0.05, n)).round(1),
+        "distance_km": (steps * rng.uniform(0.0006, 0.0008, n)).round(2),
+        "active_minutes": rng.integers(0, 150, n),
+        "workout_type": rng.choice(WORKOUT_TYPES, n),
+    }
+
+
+def mood_columns(rng, n):
+    stress = pd.Series(rng.integers(1, 11, n))
+    return {
+        "heart_rate_avg": rng.normal(72, 8, n).round().astype(int),
+        "sleep_hours": rng.normal(7, 1.2, n).clip(3, 11).round(1),
+        "mood": mood_from_stress(stress),
+        "weather_conditions": rng.choice(WEATHER, n),
+        "location": rng.choice(LOCATIONS, n),
+    }
+
+
+def load_synthetic_users(count, password_hash, chunk_rows, seed, run_id):
+    return load_table("user_service.users", USER_COLUMNS[1:],
+                      synthetic_user_chunks(count, password_hash, chunk_rows, seed, run_id))
+
+
+def load_synthetic_activity(user_ids, days, chunk_rows, seed):
+    return load_table("activity_service.activity_data", ACTIVITY_COLUMNS,
+                      synthetic_daily_chunks(user_ids, days, chunk_rows, seed, activity_columns), partitioned=True)
+
+
+def load_synthetic_mood(user_ids, days, chunk_rows, seed):
+    return load_table("mood_service.mood_data", MOOD_COLUMNS,
+                      synthetic_daily_chunks(user_ids, days, chunk_rows, seed + 1, mood_columns), partitioned=True)
+
+
+# --- Orchestration ---------------------------------------------------------
+
+def fetch_user_ids(email_pattern=None):
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cursor:
+            if email_pattern:
+                cursor.execute("SELECT user_id FROM user_service.users WHERE email LIKE %s ORDER BY user_id",
+                               (email_pattern,))
+            else:
+                cursor.execute("SELECT user_id FROM user_service.users ORDER BY user_id")
+            return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def finalize():
+    """Resync the users sequence after explicit ids and rebuild the activity rollups."""
+    from activity_service.rollups import REBUILD_ALL
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence('user_service.users', 'user_id'), "
+                "COALESCE(MAX(user_id), 1)) FROM user_service.users"
+            )
+            for statement in REBUILD_ALL:
+                cursor.execute(str(statement))
+            cursor.execute("ANALYZE user_service.users, activity_service.activity_data, mood_service.mood_data")
         conn.commit()
-        cur.close()
+    finally:
         conn.close()
-        print(f"Data inserted into {table_name} successfully!")
-    
-    except Exception as e:
-        print(f"Error inserting data into {table_name}:", e)
-
-# Insert queries for each table
-INSERT_QUERIES = {
-    "users": "INSERT INTO user_service.users (user_id, name, age, gender, weight, email, password_hash,role) VALUES (%s, %s, %s, %s, %s, %s, %s,%s)",
-    "activity": "INSERT INTO activity_service.activity_data (user_id, date, steps, calories_burned, distance_km, active_minutes, workout_type) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-    "mood": "INSERT INTO mood_service.mood_data (user_id, date, heart_rate_avg, sleep_hours, mood, weather_conditions, location) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-}
-
-# Execute data insertion for each table
-for table, file_path in DATA_FILES.items():
-    insert_data_from_csv(table, file_path, INSERT_QUERIES[table])
+
+
+def report_result(table, rows, seconds):
+    rate = rows / seconds if seconds else 0.0
+    print(f"{table:<32} {rows:>12,} rows  {seconds:8.2f}s  {rate:>12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database through COPY")
+    parser.add_argument("--users-csv", default=USERS_CSV)
+    parser.add_argument("--health-csv", default=HEALTH_CSV)
+    parser.add_argument("--synthetic-users", type=int, default=0, help="generate this many users instead of the CSVs")
+    parser.add_argument("--days", type=int, default=365, help="days of synthetic activity/mood per user")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from passlib.context import CryptContext
+
+    password_hash = CryptContext(schemes=["bcrypt"]).hash(SEED_USER_PASSWORD)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        if args.synthetic_users:
+            run_id = int(time.time())
+            report_result(*load_synthetic_users(args.synthetic_users, password_hash, args.chunk_rows, args.seed, run_id))
+            user_ids = fetch_user_ids(f"synthetic_{run_id}_%")
+            jobs = [
+                pool.submit(load_synthetic_activity, user_ids, args.days, args.chunk_rows, args.seed),
+                pool.submit(load_synthetic_mood, user_ids, args.days, args.chunk_rows, args.seed),
+            ]
+        else:
+            result, report = load_users_csv(args.users_csv, password_hash, args.chunk_rows)
+            report_result(*result)
+            for name, count in report.items():
+                print(f"  {name}: {count}")
+            jobs = [pool.submit(load_mood_csv, args.health_csv, fetch_user_ids(), args.chunk_rows)]
+
+        for job in jobs:
+            report_result(*job.result())
+
+    finalize()
+    print(f"Seeding finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Shared logging setup for every service.
+
+Records are put on an in-memory queue by the calling thread and written by a
+QueueListener thread, so JSON encoding, redaction and file I/O stay off the
+request path. Output goes to stderr and to daily `LOG_DIR/<service>_<date>.log`
+files (read back by activity_service's `/admin/activity/logs`).
+
+    LOG_LEVEL=INFO                                   # root level
+    LOG_LEVELS=sqlalchemy.engine=WARNING,outbox=DEBUG
+    LOG_SAMPLE_RATES=activity_service=0.1            # share of DEBUG/INFO records kept, per logger
+    LOG_FORMAT=json                                  # or text
+    LOG_DIR=logs                                     # empty to disable log files
+
+Services call `configure_logging(<service>)` once at startup; modules only
+call `get_logger(name)`.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from datetime import date, datetime, timezone
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+
+# Values of these fields (in `extra=` or dict arguments) are never written
+REDACTED_FIELDS = {"password", "password_hash", "token", "access_token", "authorization", "secret", "secret_key"}
+REDACTED = "[REDACTED]"
+# Secrets that end up inside messages: JWTs and bearer credentials
+SECRET_PATTERNS = re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+|(?<=Bearer )[\w.~+/-]+=*", re.IGNORECASE)
+
+# Attributes every LogRecord has, anything else came from `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def _parse_pairs(spec: str) -> dict:
+    pairs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return SECRET_PATTERNS.sub(REDACTED, value)
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of DEBUG/INFO records per logger (and its children), WARNING and above always pass."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class FastQueueHandler(logging.handlers.QueueHandler):
+    """Only merges the message arguments on the calling thread, formatting happens in the listener."""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        try:
+            # Dict arguments are redacted before they are merged, e.g. logger.info("payload %s", payload)
+            args = record.args
+            if isinstance(args, dict):
+                record.args = redact(args)
+            elif args and any(isinstance(arg, dict) for arg in args):
+                record.args = tuple(redact(args))
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": SECRET_PATTERNS.sub(REDACTED, record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = REDACTED if key.lower() in REDACTED_FIELDS else redact(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        return SECRET_PATTERNS.sub(REDACTED, super().format(record))
+
+
+class DailyFileHandler(logging.FileHandler):
+    """Writes to `<directory>/<prefix>_<YYYY-MM-DD>.log`, switching files at midnight (local time)."""
+
+    def __init__(self, directory: str, prefix: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.day = date.today()
+        self.rollover_at = self._next_midnight()
+        super().__init__(self._path(), encoding="utf-8", delay=True)
+
+    def _path(self):
+        return os.path.join(self.directory, f"{self.prefix}_{self.day.isoformat()}.log")
+
+    @staticmethod
+    def _next_midnight():
+        now = datetime.now()
+        return now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp() + 86400
+
+    def emit(self, record):
+        if record.created >= self.rollover_at:
+            self.close()
+            self.day = date.today()
+            self.rollover_at = self._next_midnight()
+            self.baseFilename = os.path.abspath(self._path())
+        super().emit(record)
+
+
+def configure_logging(service: str):
+    """Installs the queue handler on the root logger, safe to call more than once."""
+    global _listener
+    stop_logging()
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if LOG_DIR:
+        handlers.append(DailyFileHandler(LOG_DIR, service))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = FastQueueHandler(log_queue)
+    rates = {name: float(rate) for name, rate in _parse_pairs(LOG_SAMPLE_RATES).items()}
+    if rates:
+        queue_handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse_pairs(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread (also runs at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,186 @@
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException
+from pydantic import BaseModel, conlist
+from logging_config import configure_logging, get_logger
+from ml_mood_service import inference
+from ml_mood_service.batcher import MicroBatcher
+from ml_mood_service.features import vectorize
+from ml_mood_service.mood_routes import router as mood_router
+from common.metrics import instrument_app
+from common.feature_store import FEATURE_STORE_PATH, FeatureStore, load_snapshot, snapshot_changed
+from common.token_verifier import token_verifier
+from database.db_connection import dispose_engines
+
+logger = get_logger("ml_mood_service")
+
+MODEL_PATH = os.getenv("MOOD_MODEL_PATH", str(Path(__file__).resolve().parent / "model.pkl"))
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", "2"))
+# Micro-batching of concurrent /predict calls
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "64"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+# Largest body accepted by /predict/batch, split into PREDICT_MAX_BATCH * 16 row chunks across workers
+PREDICT_BATCH_LIMIT = int(os.getenv("PREDICT_BATCH_LIMIT", "10000"))
+# How often to check for a newer feature store snapshot written by activity_service
+FEATURE_STORE_RELOAD_SECONDS = float(os.getenv("FEATURE_STORE_RELOAD_SECONDS", "10"))
+
+#Pydantic schema for prediction requests, same shape as mood_service.mood_data.
+#With a user_id, the user's 7/30-day rolling features come from the feature store
+class MoodFeatures(BaseModel):
+    user_id: Optional[int] = None
+    heart_rate_avg: Optional[float] = None
+    sleep_hours: Optional[float] = None
+    weather_conditions: Optional[str] = None
+    location: Optional[str] = None
+
+class MoodPrediction(BaseModel):
+    mood: str
+    probabilities: Optional[Dict[str, float]] = None
+
+class MoodBatchRequest(BaseModel):
+    items: conlist(MoodFeatures, min_length=1, max_length=PREDICT_BATCH_LIMIT) # type: ignore
+
+
+class MoodPredictor:
+    """Owns the model metadata, the worker pool and the micro-batcher."""
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.artifact = None
+        self.pool = None
+        self.batcher = None
+        self.features = FeatureStore()
+        self._reload_task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.pool is not None
+
+    async def start(self):
+        # Loaded here for feature names and defaults, off the event loop since unpickling imports sklearn.
+        # Forked workers inherit this copy instead of loading it again
+        self.artifact = await asyncio.to_thread(inference.init_worker, self.model_path)
+        self.pool = ProcessPoolExecutor(
+            max_workers=PREDICT_WORKERS, initializer=inference.init_worker, initargs=(self.model_path,)
+        )
+        loop = asyncio.get_running_loop()
+        feature_count = len(self.artifact["features"])
+        await asyncio.gather(*(
+            loop.run_in_executor(self.pool, inference.warm_up, feature_count) for _ in range(PREDICT_WORKERS)
+        ))
+        self.batcher = MicroBatcher(
+            self.predict_rows, PREDICT_MAX_BATCH, PREDICT_MAX_WAIT_MS / 1000, max_in_flight=PREDICT_WORKERS
+        )
+        self.batcher.start()
+        logger.info("Mood model %s loaded with %d workers", self.artifact.get("version"), PREDICT_WORKERS)
+
+    def start_feature_reloads(self):
+        self._reload_task = asyncio.create_task(self._watch_features())
+
+    async def _watch_features(self):
+        """Swaps in the newest feature store snapshot, lookups never wait for a load."""
+        while True:
+            if snapshot_changed(self.features, FEATURE_STORE_PATH):
+                try:
+                    self.features = await asyncio.to_thread(load_snapshot, FEATURE_STORE_PATH)
+                    logger.info("Feature store reloaded for %d users", len(self.features))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error("Feature store snapshot %s could not be loaded: %r", FEATURE_STORE_PATH, e)
+            await asyncio.sleep(FEATURE_STORE_RELOAD_SECONDS)
+
+    def with_stored_features(self, row: dict) -> dict:
+        """Adds the user's rolling features, values sent with the request take precedence."""
+        stored = self.features.lookup(row["user_id"]) if row.get("user_id") is not None else None
+        if not stored:
+            return row
+        merged = {name: value for name, value in stored.items() if not math.isnan(value)}
+        merged.update((name, value) for name, value in row.items() if value is not None)
+        return merged
+
+    async def stop(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def predict_rows(self, rows: List[dict]) -> List[MoodPrediction]:
+        rows = [self.with_stored_features(row) for row in rows]
+        matrix = vectorize(rows, self.artifact["features"], self.artifact.get("defaults"))
+        labels, probabilities = await asyncio.get_running_loop().run_in_executor(
+            self.pool, inference.predict_matrix, matrix
+        )
+        classes = [str(label) for label in self.artifact.get("classes", [])]
+        return [
+            MoodPrediction(
+                mood=str(label),
+                probabilities=dict(zip(classes, probabilities[i])) if probabilities and classes else None,
+            )
+            for i, label in enumerate(labels)
+        ]
+
+
+predictor = MoodPredictor(MODEL_PATH)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    predictor.start_feature_reloads()
+    try:
+        await predictor.start()
+    except Exception as e:
+        # Keep serving /health so the failure is visible, predictions answer 503
+        logger.error("Mood model could not be loaded from %s: %r", MODEL_PATH, e)
+    yield
+    await predictor.stop()
+    # Pooled connections to user_service for the /mood routes (only opened when AUTH_MODE=remote)
+    await token_verifier.aclose()
+    await dispose_engines()
+
+router = APIRouter()
+
+def require_model():
+    if not predictor.ready:
+        raise HTTPException(status_code=503, detail="Mood model is not loaded")
+
+@router.get("/health", tags=["Health"])
+async def health():
+    return {"model_loaded": predictor.ready, "model_version": (predictor.artifact or {}).get("version")}
+
+# Single prediction, concurrent calls are micro-batched into one model call
+@router.post("/predict", response_model=MoodPrediction, tags=["Predict"])
+async def predict(features: MoodFeatures):
+    require_model()
+    return await predictor.batcher.submit(features.model_dump())
+
+# Many predictions at once, chunks are spread over the worker processes
+@router.post("/predict/batch", response_model=List[MoodPrediction], tags=["Predict"])
+async def predict_batch(request: MoodBatchRequest):
+    require_model()
+    rows = [item.model_dump() for item in request.items]
+    chunk = PREDICT_MAX_BATCH * 16
+    results = await asyncio.gather(*(
+        predictor.predict_rows(rows[start:start + chunk]) for start in range(0, len(rows), chunk)
+    ))
+    return [prediction for part in results for prediction in part]
+
+def create_app() -> FastAPI:
+    """The ML Mood Service app. The model is loaded by the lifespan, engines on first use."""
+    configure_logging("mood")
+    app = FastAPI(title="ML Mood Service", lifespan=lifespan)
+    app.include_router(router)
+    # Mood history ingestion and analytics over mood_service.mood_data
+    app.include_router(mood_router)
+    instrument_app(app, "mood")
+    return app
+
+# `uvicorn ml_mood_service.app:app`, or `--factory ml_mood_service.app:create_app`
+app = create_app()
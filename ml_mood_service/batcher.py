@@ -0,0 +1,81 @@
+import asyncio
+
+
+class MicroBatcher:
+    """Groups concurrent single predictions into one vectorized call.
+
+    A batch is dispatched when it reaches `max_batch` rows or when its first
+    row has waited `max_wait` seconds. At most `max_in_flight` batches run at
+    once; while they are busy new rows keep accumulating into the next batch.
+    `stop` lets dispatched batches finish and fails the rows still waiting.
+    """
+
+    def __init__(self, run_batch, max_batch: int, max_wait: float, max_in_flight: int):
+        self.run_batch = run_batch  # async callable: list of rows -> list of results
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._task = None
+        self._dispatches = set()  # the loop only keeps weak references to tasks
+
+    def start(self):
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            self._fail([(None, future)], RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._in_flight.acquire()
+            except asyncio.CancelledError:
+                self._fail(batch, RuntimeError("Micro-batcher stopped"))
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            results = await self.run_batch([row for row, _ in batch])
+        except Exception as e:
+            self._fail(batch, e)
+        except asyncio.CancelledError:
+            self._fail(batch, RuntimeError("Micro-batcher stopped"))
+            raise
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._in_flight.release()
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
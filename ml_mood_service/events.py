@@ -0,0 +1,12 @@
+from common.events import MOOD_LOGGED
+from common.outbox import add_event
+
+# Relayed by activity_service's OutboxRelay, the outbox table is shared
+
+
+async def mood_logged(db, user_id: int, rows):
+    """Records a `mood.logged` event with the upserted days' sleep and heart rate, in the caller's transaction."""
+    await add_event(db, MOOD_LOGGED, user_id, {"days": [
+        {"date": row.date.isoformat(), "sleep_hours": row.sleep_hours, "heart_rate_avg": row.heart_rate_avg}
+        for row in rows
+    ]})
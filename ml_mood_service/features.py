@@ -0,0 +1,46 @@
+import numpy as np
+
+from common.feature_store import ROLLING_FEATURES, ROLLING_INPUTS, ROLLING_WINDOWS  # noqa: F401
+
+# Inputs accepted by the mood model, shaped like mood_service.mood_data
+NUMERIC_INPUTS = ["heart_rate_avg", "sleep_hours"]
+CATEGORICAL_INPUTS = ["weather_conditions", "location"]
+
+MOOD_LABELS = ["Happy", "Neutral", "Stressed"]
+
+
+def vectorize(rows, features, defaults=None):
+    """Feature matrix for `rows` (dicts) in the column order the model was trained with.
+
+    A feature named `column=value` is the one-hot indicator of a categorical
+    input, anything else is read as a number. Missing inputs fall back to the
+    artifact's training defaults, or NaN.
+    """
+    defaults = defaults or {}
+    matrix = np.empty((len(rows), len(features)), dtype=np.float64)
+    for j, feature in enumerate(features):
+        column, _, category = feature.partition("=")
+        if category:
+            matrix[:, j] = [row.get(column) == category for row in rows]
+        else:
+            fallback = defaults.get(feature, np.nan)
+            matrix[:, j] = [fallback if row.get(feature) is None else row[feature] for row in rows]
+    return matrix
+
+
+def rolling_features(frame):
+    """Adds `<input>_<N>d` columns to a frame with user_id, date and ROLLING_INPUTS.
+
+    One vectorized time-based rolling mean per window over all users at
+    once; each user's window only covers that user's own earlier days.
+    """
+    import pandas as pd
+
+    frame = frame.sort_values(["user_id", "date"], kind="stable").reset_index(drop=True)
+    indexed = frame.assign(date=pd.to_datetime(frame["date"])).set_index("date")
+    grouped = indexed.groupby("user_id", sort=False)[ROLLING_INPUTS]
+    for days in ROLLING_WINDOWS:
+        means = grouped.rolling(f"{days}D", min_periods=1).mean()
+        for column in ROLLING_INPUTS:
+            frame[f"{column}_{days}d"] = means[column].to_numpy(dtype=np.float32)
+    return frame
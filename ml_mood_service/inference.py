@@ -0,0 +1,44 @@
+"""Model loading and prediction, executed inside the inference worker processes."""
+import os
+
+import numpy as np
+
+# Artifacts at least this large are memory-mapped so workers started without fork share their pages.
+# Below it, one mmap per tree array costs more than the plain load saves
+MODEL_MMAP_MIN_BYTES = int(os.getenv("MODEL_MMAP_MIN_BYTES", str(64 * 2**20)))
+
+_artifact = None
+_path = None
+
+
+def load_artifact(path):
+    """Loads a model artifact, large ones with their numpy arrays memory-mapped."""
+    import joblib  # with sklearn, pulled in by the first load rather than by importing the app
+
+    mmap_mode = "r" if os.path.getsize(path) >= MODEL_MMAP_MIN_BYTES else None
+    artifact = joblib.load(path, mmap_mode=mmap_mode)
+    if not isinstance(artifact, dict) or "model" not in artifact or "features" not in artifact:
+        raise ValueError(f"{path} is not a mood model artifact, run ml_mood_service/train_model.py")
+    return artifact
+
+
+def init_worker(path):
+    """Loads the model for this process, unless it was inherited already loaded from a forked parent."""
+    global _artifact, _path
+    if _path != path:
+        _artifact = load_artifact(path)
+        _path = path
+    return _artifact
+
+
+def predict_matrix(matrix):
+    """Returns (labels, probabilities or None) for a 2-D feature matrix."""
+    model = _artifact["model"]
+    labels = model.predict(matrix)
+    probabilities = model.predict_proba(matrix) if hasattr(model, "predict_proba") else None
+    return labels.tolist(), None if probabilities is None else probabilities.tolist()
+
+
+def warm_up(feature_count):
+    """First call pays for lazy imports and page faults, done before traffic arrives."""
+    return predict_matrix(np.zeros((1, feature_count)))
@@ -0,0 +1,176 @@
+"""Columnar per-user mood histories behind the analytics endpoints.
+
+A user's history is read once from mood_service.mood_data, streamed in
+MOOD_CHUNK_ROWS chunks that are each turned into NumPy columns, and kept
+as a MoodHistory snapshot until the user ingests new rows or
+MOOD_SNAPSHOT_TTL passes. An analytics request is then a binary search
+for its date range plus a few vectorized reductions over that slice, with
+no Python loop over the days.
+"""
+import os
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.cache import LRUCache
+from common.feature_store import EPOCH_ORDINAL
+from common.metrics import CACHE_REQUESTS
+from ml_mood_service.features import MOOD_LABELS
+from ml_mood_service.mood_model import MoodRecord
+
+MOOD_CHUNK_ROWS = int(os.getenv("MOOD_CHUNK_ROWS", "5000"))
+# A user with ten years of daily records takes about 60 KB
+MOOD_SNAPSHOT_CACHE_SIZE = int(os.getenv("MOOD_SNAPSHOT_CACHE_SIZE", "5000"))
+MOOD_SNAPSHOT_TTL = int(os.getenv("MOOD_SNAPSHOT_TTL", "300"))
+
+# Ordinal score per MOOD_LABELS code for correlations: Happy 2, Neutral 1, Stressed 0
+MOOD_SCORES = np.array([2.0, 1.0, 0.0])
+FACTORS = ("sleep_hours", "heart_rate_avg")
+
+
+@dataclass
+class MoodHistory:
+    """One user's mood records as columns sorted by day, `moods` holds MOOD_LABELS codes (-1 for none)."""
+
+    days: np.ndarray  # datetime64[D]
+    moods: np.ndarray  # int8
+    sleep_hours: np.ndarray  # float32, NaN when missing
+    heart_rate_avg: np.ndarray  # float32, NaN when missing
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Columns of (date, mood, sleep_hours, heart_rate_avg) rows, one chunk of the stream."""
+        if not rows:
+            return cls.empty()
+        days, labels, sleep, heart = zip(*rows)
+        labels = np.array(labels, dtype=object)
+        moods = np.full(len(labels), -1, dtype=np.int8)
+        for code, label in enumerate(MOOD_LABELS):
+            moods[labels == label] = code
+        # Through ordinals, numpy converts date objects one by one at 20x the cost
+        ordinals = np.fromiter(map(date.toordinal, days), dtype=np.int64, count=len(days))
+        return cls(
+            (ordinals - EPOCH_ORDINAL).astype("datetime64[D]"), moods,
+            np.array(sleep, dtype=np.float32), np.array(heart, dtype=np.float32),  # None becomes NaN
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, "datetime64[D]"), np.empty(0, np.int8), np.empty(0, np.float32), np.empty(0, np.float32))
+
+    @classmethod
+    def concat(cls, chunks):
+        if not chunks:
+            return cls.empty()
+        if len(chunks) == 1:
+            return chunks[0]
+        return cls(*(np.concatenate([getattr(chunk, field) for chunk in chunks]) for field in cls.__dataclass_fields__))
+
+    def between(self, start=None, end=None):
+        """Records from `start` to `end` inclusive, as views of these arrays."""
+        lo = 0 if start is None else np.searchsorted(self.days, np.datetime64(start, "D"), side="left")
+        hi = len(self) if end is None else np.searchsorted(self.days, np.datetime64(end, "D"), side="right")
+        return MoodHistory(self.days[lo:hi], self.moods[lo:hi], self.sleep_hours[lo:hi], self.heart_rate_avg[lo:hi])
+
+
+async def read_history(db: AsyncSession, user_id: int) -> MoodHistory:
+    """The user's whole history, streamed through a server-side cursor chunk by chunk."""
+    stmt = (
+        select(MoodRecord.date, MoodRecord.mood, MoodRecord.sleep_hours, MoodRecord.heart_rate_avg)
+        .where(MoodRecord.user_id == user_id)
+        .order_by(MoodRecord.date)
+        .execution_options(yield_per=MOOD_CHUNK_ROWS)
+    )
+    result = await db.stream(stmt)
+    return MoodHistory.concat([MoodHistory.from_rows(rows) async for rows in result.partitions()])
+
+
+class MoodSnapshots:
+    """LRU of MoodHistory per user. Ingestion in this process invalidates; other processes rely on the TTL."""
+
+    def __init__(self, maxsize: int = MOOD_SNAPSHOT_CACHE_SIZE, ttl: int = MOOD_SNAPSHOT_TTL):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._invalidations = 0
+        self._hit = CACHE_REQUESTS.labels("mood_history", "hit")
+        self._miss = CACHE_REQUESTS.labels("mood_history", "miss")
+
+    async def get(self, db: AsyncSession, user_id: int) -> MoodHistory:
+        history = self.cache.get(user_id)
+        if history is not None:
+            self._hit.inc()
+            return history
+        self._miss.inc()
+        invalidations = self._invalidations
+        history = await read_history(db, user_id)
+        # Rows ingested while the history was being read may be missing from it, don't keep it
+        if invalidations == self._invalidations:
+            self.cache.set(user_id, history)
+        return history
+
+    def invalidate(self, user_id: int):
+        self._invalidations += 1
+        self.cache.delete(user_id)
+
+
+mood_snapshots = MoodSnapshots()
+
+
+def period_starts(days: np.ndarray, granularity: str) -> np.ndarray:
+    """First day of each day's period, weeks start on Monday like activity_service.rollups.period_start."""
+    if granularity == "week":
+        # 1970-01-01, day 0, was a Thursday
+        return days - (days.astype(np.int64) + 3) % 7
+    if granularity == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+
+def distribution(history: MoodHistory, granularity: str = "day") -> list:
+    """Days per mood label in each period that has any labelled day."""
+    labelled = history.moods >= 0
+    if not labelled.any():
+        return []
+    starts, period = np.unique(period_starts(history.days[labelled], granularity), return_inverse=True)
+    counts = np.bincount(
+        period * len(MOOD_LABELS) + history.moods[labelled], minlength=len(starts) * len(MOOD_LABELS)
+    ).reshape(len(starts), len(MOOD_LABELS))
+    return [
+        {"period_start": start, "total": sum(row), "counts": dict(zip(MOOD_LABELS, row))}
+        for start, row in zip(starts.tolist(), counts.tolist())
+    ]
+
+
+def _pearson(x: np.ndarray, y: np.ndarray):
+    if len(x) < 2:
+        return None
+    x, y = x - x.mean(), y - y.mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    return float((x * y).sum() / denominator) if denominator else None
+
+
+def correlations(history: MoodHistory) -> dict:
+    """Correlation of each of FACTORS with the mood score, and the factor's mean per mood label."""
+    labelled = history.moods >= 0
+    result = {"days": int(labelled.sum())}
+    for factor in FACTORS:
+        values = getattr(history, factor)
+        present = labelled & ~np.isnan(values)
+        x = values[present].astype(np.float64)
+        codes = history.moods[present]
+        totals = np.bincount(codes, weights=x, minlength=len(MOOD_LABELS))
+        counts = np.bincount(codes, minlength=len(MOOD_LABELS))
+        result[factor] = {
+            "correlation": _pearson(x, MOOD_SCORES[codes]),
+            "samples": int(present.sum()),
+            "mean_by_mood": {
+                label: (total / count if count else None)
+                for label, total, count in zip(MOOD_LABELS, totals.tolist(), counts.tolist())
+            },
+        }
+    return result
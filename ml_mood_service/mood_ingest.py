@@ -0,0 +1,47 @@
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ml_mood_service.events import mood_logged
+from ml_mood_service.mood_model import MOOD_COLUMNS, MoodRecord
+from ml_mood_service.mood_schema import MoodBatchResult
+
+INPUT_COLUMNS = ["heart_rate_avg", "sleep_hours", "mood", "weather_conditions", "location"]
+# 7 bind parameters per row, well below asyncpg's 32767 limit
+INSERT_CHUNK_ROWS = 1000
+
+
+def upsert_statement():
+    """INSERT ... ON CONFLICT (user_id, date) DO UPDATE, returning the MoodResponse columns."""
+    stmt = pg_insert(MoodRecord)
+    return stmt.on_conflict_do_update(
+        constraint="mood_data_daily_key",
+        set_={column: stmt.excluded[column] for column in INPUT_COLUMNS},
+    ).returning(*MOOD_COLUMNS, literal_column("xmax = 0").label("inserted"))
+
+
+async def upsert_moods(db: AsyncSession, user_id: int, valid: list) -> list:
+    """Upsert validated rows for one user on (user_id, date) and record `mood.logged`, without committing."""
+    # A day repeated inside one batch keeps its last occurrence
+    latest = {}
+    for index, mood in valid:
+        latest[mood.date] = (index, mood)
+    records = [{"user_id": user_id, **mood.model_dump()} for _, mood in latest.values()]
+
+    stmt, returned = upsert_statement(), []
+    for start in range(0, len(records), INSERT_CHUNK_ROWS):
+        result = await db.execute(stmt.values(records[start:start + INSERT_CHUNK_ROWS]))
+        returned.extend(result.all())
+    if returned:
+        await mood_logged(db, user_id, returned)
+
+    results, ids = [], {}
+    for row in returned:
+        ids[row.date] = row.id
+        results.append(MoodBatchResult(
+            index=latest[row.date][0], status="inserted" if row.inserted else "updated", id=row.id
+        ))
+    for index, mood in valid:
+        if latest[mood.date][0] != index:
+            results.append(MoodBatchResult(index=index, status="superseded", id=ids.get(mood.date)))
+    return results
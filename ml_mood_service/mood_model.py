@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Float, String, Date, UniqueConstraint
+from database.db_connection import Base
+
+class MoodRecord(Base):
+    __tablename__ = "mood_data"
+    __table_args__ = (
+        # One record per user and day, repeated ingestion of a day updates it
+        UniqueConstraint("user_id", "date", name="mood_data_daily_key"),
+        {"schema": "mood_service"},
+    )
+
+    # Partitioned by month on `date` like activity_data, the primary key is (id, date)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    heart_rate_avg = Column(Integer, nullable=True)
+    sleep_hours = Column(Float, nullable=True)
+    mood = Column(String(50), nullable=True)
+    weather_conditions = Column(String(50), nullable=True)
+    location = Column(String(100), nullable=True)
+
+# Columns behind MoodResponse, returned as Core rows by the ingestion endpoints
+MOOD_COLUMNS = (
+    MoodRecord.id, MoodRecord.user_id, MoodRecord.date, MoodRecord.heart_rate_avg, MoodRecord.sleep_hours,
+    MoodRecord.mood, MoodRecord.weather_conditions, MoodRecord.location,
+)
@@ -0,0 +1,98 @@
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from common.auth import resolve_user_id, resolve_writer_id  # Same bearer tokens as activity_service
+from common.batch_request import BatchTooLarge, handle_database_error, read_rows, validate_rows
+from database.db_connection import get_db, get_read_db
+from logging_config import get_logger
+from ml_mood_service.events import mood_logged
+from ml_mood_service.mood_history import correlations, distribution, mood_snapshots
+from ml_mood_service.mood_ingest import upsert_moods, upsert_statement
+from ml_mood_service.mood_schema import MoodBatchResponse, MoodCorrelation, MoodCreate, MoodPeriod, MoodResponse
+
+logger = get_logger("ml_mood_service")
+
+router = APIRouter(prefix="/mood", tags=["Mood"])
+
+def date_range(start: Optional[date] = None, end: Optional[date] = None):
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="`start` must not be after `end`")
+    return start, end
+
+# Log one day's mood, a second record for the same day replaces the first
+@router.post("/", response_model=MoodResponse)
+@handle_database_error
+async def log_mood(
+    mood_data: MoodCreate,
+    user_id1: int = Depends(resolve_writer_id),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(upsert_statement().values(user_id=user_id1, **mood_data.model_dump()))
+    row = result.one()
+    await mood_logged(db, user_id1, [row])  # Committed together with the mood, feeds the feature store
+    await db.commit()
+    mood_snapshots.invalidate(user_id1)
+    logger.debug("Mood %s logged for user %s", row.id, user_id1)
+    return row._asdict()
+
+# Bulk ingestion of mood history, JSON array or NDJSON, upserted per (user_id, date)
+@router.post(
+    "/batch",
+    response_model=MoodBatchResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": MoodCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}},
+)
+@handle_database_error
+async def log_mood_batch(
+    request: Request,
+    user_id1: int = Depends(resolve_writer_id),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        raw_rows = await read_rows(request)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed batch: {e}")
+
+    valid, invalid = validate_rows(MoodCreate, raw_rows)
+    logger.info("User %s ingesting %d mood records (%d invalid)", user_id1, len(raw_rows), len(invalid))
+
+    results = await upsert_moods(db, user_id1, valid)
+    await db.commit()
+    mood_snapshots.invalidate(user_id1)
+
+    results = sorted(results + invalid, key=lambda result: result.index)
+    return MoodBatchResponse(
+        inserted=sum(result.status == "inserted" for result in results),
+        updated=sum(result.status == "updated" for result in results),
+        invalid=len(invalid),
+        results=results,
+    )
+
+# Days per mood in each day/week/month of the range, from the user's cached history snapshot
+@router.get("/distribution", response_model=List[MoodPeriod])
+@handle_database_error
+async def get_mood_distribution(
+    granularity: Literal["day", "week", "month"] = "month",
+    dates: tuple = Depends(date_range),
+    user_id1: int = Depends(resolve_user_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    history = await mood_snapshots.get(db, user_id1)
+    return distribution(history.between(*dates), granularity)
+
+# Correlation of sleep and heart rate with mood over the range
+@router.get("/correlation", response_model=MoodCorrelation)
+@handle_database_error
+async def get_mood_correlation(
+    dates: tuple = Depends(date_range),
+    user_id1: int = Depends(resolve_user_id),
+    db: AsyncSession = Depends(get_read_db)
+):
+    history = await mood_snapshots.get(db, user_id1)
+    start, end = dates
+    return {"start": start, "end": end, **correlations(history.between(start, end))}
@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, conint, confloat, constr
+from common.batch_request import BatchResult
+
+# Labels the mood model predicts, see ml_mood_service.features.MOOD_LABELS
+MoodLabel = Literal["Happy", "Neutral", "Stressed"]
+
+# One day of mood history, same columns as mood_service.mood_data
+class MoodCreate(BaseModel):
+    date: date
+    heart_rate_avg: Optional[conint(gt=0, le=250)] = None # type: ignore
+    sleep_hours: Optional[confloat(ge=0, le=24)] = None # type: ignore
+    mood: Optional[MoodLabel] = None
+    weather_conditions: Optional[constr(max_length=50)] = None # type: ignore
+    location: Optional[constr(max_length=100)] = None # type: ignore
+
+class MoodResponse(BaseModel):
+    id: int
+    user_id: int
+    date: date
+    heart_rate_avg: Optional[int]
+    sleep_hours: Optional[float]
+    mood: Optional[str]
+    weather_conditions: Optional[str]
+    location: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+# Per-row outcome of POST /mood/batch, same shape as /activity/batch
+MoodBatchResult = BatchResult
+
+class MoodBatchResponse(BaseModel):
+    inserted: int
+    updated: int
+    invalid: int
+    results: List[MoodBatchResult]
+
+# Days per mood label in one day/week/month (GET /mood/distribution)
+class MoodPeriod(BaseModel):
+    period_start: date
+    total: int
+    counts: Dict[str, int]
+
+# How one input moves with mood: Pearson correlation with the mood score (Stressed 0, Neutral 1, Happy 2)
+class MoodFactor(BaseModel):
+    correlation: Optional[float]
+    samples: int
+    mean_by_mood: Dict[str, Optional[float]]
+
+class MoodCorrelation(BaseModel):
+    start: Optional[date]
+    end: Optional[date]
+    days: int
+    sleep_hours: MoodFactor
+    heart_rate_avg: MoodFactor
@@ -0,0 +1,212 @@
+"""Train the mood model and write a versioned artifact.
+
+    python -m ml_mood_service.train_model --source csv                 # data/student_health_data.csv
+    python -m ml_mood_service.train_model --source db --since 2024-01-01
+
+Rows are read in chunks (from mood_service.mood_data joined with the daily
+activity rollups, or from the CSV), per-user rolling features are computed
+with vectorized pandas operations, and a randomized hyperparameter search
+runs on all cores. The artifact is written to `--output-dir` as
+`mood-<version>.pkl` with a `.json` sidecar (metrics, training time, peak
+memory) and copied to ml_mood_service/model.pkl unless --no-promote.
+"""
+import argparse
+import hashlib
+import json
+import os
+import resource
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import loguniform, randint
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.model_selection import RandomizedSearchCV, StratifiedKFold
+
+from ml_mood_service.features import CATEGORICAL_INPUTS, NUMERIC_INPUTS, ROLLING_FEATURES, rolling_features
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()  # Settings below come from .env too when run as a script, see common/env.py
+
+DATABASE_URL = os.getenv("DATABASE_URL_SYNC")
+SERVICE_DIR = Path(__file__).resolve().parent
+HEALTH_CSV = "data/student_health_data.csv"
+
+# Daily mood rows with that day's activity totals, ordered so each user's rows are contiguous
+DB_QUERY = """
+    SELECT m.user_id, m.date, m.heart_rate_avg, m.sleep_hours, m.mood, m.weather_conditions, m.location,
+           r.total_steps AS steps, r.total_active_minutes AS active_minutes
+    FROM mood_service.mood_data m
+    LEFT JOIN activity_service.activity_rollup r
+           ON r.user_id = m.user_id AND r.granularity = 'day' AND r.period_start = m.date
+    WHERE m.date >= %(since)s AND m.mood IS NOT NULL
+    ORDER BY m.user_id, m.date
+"""
+
+SEARCH_SPACE = {
+    "learning_rate": loguniform(0.01, 0.3),
+    "max_leaf_nodes": randint(8, 64),
+    "min_samples_leaf": randint(10, 100),
+    "l2_regularization": loguniform(1e-4, 1.0),
+    "max_iter": randint(100, 400),
+}
+
+
+def csv_chunks(path, chunk_rows):
+    from database.seed_db import mood_from_stress
+
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield pd.DataFrame({
+            "user_id": chunk["Student ID"],
+            "date": pd.to_datetime(chunk["Date and Time"]).dt.date,
+            "heart_rate_avg": chunk["Heart Rate (bpm)"].astype(np.float32),
+            "sleep_hours": chunk["Sleep Duration (hours)"].astype(np.float32),
+            "mood": mood_from_stress(chunk["Stress Level (1-10)"]),
+            "weather_conditions": None,
+            "location": None,
+            "steps": np.float32("nan"),
+            "active_minutes": np.float32("nan"),
+        })
+
+
+def db_chunks(since, chunk_rows):
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DATABASE_URL)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        yield from pd.read_sql_query(DB_QUERY, conn, params={"since": since}, chunksize=chunk_rows)
+
+
+def whole_users(chunks):
+    """Re-chunks a user-ordered stream so no user's history is split across two chunks."""
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        last_user = chunk["user_id"].iloc[-1]
+        tail = chunk["user_id"].to_numpy() == last_user
+        carry = chunk[tail]
+        if (~tail).any():
+            yield chunk[~tail]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def build_dataset(chunks):
+    """Feature-engineers every chunk and keeps only model inputs, as compact float32 columns."""
+    parts = []
+    for chunk in whole_users(chunks):
+        chunk = rolling_features(chunk)
+        numeric = chunk[NUMERIC_INPUTS + ROLLING_FEATURES].astype(np.float32)
+        parts.append(pd.concat([numeric, chunk[CATEGORICAL_INPUTS + ["mood"]]], axis=1))
+    frame = pd.concat(parts, ignore_index=True)
+    return frame[frame["mood"].notna()]
+
+
+def encode(frame):
+    """One-hot encodes categoricals as `column=value`, the convention ml_mood_service.features expects."""
+    columns = {name: frame[name].to_numpy(np.float32) for name in NUMERIC_INPUTS + ROLLING_FEATURES}
+    # Inputs the source has no values for at all (e.g. steps in the CSV) carry no signal
+    columns = {name: values for name, values in columns.items() if not np.isnan(values).all()}
+    for column in CATEGORICAL_INPUTS:
+        for category in sorted(frame[column].dropna().unique()):
+            columns[f"{column}={category}"] = (frame[column] == category).to_numpy(np.float32)
+    features = list(columns)
+    return np.column_stack([columns[name] for name in features]), features
+
+
+def train(frame, n_iter, folds, seed):
+    matrix, features = encode(frame)
+    labels = frame["mood"].astype(str).to_numpy()
+    search = RandomizedSearchCV(
+        HistGradientBoostingClassifier(random_state=seed),  # handles missing (NaN) features natively
+        SEARCH_SPACE,
+        n_iter=n_iter,
+        cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed),
+        scoring="f1_macro",
+        n_jobs=-1,
+        random_state=seed,
+    )
+    search.fit(matrix, labels)
+    # Training medians fill inputs the caller does not send (e.g. rolling windows without history)
+    defaults = {name: float(np.nanmedian(matrix[:, j])) for j, name in enumerate(features) if "=" not in name}
+    return search, features, defaults, matrix
+
+
+def peak_memory_mb():
+    # ru_maxrss is in KiB on Linux, includes the search's worker processes via RUSAGE_CHILDREN
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the mood model")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv")
+    parser.add_argument("--csv", default=HEALTH_CSV)
+    parser.add_argument("--since", default="1970-01-01", help="first day of mood data to train on (db source)")
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--n-iter", type=int, default=20, help="hyperparameter candidates to evaluate")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=str(SERVICE_DIR / "models"))
+    parser.add_argument("--no-promote", action="store_true", help="do not replace ml_mood_service/model.pkl")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    chunks = csv_chunks(args.csv, args.chunk_rows) if args.source == "csv" else db_chunks(args.since, args.chunk_rows)
+    frame = build_dataset(chunks)
+    load_seconds = time.perf_counter() - started
+    print(f"Loaded {len(frame):,} rows with features in {load_seconds:.1f}s")
+
+    search, features, defaults, matrix = train(frame, args.n_iter, args.folds, args.seed)
+    train_seconds = time.perf_counter() - started - load_seconds
+
+    data_hash = hashlib.sha256(matrix.tobytes()).hexdigest()[:8]
+    version = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{data_hash}"
+    artifact = {
+        "model": search.best_estimator_,
+        "features": features,
+        "defaults": defaults,
+        "classes": [str(label) for label in search.best_estimator_.classes_],
+        "version": version,
+    }
+    metadata = {
+        "version": version,
+        "source": args.source,
+        "rows": len(frame),
+        "features": features,
+        "best_params": {key: value.item() if isinstance(value, np.generic) else value
+                        for key, value in search.best_params_.items()},
+        "cv_f1_macro": round(float(search.best_score_), 4),
+        "load_seconds": round(load_seconds, 2),
+        "train_seconds": round(train_seconds, 2),
+        "peak_memory_mb": peak_memory_mb(),
+        "seed": args.seed,
+    }
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model_path = output_dir / f"mood-{version}.pkl"
+    # Stored uncompressed so inference workers can memory-map it
+    joblib.dump(artifact, model_path)
+    metadata["artifact_bytes"] = model_path.stat().st_size
+    model_path.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+    print(json.dumps(metadata, indent=2))
+
+    if not args.no_promote:
+        promoted = SERVICE_DIR / "model.pkl"
+        tmp = promoted.with_suffix(".pkl.tmp")
+        shutil.copyfile(model_path, tmp)
+        os.replace(tmp, promoted)  # atomic, a starting inference server never sees a partial file
+        print(f"Promoted {model_path.name} to {promoted}")
+
+
+if __name__ == "__main__":
+    main()
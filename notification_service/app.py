@@ -0,0 +1,72 @@
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+from contextlib import asynccontextmanager
+from typing import Dict, List, Literal
+
+from fastapi import APIRouter, FastAPI
+from pydantic import BaseModel, conlist
+
+from common.metrics import instrument_app
+from database.db_connection import dispose_engines, get_sessionmaker
+from notification_service.goals import goal_consumer
+from notification_service.queue import ENQUEUE, STATS
+from notification_service.senders import logger
+from logging_config import configure_logging
+
+NOTIFY_ENQUEUE_LIMIT = 10000
+
+#Pydantic schemas, internal API for the other services
+class NotificationCreate(BaseModel):
+    user_id: int
+    channel: Literal["email", "sms", "push"] = "email"
+    notification_text: str
+
+class NotificationBatch(BaseModel):
+    items: conlist(NotificationCreate, min_length=1, max_length=NOTIFY_ENQUEUE_LIMIT) # type: ignore
+
+class EnqueueResponse(BaseModel):
+    ids: List[int]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Step goal notifications from activity_service's outbox events
+    goal_consumer.start()
+    yield
+    await goal_consumer.stop()
+    await dispose_engines()
+
+router = APIRouter()
+
+# Queue notifications for delivery, one INSERT for the whole batch
+@router.post("/notifications", response_model=EnqueueResponse, tags=["Notifications"])
+async def enqueue(batch: NotificationBatch):
+    async with get_sessionmaker("write")() as db:
+        result = await db.execute(ENQUEUE, {
+            "user_ids": [item.user_id for item in batch.items],
+            "channels": [item.channel for item in batch.items],
+            "texts": [item.notification_text for item in batch.items],
+        })
+        ids = result.scalars().all()
+        await db.commit()
+    logger.info("Queued %d notifications", len(ids))
+    return EnqueueResponse(ids=ids)
+
+# Queue depth and outcomes by status and channel
+@router.get("/notifications/stats", response_model=Dict[str, Dict[str, int]], tags=["Notifications"])
+async def stats():
+    async with get_sessionmaker("read")() as db:
+        rows = (await db.execute(STATS)).all()
+    counts = {}
+    for status, channel, count in rows:
+        counts.setdefault(status, {})[channel] = count
+    return counts
+
+def create_app() -> FastAPI:
+    """The Notification Service app, delivery itself runs in notification_service/worker.py."""
+    configure_logging("notification")
+    app = FastAPI(title="Notification Service", lifespan=lifespan)
+    app.include_router(router)
+    instrument_app(app, "notification")
+    return app
+
+# `uvicorn notification_service.app:app`, or `--factory notification_service.app:create_app`
+app = create_app()
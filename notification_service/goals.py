@@ -0,0 +1,47 @@
+import os
+
+from sqlalchemy import text
+
+from common.events import ACTIVITY_LOGGED
+from common.outbox import Consumer
+from database.db_connection import get_sessionmaker
+
+# Steps per day that earn a congratulation, once per user and day
+DAILY_STEP_GOAL = int(os.getenv("DAILY_STEP_GOAL", "10000"))
+
+# dedupe_key makes replays after a crash harmless
+ENQUEUE_GOALS = text("""
+    INSERT INTO notification_service.notifications (user_id, channel, notification_text, dedupe_key)
+    SELECT * FROM unnest(CAST(:user_ids AS int[]), CAST(:channels AS varchar[]), CAST(:texts AS text[]),
+                         CAST(:keys AS varchar[]))
+    ON CONFLICT (dedupe_key) DO NOTHING
+""")
+
+
+def goals_reached(events):
+    """(user_id, date) of every day an `activity.logged` event reports at or above DAILY_STEP_GOAL."""
+    reached = {}
+    for event in events:
+        if event.topic != ACTIVITY_LOGGED:
+            continue
+        for day in event.payload["days"]:
+            if day["steps"] >= DAILY_STEP_GOAL:
+                reached[(event.user_id, day["date"])] = day["steps"]
+    return reached
+
+
+async def enqueue_goal_notifications(events):
+    reached = goals_reached(events)
+    if not reached:
+        return
+    async with get_sessionmaker("write")() as db:
+        await db.execute(ENQUEUE_GOALS, {
+            "user_ids": [user_id for user_id, _ in reached],
+            "channels": ["push"] * len(reached),
+            "texts": [f"You reached {DAILY_STEP_GOAL:,} steps on {day}, great job!" for _, day in reached],
+            "keys": [f"step-goal:{user_id}:{day}" for user_id, day in reached],
+        })
+        await db.commit()
+
+
+goal_consumer = Consumer("step_goal_notifications", enqueue_goal_notifications)
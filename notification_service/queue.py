@@ -0,0 +1,119 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from database.db_connection import get_sessionmaker
+from notification_service.senders import Notification
+
+
+@dataclass
+class DeliveryResult:
+    id: int
+    attempts: int  # fences the update, a row re-claimed after its lease expired is left alone
+    status: str  # sent | pending (retry) | failed
+    retry_in: float = 0.0
+    error: str | None = None
+
+
+# Claims due rows and rows whose lease expired; SKIP LOCKED lets any number of workers claim side by side
+CLAIM = text("""
+    WITH due AS (
+        SELECT id FROM notification_service.notifications
+        WHERE (status = 'pending' AND available_at <= LOCALTIMESTAMP)
+           OR (status = 'sending' AND locked_until < LOCALTIMESTAMP)
+        ORDER BY available_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE notification_service.notifications n
+    SET status = 'sending', attempts = n.attempts + 1,
+        locked_until = LOCALTIMESTAMP + make_interval(secs => CAST(:lease AS float8))
+    FROM due
+    WHERE n.id = due.id
+    RETURNING n.id, n.user_id, n.channel, n.notification_text, n.attempts
+""")
+
+# One statement for a whole batch of outcomes
+COMPLETE = text("""
+    UPDATE notification_service.notifications n
+    SET status = r.status,
+        sent_at = CASE WHEN r.status = 'sent' THEN LOCALTIMESTAMP ELSE n.sent_at END,
+        available_at = CASE WHEN r.status = 'pending'
+                            THEN LOCALTIMESTAMP + make_interval(secs => r.retry_in) ELSE n.available_at END,
+        locked_until = NULL,
+        last_error = r.error
+    FROM unnest(CAST(:ids AS int[]), CAST(:attempts AS int[]), CAST(:statuses AS varchar[]),
+                CAST(:retry_in AS float8[]), CAST(:errors AS text[])) AS r(id, attempts, status, retry_in, error)
+    WHERE n.id = r.id AND n.attempts = r.attempts AND n.status = 'sending'
+""")
+
+ENQUEUE = text("""
+    INSERT INTO notification_service.notifications (user_id, channel, notification_text)
+    SELECT * FROM unnest(CAST(:user_ids AS int[]), CAST(:channels AS varchar[]), CAST(:texts AS text[]))
+    RETURNING id
+""")
+
+STATS = text("""
+    SELECT status, channel, COUNT(*) FROM notification_service.notifications GROUP BY status, channel
+""")
+
+
+class PostgresQueue:
+    """notification_service.notifications as a job queue, see migration 0003."""
+
+    async def claim(self, batch_size: int, lease: float):
+        async with get_sessionmaker("write")() as db:
+            rows = (await db.execute(CLAIM, {"batch_size": batch_size, "lease": lease})).all()
+            await db.commit()
+        return [Notification(id, user_id, channel, text or "", attempts) for id, user_id, channel, text, attempts in rows]
+
+    async def complete(self, results):
+        if not results:
+            return
+        async with get_sessionmaker("write")() as db:
+            await db.execute(COMPLETE, {
+                "ids": [result.id for result in results],
+                "attempts": [result.attempts for result in results],
+                "statuses": [result.status for result in results],
+                "retry_in": [result.retry_in for result in results],
+                "errors": [result.error for result in results],
+            })
+            await db.commit()
+
+
+class MemoryQueue:
+    """In-process queue with the same claim/complete semantics, for benchmarking the worker offline."""
+
+    def __init__(self, notifications):
+        self.rows = {notification.id: notification for notification in notifications}
+        self.pending = list(self.rows)  # ids in claim order
+        self.available_at = {}
+        self.status = {}
+
+    async def claim(self, batch_size: int, lease: float):
+        await asyncio.sleep(0)
+        now = time.monotonic()
+        claimed, waiting = [], []
+        for id in self.pending:
+            if len(claimed) < batch_size and self.available_at.get(id, 0) <= now:
+                claimed.append(id)
+            else:
+                waiting.append(id)
+        self.pending = waiting
+        for id in claimed:
+            self.rows[id].attempts += 1
+        return [self.rows[id] for id in claimed]
+
+    async def complete(self, results):
+        await asyncio.sleep(0)
+        for result in results:
+            self.status[result.id] = result.status
+            if result.status == "pending":
+                self.available_at[result.id] = time.monotonic() + result.retry_in
+                self.pending.append(result.id)
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
@@ -0,0 +1,109 @@
+import asyncio
+import importlib
+import os
+import random
+from dataclasses import dataclass
+
+import httpx
+
+from common.http_client import ServiceClient
+from logging_config import get_logger
+
+logger = get_logger("notification_service")
+
+# Delivery gateway for the `webhook` sender, receives one JSON POST per notification
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL", "http://127.0.0.1:8010/notifications")
+
+
+@dataclass
+class Notification:
+    id: int
+    user_id: int
+    channel: str
+    text: str
+    attempts: int  # including the current one
+
+
+class DeliveryError(Exception):
+    """Delivery failed and may succeed later, the notification is retried with backoff."""
+
+
+class PermanentDeliveryError(DeliveryError):
+    """Delivery can never succeed (e.g. unknown recipient), the notification fails immediately."""
+
+
+class Sender:
+    """Delivers one notification, raising DeliveryError on failure."""
+
+    async def send(self, notification: Notification):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class LogSender(Sender):
+    """Writes notifications to the log, for local development."""
+
+    async def send(self, notification: Notification):
+        logger.info("Notification %s to user %s via %s: %s", notification.id, notification.user_id,
+                    notification.channel, notification.text)
+
+
+class FakeSender(Sender):
+    """Simulates a provider with a fixed latency and a share of transient failures, for benchmarks."""
+
+    def __init__(self, latency: float = 0.02, failure_rate: float = 0.0, seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.sent = 0
+
+    async def send(self, notification: Notification):
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.failure_rate:
+            raise DeliveryError("simulated provider error")
+        self.sent += 1
+
+
+class WebhookSender(Sender):
+    """POSTs notifications to a delivery gateway through a pooled, circuit-broken ServiceClient.
+
+    The Idempotency-Key lets the client retry the POST on transport errors and
+    502/503/504. While the gateway's circuit is open, sends fail at once and
+    go back to the queue with backoff.
+    """
+
+    def __init__(self, url: str = NOTIFY_WEBHOOK_URL, client: ServiceClient | None = None):
+        self.url = url
+        self.client = client if client is not None else ServiceClient("notification_webhook")
+
+    async def send(self, notification: Notification):
+        try:
+            response = await self.client.post(
+                self.url,
+                json={"id": notification.id, "user_id": notification.user_id,
+                      "channel": notification.channel, "text": notification.text},
+                headers={"Idempotency-Key": f"notification-{notification.id}"},
+                idempotent=True,
+            )
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"gateway unavailable: {e}")
+        if response.status_code >= 500 or response.status_code == 429:
+            raise DeliveryError(f"gateway answered {response.status_code}")
+        if response.status_code >= 400:
+            raise PermanentDeliveryError(f"gateway rejected notification: {response.status_code}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+SENDERS = {"log": LogSender, "fake": FakeSender, "webhook": WebhookSender}
+
+
+def load_sender(spec: str) -> Sender:
+    """`log`, `fake`, `webhook`, or `package.module:ClassName` for a custom Sender subclass."""
+    if spec in SENDERS:
+        return SENDERS[spec]()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,134 @@
+"""Delivers pending notifications.
+
+    python -m notification_service.worker --sender log
+
+Each worker claims batches of due notifications (SELECT ... FOR UPDATE SKIP
+LOCKED, see notification_service/queue.py), delivers them concurrently
+under per-channel rate limits, and writes every outcome of a batch back in
+one statement. Run as many worker processes as needed; a notification is
+only ever claimed by one of them at a time.
+"""
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+import argparse
+import asyncio
+import os
+import random
+import signal
+import time
+
+from common.rate_limit import TokenBucket, parse_rates
+from database.db_connection import dispose_engines
+from logging_config import configure_logging
+from notification_service.queue import DeliveryResult, PostgresQueue
+from notification_service.senders import DeliveryError, PermanentDeliveryError, load_sender, logger
+
+NOTIFICATION_SENDER = os.getenv("NOTIFICATION_SENDER", "log")
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+# Deliveries in flight per worker process, across all lanes
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "200"))
+# Claim/deliver/complete loops per process, so database round-trips overlap deliveries
+NOTIFY_LANES = int(os.getenv("NOTIFY_LANES", "2"))
+# Sends per second per channel, per worker process (0 = unlimited)
+NOTIFY_RATE_LIMITS = os.getenv("NOTIFY_RATE_LIMITS", "email=100,sms=10,push=500")
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_SEND_TIMEOUT = float(os.getenv("NOTIFY_SEND_TIMEOUT", "10"))
+NOTIFY_BACKOFF_BASE = float(os.getenv("NOTIFY_BACKOFF_BASE", "5"))
+NOTIFY_BACKOFF_MAX = float(os.getenv("NOTIFY_BACKOFF_MAX", "900"))
+# Claimed rows return to the queue after this long, must cover a whole batch including rate limit waits
+NOTIFY_LEASE_SECONDS = float(os.getenv("NOTIFY_LEASE_SECONDS", "120"))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "1"))
+
+
+def backoff(attempts: int) -> float:
+    """Exponential backoff with jitter, so retries of one outage do not come back in lockstep."""
+    delay = min(NOTIFY_BACKOFF_MAX, NOTIFY_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class NotificationWorker:
+    def __init__(self, queue, sender, rates=None, batch_size=NOTIFY_BATCH_SIZE, concurrency=NOTIFY_CONCURRENCY,
+                 lanes=NOTIFY_LANES, max_attempts=NOTIFY_MAX_ATTEMPTS):
+        self.queue = queue
+        self.sender = sender
+        rates = parse_rates(NOTIFY_RATE_LIMITS) if rates is None else rates
+        self.buckets = {channel: TokenBucket(rate) for channel, rate in rates.items()}
+        self.batch_size = batch_size
+        self.lanes = lanes
+        self.max_attempts = max_attempts
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stopping = asyncio.Event()
+        self.counts = {"sent": 0, "pending": 0, "failed": 0}
+
+    def stop(self):
+        self.stopping.set()
+
+    async def run(self, until_empty: bool = False):
+        """Runs until stop() (or, with until_empty, until a claim comes back empty)."""
+        await asyncio.gather(*(self._lane(until_empty) for _ in range(self.lanes)))
+
+    async def _lane(self, until_empty):
+        while not self.stopping.is_set():
+            batch = await self.queue.claim(self.batch_size, NOTIFY_LEASE_SECONDS)
+            if not batch:
+                if until_empty:
+                    return
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), NOTIFY_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            results = await asyncio.gather(*(self.deliver(notification) for notification in batch))
+            await self.queue.complete(results)
+            for result in results:
+                self.counts[result.status] += 1
+
+    async def deliver(self, notification) -> DeliveryResult:
+        async with self.semaphore:
+            bucket = self.buckets.get(notification.channel)
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                await asyncio.wait_for(self.sender.send(notification), NOTIFY_SEND_TIMEOUT)
+                return DeliveryResult(notification.id, notification.attempts, "sent")
+            except PermanentDeliveryError as e:
+                error = str(e)
+                permanent = True
+            except asyncio.TimeoutError:
+                error, permanent = f"timed out after {NOTIFY_SEND_TIMEOUT}s", False
+            except Exception as e:  # DeliveryError, or a sender bug that must not stop the worker
+                error, permanent = str(e) or type(e).__name__, False
+                if not isinstance(e, DeliveryError):
+                    logger.error("Sender raised %r for notification %s", e, notification.id)
+
+        if permanent or notification.attempts >= self.max_attempts:
+            return DeliveryResult(notification.id, notification.attempts, "failed", error=error)
+        return DeliveryResult(notification.id, notification.attempts, "pending", backoff(notification.attempts), error)
+
+
+async def run_worker(sender_spec: str):
+    worker = NotificationWorker(PostgresQueue(), load_sender(sender_spec))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)  # finish the batches in flight, then exit
+
+    started = time.perf_counter()
+    logger.info("Notification worker started (batch %d, %d lanes)", worker.batch_size, worker.lanes)
+    try:
+        await worker.run()
+    finally:
+        await worker.sender.aclose()
+        await dispose_engines()
+    logger.info("Notification worker stopped after %.0fs: %s", time.perf_counter() - started, worker.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver pending notifications")
+    parser.add_argument("--sender", default=NOTIFICATION_SENDER,
+                        help="log, fake, webhook, or package.module:SenderClass")
+    args = parser.parse_args()
+    configure_logging("notification_worker")
+    asyncio.run(run_worker(args.sender))
+
+
+if __name__ == "__main__":
+    main()
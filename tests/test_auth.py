@@ -0,0 +1,60 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from common.auth import resolve_writer_id, validate_token
+from database.db_connection import get_db, get_read_db
+
+
+class FakeResult:
+    def scalar_one_or_none(self):
+        return 17
+
+
+class FakeSession:
+    async def execute(self, statement):
+        return FakeResult()
+
+
+def test_write_routes_resolve_the_user_on_their_own_session():
+    sessions = []
+
+    async def write_session():
+        sessions.append(("write", db := FakeSession()))
+        yield db
+
+    async def read_session():
+        sessions.append(("read", db := FakeSession()))
+        yield db
+
+    app = FastAPI()
+
+    @app.post("/write")
+    async def write(user_id: int = Depends(resolve_writer_id), db=Depends(get_db)):
+        return {"user_id": user_id, "session": id(db)}
+
+    app.dependency_overrides[validate_token] = lambda: {"user_id": "writer@example.com", "role": "user"}
+    app.dependency_overrides[get_db] = write_session
+    app.dependency_overrides[get_read_db] = read_session
+
+    body = TestClient(app).post("/write").json()
+
+    assert body["user_id"] == 17
+    assert [(role, id(db)) for role, db in sessions] == [("write", body["session"])]
+
+
+def test_profiler_requires_an_admin_token_and_caps_seconds(monkeypatch):
+    from common import metrics, profiler
+
+    monkeypatch.setattr(metrics, "METRICS_PROFILER", True)
+    app = FastAPI()
+    metrics.instrument_app(app, "test")
+    client = TestClient(app)
+
+    assert client.get("/debug/profile").status_code in (401, 403)
+
+    app.dependency_overrides[validate_token] = lambda: {"user_id": "user@example.com", "role": "user"}
+    assert client.get("/debug/profile?seconds=0.01").status_code == 403
+
+    app.dependency_overrides[validate_token] = lambda: {"user_id": "admin@example.com", "role": "admin"}
+    assert client.get(f"/debug/profile?seconds={profiler.PROFILE_MAX_SECONDS + 1}").status_code == 422
+    assert client.get("/debug/profile?seconds=0.01&interval_ms=1").status_code == 200
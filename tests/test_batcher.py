@@ -0,0 +1,46 @@
+import asyncio
+import gc
+
+from ml_mood_service.batcher import MicroBatcher
+
+
+def test_dispatched_batches_survive_garbage_collection_and_finish_on_stop():
+    async def run():
+        release = asyncio.Event()
+
+        async def run_batch(rows):
+            await release.wait()
+            return [row * 2 for row in rows]
+
+        batcher = MicroBatcher(run_batch, max_batch=2, max_wait=0.001, max_in_flight=1)
+        batcher.start()
+        submitted = [asyncio.create_task(batcher.submit(row)) for row in (1, 2)]
+        await asyncio.sleep(0.01)
+        gc.collect()
+        assert len(batcher._dispatches) == 1
+
+        release.set()
+        await batcher.stop()
+        assert not batcher._dispatches
+        return await asyncio.gather(*submitted)
+
+    assert asyncio.run(run()) == [2, 4]
+
+
+def test_rows_waiting_at_stop_are_failed():
+    async def run():
+        async def run_batch(rows):
+            await asyncio.sleep(0.05)
+            return rows
+
+        batcher = MicroBatcher(run_batch, max_batch=1, max_wait=0.001, max_in_flight=1)
+        batcher.start()
+        first, second, third = (asyncio.create_task(batcher.submit(row)) for row in (1, 2, 3))
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        return await asyncio.gather(first, second, third, return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+    assert first == 1
+    for result in (second, third):
+        assert isinstance(result, RuntimeError)
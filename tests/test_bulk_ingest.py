@@ -0,0 +1,31 @@
+from activity_service.activity_schema import ActivityCreate
+from common.batch_request import validate_rows
+
+
+def test_negative_values_in_a_batch_are_reported_invalid():
+    raw_rows = [
+        {"date": "2024-03-01", "steps": 9000, "active_minutes": 45},
+        {"date": "2024-03-02", "steps": -5, "distance_km": -1.5},
+        b'{"date": "2024-03-03", "calories_burned": -200}',
+    ]
+
+    valid, invalid = validate_rows(ActivityCreate, raw_rows)
+
+    assert [index for index, _ in valid] == [0]
+    assert [(result.index, result.status) for result in invalid] == [(1, "invalid"), (2, "invalid")]
+    assert [error.split(":")[0] for error in invalid[0].errors] == ["steps", "distance_km"]
+    assert [error.split(":")[0] for error in invalid[1].errors] == ["calories_burned"]
+
+
+def test_single_activity_post_upserts_on_the_daily_key():
+    from sqlalchemy.dialects import postgresql
+
+    from activity_service.activity_model import ACTIVITY_COLUMNS
+    from activity_service.bulk_ingest import upsert_statement
+
+    stmt = upsert_statement(*ACTIVITY_COLUMNS).values(user_id=1, date="2024-03-01", workout_type="run", steps=100)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT ON CONSTRAINT activity_data_daily_key DO UPDATE" in sql
+    assert "steps = excluded.steps" in sql
+    assert sql.rstrip().endswith("xmax = 0 AS inserted")
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def imported_dotenv(statement):
+    process = subprocess.run(
+        [sys.executable, "-c", f"import sys; {statement}; print('dotenv' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return process.stdout.split()[-1] == "True"
+
+
+def test_library_modules_do_not_load_the_environment():
+    assert not imported_dotenv(
+        "import common.feature_store, database.db_connection, database.migrate, database.seed_db, "
+        "database.partition_maintenance, ml_mood_service.train_model"
+    )
+
+
+def test_entry_points_load_the_environment():
+    assert imported_dotenv("import activity_service.services")
@@ -0,0 +1,62 @@
+import tracemalloc
+from collections import namedtuple
+from datetime import date
+
+import pytest
+
+from activity_service.export import ENCODERS, EXPORT_COLUMNS, CsvEncoder
+
+HEADER = (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+
+def test_csv_export_without_rows_has_a_header():
+    assert CsvEncoder().finish() == HEADER
+
+
+def test_csv_header_is_sent_once():
+    encoder = CsvEncoder()
+    row = (1, 2, date(2024, 3, 1), 9000, 300.5, 6.1, 45, "run")
+
+    body = encoder.encode([row]) + encoder.encode([row]) + encoder.finish()
+
+    assert body == HEADER + b"1,2,2024-03-01,9000,300.5,6.1,45,run\r\n" * 2
+
+
+Row = namedtuple("Row", EXPORT_COLUMNS)
+CHUNK_ROWS = 2000
+
+
+def generated_chunks(count):
+    first = date(2024, 1, 1).toordinal()
+    for chunk in range(count):
+        yield [
+            Row(i, i % 1000, date.fromordinal(first + i % 365), 9000 + i % 500, 300.5, 6.1, 45, "run")
+            for i in range(chunk * CHUNK_ROWS, (chunk + 1) * CHUNK_ROWS)
+        ]
+
+
+def encode_export(fmt, chunks):
+    """Streams `chunks` through the format's encoder, returns (bytes per chunk, Python heap peak)."""
+    tracemalloc.start()
+    try:
+        encoder = ENCODERS[fmt]()
+        sizes = [len(encoder.encode(rows)) for rows in generated_chunks(chunks)]
+        sizes.append(len(encoder.finish()))
+        return sizes, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv", "parquet"])
+def test_export_encoders_stream_in_bounded_memory(fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    small_sizes, small_peak = encode_export(fmt, 3)
+    sizes, peak = encode_export(fmt, 30)
+
+    # Every chunk is encoded and handed out on its own, nothing is held back for the end
+    assert all(size > 0 for size in sizes[:-1])
+    assert max(sizes[:-1]) < 2 * min(sizes[:-1])
+    # Ten times the rows, not ten times the memory: the peak is set by one chunk
+    assert sum(sizes) > 8 * sum(small_sizes)
+    assert peak < 1.5 * small_peak
@@ -0,0 +1,99 @@
+import asyncio
+import math
+
+from activity_service.feature_updates import FeatureUpdates
+from common.events import ACTIVITY_LOGGED, MOOD_LOGGED
+from common.outbox import Event
+
+
+def test_mood_events_feed_sleep_and_heart_rate_features(tmp_path):
+    updates = FeatureUpdates(str(tmp_path / "features.npz"))
+    events = [
+        Event(1, ACTIVITY_LOGGED, 5, {"days": [{"date": "2024-03-01", "steps": 8000, "active_minutes": 40}]}),
+        Event(2, MOOD_LOGGED, 5, {"days": [{"date": "2024-03-01", "sleep_hours": 7.5, "heart_rate_avg": 62}]}),
+    ]
+
+    asyncio.run(updates.apply(events))
+
+    features = updates.store.lookup(5)
+    assert features["steps_7d"] == 8000
+    assert features["sleep_hours_7d"] == 7.5
+    assert features["heart_rate_avg_7d"] == 62
+
+
+def test_mood_event_without_readings_clears_the_day():
+    updates = FeatureUpdates()
+    day = {"date": "2024-03-01", "sleep_hours": 7.5, "heart_rate_avg": 62}
+
+    asyncio.run(updates.apply([Event(1, MOOD_LOGGED, 5, {"days": [day]})]))
+    asyncio.run(updates.apply([Event(2, MOOD_LOGGED, 5, {"days": [{**day, "sleep_hours": None}]})]))
+
+    features = updates.store.lookup(5)
+    assert math.isnan(features["sleep_hours_7d"])
+    assert features["heart_rate_avg_7d"] == 62
+
+
+class FakeLockConnection:
+    """Advisory locks in `holders`, owned by the task that opened the connection."""
+
+    def __init__(self, holders):
+        self.holders = holders
+        self.owner = asyncio.current_task()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if "pg_try_advisory_lock" in sql:
+            locked = self.holders.setdefault(params["lock_id"], self.owner) is self.owner
+            return type("Result", (), {"scalar": lambda self: locked})()
+        if "pg_advisory_unlock" in sql:
+            self.holders.pop(params["lock_id"], None)
+
+    async def commit(self):
+        pass
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+
+def test_only_the_lock_holder_writes_the_feature_store(tmp_path, monkeypatch):
+    import activity_service.feature_updates as module
+
+    holders = {}
+    engine = type("Engine", (), {"connect": lambda self: FakeLockConnection(holders)})()
+    monkeypatch.setattr(module, "get_engine", lambda role: engine)
+    monkeypatch.setattr(module, "FEATURE_STORE_LOCK_RETRY_SECONDS", 0.01)
+
+    async def run():
+        first, second = (FeatureUpdates(str(tmp_path / "features.npz")) for _ in range(2))
+        for updates in (first, second):
+            updates.consumer = FakeConsumer()
+        first.start()
+        await asyncio.sleep(0.05)
+        second.start()
+        await asyncio.sleep(0.05)
+        states = [(first.writer, first.consumer.running), (second.writer, second.consumer.running)]
+
+        await first.stop()
+        await asyncio.sleep(0.05)
+        states.append((second.writer, second.consumer.running))
+        await second.stop()
+        return states, holders
+
+    states, holders = asyncio.run(run())
+
+    assert states == [(True, True), (False, False), (True, True)]
+    assert holders == {}
@@ -0,0 +1,9 @@
+import logging_config
+from activity_service.log_query import stream_media_type
+
+
+def test_stream_media_type_follows_log_format(monkeypatch):
+    monkeypatch.setattr(logging_config, "LOG_FORMAT", "json")
+    assert stream_media_type() == "application/x-ndjson"
+    monkeypatch.setattr(logging_config, "LOG_FORMAT", "text")
+    assert stream_media_type() == "text/plain; charset=utf-8"
@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+from ml_mood_service.app import MODEL_PATH, app
+from ml_mood_service.inference import load_artifact
+
+
+def test_checked_in_model_artifact_loads():
+    artifact = load_artifact(MODEL_PATH)
+
+    assert artifact["features"]
+    assert set(artifact["classes"]) <= {"Happy", "Neutral", "Stressed"}
+
+
+def test_predictions_are_served_from_a_fresh_checkout():
+    with TestClient(app) as client:
+        assert client.get("/health").json()["model_loaded"] is True
+        single = client.post("/predict", json={"heart_rate_avg": 72, "sleep_hours": 6.5})
+        batch = client.post("/predict/batch", json={"items": [{"sleep_hours": 8}, {"heart_rate_avg": 95}]})
+
+    assert single.status_code == 200
+    assert single.json()["mood"] in {"Happy", "Neutral", "Stressed"}
+    assert batch.status_code == 200
+    assert len(batch.json()) == 2
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import date, timedelta
+
+from common.outbox import Consumer, Event, PostgresBroker, Subscription
+
+
+class RecordingSession:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append(params)
+
+
+def test_notification_carries_positions_not_payloads():
+    # A batch sync over 400 days, its event alone is far past NOTIFY's 8000 byte limit
+    days = [{"date": (date(2024, 1, 1) + timedelta(days=i)).isoformat(), "steps": 12345, "active_minutes": 67}
+            for i in range(400)]
+    events = [Event(41, "activity.logged", 1, {"days": days}), Event(42, "activity.logged", 2, {"days": days})]
+    db = RecordingSession()
+
+    asyncio.run(PostgresBroker().publish(db, events))
+
+    assert db.calls == [{"channel": "outbox_events", "payload": "42"}]
+
+
+class OneShotBroker:
+    def __init__(self, *published):
+        self.published = published
+
+    async def subscribe(self):
+        subscription = Subscription()
+        for item in self.published:
+            subscription.queue.put_nowait(item)
+        return subscription
+
+
+class NoCheckpoints:
+    async def load(self, consumer):
+        return 0
+
+    async def save(self, consumer, position):
+        pass
+
+
+def test_consumer_reads_notified_positions_from_the_primary():
+    async def run():
+        consumer = Consumer("test", handler=None, broker=OneShotBroker(7, 3), checkpoints=NoCheckpoints())
+        reads = []
+
+        async def catch_up(role="read"):
+            reads.append(role)
+            if role == "write":
+                consumer.position = 7
+
+        consumer.catch_up = catch_up
+        consumer.start()
+        await asyncio.sleep(0.05)
+        await consumer.stop()
+        return reads
+
+    # Startup catch-up on the replica finds nothing yet, then the primary for 7, nothing for the handled 3
+    assert asyncio.run(run()) == ["read", "write"]
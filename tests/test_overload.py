@@ -0,0 +1,103 @@
+from fastapi import APIRouter, FastAPI
+
+from common.overload import OverloadMiddleware, RouteLimit, protect_app
+
+
+def overload_middleware(app) -> OverloadMiddleware:
+    middleware = app.build_middleware_stack()
+    while not isinstance(middleware, OverloadMiddleware):
+        middleware = middleware.app
+    return middleware
+
+
+def scope(method, path):
+    return {"type": "http", "method": method, "path": path, "root_path": ""}
+
+
+def test_routes_of_included_routers_resolve_to_their_limiter():
+    router = APIRouter(prefix="/items")
+
+    @router.post("/batch")
+    async def batch():
+        return {}
+
+    @router.get("/{item_id}")
+    async def item(item_id: int):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    protect_app(app, "test_included", {
+        "POST /items/batch": RouteLimit(concurrency=2, queue=0),
+        "GET /items/{item_id}": RouteLimit(concurrency=3, queue=0, timeout=None),
+    })
+    middleware = overload_middleware(app)
+
+    assert middleware.limiter(scope("POST", "/items/batch")).name == "POST /items/batch"
+    limiter = middleware.limiter(scope("GET", "/items/7"))
+    assert limiter.name == "GET /items/{item_id}"
+    assert limiter.limit.timeout is None
+    assert middleware.limiter(scope("GET", "/items/batch")).name == "GET /items/{item_id}"
+    assert middleware.limiter(scope("POST", "/items/7")).name == "*"
+
+
+def test_limit_without_a_route_falls_back_to_the_default():
+    app = FastAPI()
+    protect_app(app, "test_missing", {"POST /missing": RouteLimit(concurrency=1, queue=0)})
+    middleware = overload_middleware(app)
+
+    assert middleware.limiter(scope("POST", "/missing")).name == "*"
+
+
+def test_activity_service_limits_apply():
+    from activity_service.services import app
+
+    middleware = overload_middleware(app)
+
+    assert middleware.limiter(scope("POST", "/activity/batch")).name == "POST /activity/batch"
+    for path in ("/api/v1/admin/activity/export", "/api/v1/admin/activity/logs/stream"):
+        limiter = middleware.limiter(scope("GET", path))
+        assert limiter.name == f"GET {path}"
+        assert limiter.limit.timeout is None
+    assert middleware.limiter(scope("POST", "/activity/")).name == "*"
+
+
+def test_caller_keys_share_the_token_verifiers_cache():
+    from datetime import datetime, timedelta, timezone
+
+    from jose import jwt
+
+    from common.overload import CallerKeys
+    from common.token_verifier import ALGORITHM, SECRET_KEY, TokenVerifier
+
+    expire = datetime.now(timezone.utc) + timedelta(minutes=5)
+    token = jwt.encode({"sub": "a@example.com", "role": "user", "uid": 7, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+    keys = CallerKeys()
+    keys.verifier = TokenVerifier(mode="local")
+
+    def request(token):
+        return {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 1234)}
+
+    assert keys(request(token)) == "user:7"
+    assert keys.verifier.cache.get(token) == {"user_id": "a@example.com", "role": "user", "uid": 7}
+    assert keys(request("forged")) == "ip:10.0.0.1"
+
+
+def test_statement_timeout_is_only_attached_to_sessions_with_a_deadline():
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from common import overload
+
+    outside = AsyncSession()
+    overload.apply_deadline(outside)
+    assert not event.contains(outside.sync_session, "after_begin", overload._apply_statement_timeout)
+
+    token = overload._deadline.set(10**9)
+    try:
+        inside = AsyncSession()
+        overload.apply_deadline(inside)
+    finally:
+        overload._deadline.reset(token)
+    assert event.contains(inside.sync_session, "after_begin", overload._apply_statement_timeout)
+    assert not event.contains(AsyncSession().sync_session, "after_begin", overload._apply_statement_timeout)
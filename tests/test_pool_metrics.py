@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database.pool_metrics import DB_QUERY_SECONDS, instrument_engine
+
+
+def test_failed_statements_leave_no_timing_state_on_the_connection():
+    engine = create_engine("sqlite://")
+    instrument_engine(SimpleNamespace(sync_engine=engine), "test_pool_metrics")
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        info = dict(connection.connection.info)
+
+    assert "query_start" not in info
+    assert [sample.value for sample in DB_QUERY_SECONDS.collect()[0].samples
+            if sample.name.endswith("_count") and sample.labels["role"] == "test_pool_metrics"] == [1.0]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from database.seed_db import mood_chunks_from_health, user_chunks
+
+HEALTH_HEADER = "Student ID,Heart Rate (bpm),Date and Time,Sleep Duration (hours),Stress Level (1-10)\n"
+
+
+def test_health_records_map_and_dedupe_across_chunks(tmp_path):
+    path = tmp_path / "health.csv"
+    path.write_text(HEALTH_HEADER + "".join([
+        "1002,70,2024-10-23 10:00:00,7.0,2\n",
+        "1003,71,2024-10-23 10:05:00,6.0,5\n",
+        # Next chunk: a smaller id than the first chunk's, and a second reading for student 1002
+        "1000,72,2024-10-23 10:10:00,8.0,8\n",
+        "1002,90,2024-10-23 18:00:00,5.0,9\n",
+    ]))
+
+    frame = pd.concat(mood_chunks_from_health(path, [10, 11, 12, 13], chunk_rows=2))
+
+    assert sorted(zip(frame["user_id"], frame["heart_rate_avg"])) == [(10, 72), (12, 90), (13, 71)]
+
+
+def test_user_emails_are_unique_across_chunks(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text("Name,Age,Gender,Weight,email\n" + "".join(
+        f"User {i},30,Male,70,{email}\n" for i, email in enumerate(["a@x.io", "b@x.io", "a@x.io", "c@x.io"])
+    ))
+
+    frame = pd.concat(user_chunks(path, "hash", chunk_rows=2, report={}))
+
+    assert frame["email"].tolist() == ["a@x.io", "b@x.io", "c@x.io"]
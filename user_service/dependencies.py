@@ -1,9 +1,9 @@
-import logging
-from logging_config import get_logger
-from fastapi import Depends, HTTPException, Security
-from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 import os
+import time
+from common.metrics import AUTH_SECONDS
 from logging_config import get_logger  #Import shared logger
 
 logger = get_logger("user_service")  # Use shared logger
@@ -11,23 +11,31 @@ logger = get_logger("user_service")  # Use shared logger
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret")
 ALGORITHM = "HS256"
 security = HTTPBearer()
+_VALIDATION_SECONDS = AUTH_SECONDS.labels("user", "local")
 
 def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Validate JWT token."""
-    logger.info("Received token validation request.")
-    token = credentials.credentials
+    start = time.perf_counter()
+    try:
+        return _decode(credentials.credentials)
+    finally:
+        _VALIDATION_SECONDS.observe(time.perf_counter() - start)
+
+def _decode(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         role = payload.get("role")
 
         if not user_id or not role:
-            logger.warning("Invalid token payload: %s", payload)
+            logger.warning("Token is missing `sub` or `role` claims")
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        logger.info("Token is valid. User_payload: %s,User Email: %s, Role: %s",payload, user_id, role)
-        return {"user_id": user_id, "role": role}  
+        user = {"user_id": user_id, "role": role}
+        if payload.get("uid") is not None:
+            user["uid"] = payload["uid"]
+        return user
 
     except JWTError as e:
-        logger.error("JWT Error: %s", str(e))
+        logger.warning("Token validation failed: %s", e)
         raise HTTPException(status_code=401, detail="Token is invalid or expired")
\ No newline at end of file
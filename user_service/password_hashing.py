@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from common.metrics import BCRYPT_QUEUE_DEPTH, BCRYPT_SECONDS
+
+# bcrypt cost factor, existing hashes with a different cost are re-hashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a thread pool is enough to keep hashing off the event loop
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes allowed to wait for a free worker before new requests are shed with 503
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded worker pool and sheds load once its queue is full.
+
+    The passlib context and the pool are built on the first hash, so importing
+    the service (or a script that only needs its models) doesn't pay for them.
+    """
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._context = None
+        self._executor = None
+        self._pending = 0  # running + queued, only touched from the event loop
+
+    @property
+    def context(self):
+        if self._context is None:
+            from passlib.context import CryptContext
+
+            self._context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=self.rounds)
+        return self._context
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    @staticmethod
+    def _timed(operation: str, func, *args):
+        # Runs in the worker thread, so queueing for a worker is not included
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            BCRYPT_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, please retry",
+                headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, operation, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        """Returns (valid, new_hash), `new_hash` is set when the stored hash uses an outdated cost."""
+        return await self._run("verify", self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+BCRYPT_QUEUE_DEPTH.set_function(lambda: password_hasher.queue_depth)
@@ -1,48 +1,48 @@
-from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status,Request,APIRouter
-from requests import Session
-from sqlalchemy import text, select
+import common.env  # noqa: F401, loads .env before the imports below read their settings
+from fastapi import FastAPI, Depends, HTTPException, status, Request, APIRouter
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.db_connection import get_db
+from database.db_connection import DB_POOL_SIZE, get_db, get_read_db, dispose_engines
+from common.metrics import instrument_app
+from common.overload import RouteLimit, protect_app
 from user_service.user_model import User
 from pydantic import BaseModel, EmailStr, conint, confloat
 from sqlalchemy.exc import IntegrityError
 from functools import wraps
-import logging
 import os
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import jwt
+from contextlib import asynccontextmanager
 from user_service.dependencies import validate_token
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
-from logging_config import get_logger
+from user_service.password_hashing import password_hasher
+from common.identity_cache import identity_cache
+from common.fast_json import FAST_RESPONSES, dumps
+from common.response_cache import build_response_cache, cached_response
+from logging_config import configure_logging, get_logger
 
-load_dotenv()
+# .env is loaded by database.db_connection, imported above
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret")
 ALGORITHM = "HS256"
-security = HTTPBearer()
 logger = get_logger("user_service")  #Initialize logger properly
-logger.info("User Service Started.")
+# Serialized GET /users/{user_id} bodies with ETags, see common/response_cache.py
+user_responses = build_response_cache("user_response")
 
 # JWT Configurations
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-#Initialize Fast API app
-app = FastAPI(title="User Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    password_hasher.shutdown()
+    await dispose_engines()
+
+router = APIRouter()
 
 #Pydantic schema for API requests, fastAPI will validate the incoming data
 class UserCreate(BaseModel):
@@ -76,14 +76,16 @@ def handle_database_error(func):
     async def wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
+        except HTTPException:
+            raise  # Already carries the intended status code
         except IntegrityError as e:
-            logger.error(f"Database integrity error: {str(e)}")
+            logger.error("Database integrity error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Data consistency error occurred"
             )
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Internal server error"
@@ -91,14 +93,14 @@ def handle_database_error(func):
     return wrapper
 
 # Validate option
-@app.get("/validate_token",tags=["Auth"])
+@router.get("/validate_token",tags=["Auth"])
 async def validate_token_api(user: dict = Depends(validate_token)):
     """Expose validate_token as an API for other microservices."""
-    logger.info("validate_token called successfully for user: %s", user["user_id"])
+    logger.debug("validate_token called for %s", user["user_id"])
     return user
 
 # Register User API 
-@app.post("/register", response_model=UserResponse, tags=["Auth"])
+@router.post("/register", response_model=UserResponse, tags=["Auth"])
 @handle_database_error
 async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
@@ -108,24 +110,29 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
         existing_user = result.scalar_one_or_none()
 
         if existing_user:
-            logger.warning(f"Attempted to register with existing email: {user.email}")
+            logger.warning("Attempted to register with existing email: %s", user.email)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
 
-        # Hash the password and create a new user
-        hashed_password = get_password_hash(user.password)
+        # Hash the password (off the event loop) and create a new user
+        hashed_password = await password_hasher.hash(user.password)
         db_user = User(**user.model_dump(exclude={"password"}), password_hash=hashed_password)
 
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)
+        await identity_cache.invalidate(db_user.email)
+        await user_responses.invalidate(f"user:{db_user.user_id}")
         return db_user  # Successfully created user
 
+    except HTTPException:
+        raise
+
     except IntegrityError as e:
         await db.rollback()  # Ensure rollback on error
-        logger.error(f"Database integrity error during registration: {str(e)}")
+        logger.error("Database integrity error during registration: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -133,13 +140,13 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
 
     except Exception as e:
         await db.rollback()
-        logger.critical(f"Unexpected error during user registration: {str(e)}", exc_info=True)
+        logger.critical("Unexpected error during user registration: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
 #Login User API, creates access token
-@app.post("/login", response_model=Token, tags=["Auth"])
+@router.post("/login", response_model=Token, tags=["Auth"])
 @handle_database_error
 async def login_for_access_token(user: UserLogin, db: AsyncSession = Depends(get_db)):
     try:
@@ -147,44 +154,68 @@ async def login_for_access_token(user: UserLogin, db: AsyncSession = Depends(get
         result = await db.execute(stmt)
         user_record = result.scalar_one_or_none()
 
-        if not user_record or not verify_password(user.password, user_record.password_hash):
-            logger.warning(f"Failed login attempt for email: {user.email}")
+        valid, new_hash = False, None
+        if user_record:
+            valid, new_hash = await password_hasher.verify_and_update(user.password, user_record.password_hash)
+
+        if not valid:
+            logger.warning("Failed login attempt for email: %s", user.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        # Stored hash used an outdated bcrypt cost, upgrade it while we have the plain password
+        if new_hash:
+            user_record.password_hash = new_hash
+            await db.commit()
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        access_token = create_access_token(data={"sub": user.email,"role": user_record.role },
+        # `uid` lets other services skip the email -> user_id lookup
+        access_token = create_access_token(data={"sub": user.email, "role": user_record.role, "uid": user_record.user_id},
                                            expires_delta=access_token_expires)
-        logger.info(f"User {user.email} logged in successfully.")
+        logger.info("User %s logged in", user_record.user_id)
         return {"access_token": access_token, "token_type": "bearer"}
 
+    except HTTPException:
+        raise
+
     except Exception as e:
-        logger.error(f"Unexpected error during login for email {user.email}: {str(e)}")
+        logger.error("Unexpected error during login for email %s: %s", user.email, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
         
 #GET Endpoint - Fetch user by ID
-@app.get("/users/{user_id}", response_model=UserResponse)
+@router.get("/users/{user_id}", response_model=UserResponse)
 @handle_database_error
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).filter(User.user_id == user_id))
-    user = result.scalars().first()  # Get the user from the result
-    if not user:
-        logger.warning(f"User not found with ID: {user_id}")
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def get_user(user_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    key = f"user:{user_id}"
+    cached = await user_responses.get(key)
+    if cached is None:
+        generation = user_responses.generation(key)
+        # Only the UserResponse columns, as a Core row
+        result = await db.execute(select(User.user_id, User.name, User.email).filter(User.user_id == user_id))
+        user = result.first()
+        if not user:
+            logger.warning("User not found with ID: %s", user_id)
+            raise HTTPException(status_code=404, detail="User not found")
+        if FAST_RESPONSES:
+            body = dumps(user._asdict())
+        else:
+            body = UserResponse.model_validate(user).model_dump_json().encode()
+        cached = await user_responses.set(key, body, generation)
+    # 304 when If-None-Match carries the current ETag
+    return cached_response(request, cached)
     
 #POST Endpoint - Create a New User
-@app.post("/users", response_model=UserResponse, tags=["User"])
+@router.post("/users", response_model=UserResponse, tags=["User"])
 @handle_database_error
 async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Create a new user in the database."""
-    logger.info(f"Received request to create user: {user.email}")
+    logger.debug("Received request to create user: %s", user.email)
 
     # Check if a user with the same email already exists
     stmt = select(User).where(User.email == user.email)
@@ -192,7 +223,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     existing_user = result.scalar_one_or_none()
 
     if existing_user:
-        logger.warning(f"Duplicate email attempt: {user.email}")
+        logger.warning("Duplicate email attempt: %s", user.email)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email already exists, Please try with a different email id"
@@ -201,18 +232,23 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
         # Create new user
         # Hash the password and create a new user
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         db_user = User(**user.model_dump(exclude={"password"}), password_hash=hashed_password)
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)  # Refresh to get the user_id
+        await identity_cache.invalidate(db_user.email)
+        await user_responses.invalidate(f"user:{db_user.user_id}")
         
-        logger.info(f"New user created successfully: User ID {db_user.user_id}, Email: {user.email}")
+        logger.info("New user created: User ID %s", db_user.user_id)
         return db_user  # Return the actual user object
 
+    except HTTPException:
+        raise
+
     except IntegrityError as e:
         await db.rollback()  # Correctly await rollback
-        logger.error(f"Database integrity error while creating user {user.email}: {str(e)}")
+        logger.error("Database integrity error while creating user %s: %s", user.email, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid data input"
@@ -220,8 +256,28 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     
     except Exception as e:
         await db.rollback()
-        logger.critical(f"Unexpected error during user creation for {user.email}: {str(e)}", exc_info=True)
+        logger.critical("Unexpected error during user creation for %s: %s", user.email, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+
+def create_app() -> FastAPI:
+    """The User Service app. Engines and the bcrypt context are created on first use, not here."""
+    configure_logging("user")
+    app = FastAPI(title="User Service", lifespan=lifespan)
+    app.include_router(router)
+    # Admission control, see common/overload.py: bcrypt routes hold a pooled connection while hashing,
+    # so no more of them run than there are connections
+    protect_app(app, "user", {
+        "POST /login": RouteLimit(concurrency=DB_POOL_SIZE, queue=128),
+        "POST /register": RouteLimit(concurrency=max(DB_POOL_SIZE // 2, 1), queue=32),
+        "POST /users": RouteLimit(concurrency=max(DB_POOL_SIZE // 2, 1), queue=32),
+    })
+    # Per-route latency, DB time, bcrypt and pool metrics on /metrics, see common/metrics.py
+    instrument_app(app, "user")
+    logger.info("User Service Started.")
+    return app
+
+# `uvicorn user_service.user_service:app`, or `--factory user_service.user_service:create_app`
+app = create_app()